@@ -25,6 +25,11 @@ while True:
         time.sleep(1)
 "
 
+# Run a different command (e.g. the standalone queue worker) if one was given
+if [ "$#" -gt 0 ]; then
+    exec "$@"
+fi
+
 # Apply database migrations
 echo "Applying database migrations..."
 python manage.py migrate
@@ -35,4 +40,4 @@ python manage.py collectstatic --noinput
 
 # Start Gunicorn server
 echo "Starting Gunicorn server..."
-gunicorn eth_faucet.wsgi:application --bind 0.0.0.0:8000
\ No newline at end of file
+gunicorn eth_faucet.wsgi:application --config gunicorn.conf.py
\ No newline at end of file
@@ -1,5 +1,14 @@
 import os
 from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
+
+
+def positive(name, key, value):
+    """`value` of `key` in the `name` setting, which is used as a divisor and must be above 0"""
+    if value <= 0:
+        raise ImproperlyConfigured(f"{name}: {key} must be greater than 0, not {value}")
+    return value
+
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -25,6 +34,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'faucet.middleware.TracingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -66,6 +76,19 @@ DATABASES = {
     }
 }
 
+# Optional streaming replica for stats, history and admin list reads (see faucet.services.replica)
+if os.environ.get('POSTGRES_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ['POSTGRES_REPLICA_HOST'],
+        'PORT': os.environ.get('POSTGRES_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['faucet.services.replica.ReplicaRouter']
+DATABASE_REPLICA_ALIAS = 'replica'
+DATABASE_REPLICA_MAX_LAG = float(os.environ.get('DATABASE_REPLICA_MAX_LAG', '5'))  # Read from the primary while the replica is further behind (seconds)
+DATABASE_REPLICA_LAG_CHECK_INTERVAL = float(os.environ.get('DATABASE_REPLICA_LAG_CHECK_INTERVAL', '5'))  # Seconds between replica lag checks per process
+
 # Cache for rate limiting
 CACHES = {
     'default': {
@@ -112,15 +135,108 @@ ETHEREUM_FALLBACK_PROVIDERS = os.environ.get('ETHEREUM_FALLBACK_PROVIDERS', '')
 ETHEREUM_PRIVATE_KEY = os.environ.get('ETHEREUM_PRIVATE_KEY', '')
 ETHEREUM_FROM_ADDRESS = os.environ.get('ETHEREUM_FROM_ADDRESS', '')
 ETHEREUM_CHAIN_ID = int(os.environ.get('ETHEREUM_CHAIN_ID', '11155111'))  # Default is Sepolia
-ETHEREUM_MAX_RETRIES = int(os.environ.get('ETHEREUM_MAX_RETRIES', '3'))  # Maximum retry attempts for RPC calls
+ETHEREUM_MAX_RETRIES = int(os.environ.get('ETHEREUM_MAX_RETRIES', '3'))  # Maximum attempts for RPC calls made without a deadline
 ETHEREUM_RETRY_DELAY = float(os.environ.get('ETHEREUM_RETRY_DELAY', '1.0'))  # Delay between retries in seconds
+ETHEREUM_RPC_TIMEOUT = float(os.environ.get('ETHEREUM_RPC_TIMEOUT', '10.0'))  # Per-call RPC timeout cap in seconds
+ETHEREUM_FAST_RPC = os.environ.get('ETHEREUM_FAST_RPC', 'False').lower() == 'true'  # Use the lean JSON-RPC client for balance, nonce and send calls
+ETHEREUM_SIGNING_PROCESSES = int(os.environ.get('ETHEREUM_SIGNING_PROCESSES', '0'))  # Processes for batch signing (0 or 1 = sign in the calling thread)
+ETHEREUM_WS_PROVIDER_URL = os.environ.get('ETHEREUM_WS_PROVIDER_URL', '')  # WebSocket RPC URL for the newHeads subscription (empty = read chain state per request)
+ETHEREUM_WS_MAX_HEAD_AGE = float(os.environ.get('ETHEREUM_WS_MAX_HEAD_AGE', '60.0'))  # Seconds without a new head before the subscription is treated as down
+ETHEREUM_WS_RECONNECT_DELAY = float(os.environ.get('ETHEREUM_WS_RECONNECT_DELAY', '1.0'))  # Initial reconnect backoff in seconds, doubling up to 30
 
 # Faucet settings
 FAUCET_AMOUNT = os.environ.get('FAUCET_AMOUNT', '0.0001')  # Amount in ETH
+FAUCET_SPEND_BUDGET_ETH = float(os.environ.get('FAUCET_SPEND_BUDGET_ETH', '0'))  # Max ETH dispensed per budget period across all nodes (0 = no budget)
+FAUCET_SPEND_BUDGET_PERIOD = int(os.environ.get('FAUCET_SPEND_BUDGET_PERIOD', '3600'))  # Seconds over which the budget refills, e.g. 3600 (hourly) or 86400 (daily)
 RATE_LIMIT_TIMEOUT = int(os.environ.get('RATE_LIMIT_TIMEOUT', '60'))  # Timeout in seconds
+RATE_LIMIT_IPV4_PREFIXES = {  # Comma-separated prefix:budget pairs; requests per timeout from one network of that size
+    int(prefix): positive('RATE_LIMIT_IPV4_PREFIXES', f'/{prefix}', int(budget)) for prefix, budget in (
+        item.split(':') for item in os.environ.get('RATE_LIMIT_IPV4_PREFIXES', '32:1,24:16').split(',') if ':' in item
+    )
+}
+RATE_LIMIT_IPV6_PREFIXES = {  # Same for IPv6; a /64 is usually one subscriber
+    int(prefix): positive('RATE_LIMIT_IPV6_PREFIXES', f'/{prefix}', int(budget)) for prefix, budget in (
+        item.split(':') for item in os.environ.get('RATE_LIMIT_IPV6_PREFIXES', '64:1,48:16').split(',') if ':' in item
+    )
+}
+WALLET_CAP_WINDOW_DAYS = int(os.environ.get('WALLET_CAP_WINDOW_DAYS', '7'))  # Length of the per-wallet payout window in days
+WALLET_CAP_PER_WINDOW = int(os.environ.get('WALLET_CAP_PER_WINDOW', '0'))  # Max payouts per wallet per window (0 = no cap, at most 15)
+WALLET_CAP_LIFETIME = int(os.environ.get('WALLET_CAP_LIFETIME', '0'))  # Max payouts per wallet ever (0 = no cap, at most 15)
+WALLET_CAP_FALSE_POSITIVE_RATE = float(os.environ.get('WALLET_CAP_FALSE_POSITIVE_RATE', '0.001'))  # Share of checks the filters send to the database needlessly
+WALLET_CAP_EXPECTED_DAILY = int(os.environ.get('WALLET_CAP_EXPECTED_DAILY', '100000'))  # Payouts per day the daily filters are sized for
+WALLET_CAP_EXPECTED_WALLETS = int(os.environ.get('WALLET_CAP_EXPECTED_WALLETS', '1000000'))  # Distinct wallets the lifetime filter is sized for
+RATE_LIMIT_ALLOWLIST = [network.strip() for network in os.environ.get('RATE_LIMIT_ALLOWLIST', '').split(',') if network.strip()]  # Networks exempt from IP limits
+RATE_LIMIT_DENYLIST = [network.strip() for network in os.environ.get('RATE_LIMIT_DENYLIST', '').split(',') if network.strip()]  # Networks refused with 403
 USE_TRANSACTION_QUEUE = os.environ.get('USE_TRANSACTION_QUEUE', 'True').lower() == 'true'  # Use async queue for transactions
+TRANSACTION_QUEUE_WORKER = os.environ.get('TRANSACTION_QUEUE_WORKER', 'thread')  # 'thread' (worker in each web process) or 'external' (run_faucet_worker)
+TRANSACTION_QUEUE_CONCURRENCY = int(os.environ.get('TRANSACTION_QUEUE_CONCURRENCY', '1'))  # Worker threads per run_faucet_worker process
+TRANSACTION_QUEUE_HEALTH_INTERVAL = float(os.environ.get('TRANSACTION_QUEUE_HEALTH_INTERVAL', '10'))  # Seconds between worker health reports
+TRANSACTION_QUEUE_MAX_SIZE = int(os.environ.get('TRANSACTION_QUEUE_MAX_SIZE', '10000'))  # Maximum queued transactions
+TRANSACTION_QUEUE_BATCH_SIZE = int(os.environ.get('TRANSACTION_QUEUE_BATCH_SIZE', '50'))  # Max transactions signed and broadcast together from a bulk request
+TRANSACTION_QUEUE_WAIT_SLO = float(os.environ.get('TRANSACTION_QUEUE_WAIT_SLO', '300'))  # Reject new requests whose estimated queue wait exceeds this (seconds)
+TRANSACTION_QUEUE_FAIR_IPV4_PREFIX = int(os.environ.get('TRANSACTION_QUEUE_FAIR_IPV4_PREFIX', '24'))  # IPv4 clients sharing this prefix share a queue slot
+TRANSACTION_QUEUE_FAIR_IPV6_PREFIX = int(os.environ.get('TRANSACTION_QUEUE_FAIR_IPV6_PREFIX', '48'))  # IPv6 clients sharing this prefix share a queue slot
+TRANSACTION_QUEUE_FAIR_WEIGHTS = {  # Comma-separated client_key=weight pairs, e.g. "net:10.0.0.0/24=0.5"
+    key.strip(): positive('TRANSACTION_QUEUE_FAIR_WEIGHTS', key.strip(), float(weight))
+    for key, weight in (
+        item.rsplit('=', 1) for item in os.environ.get('TRANSACTION_QUEUE_FAIR_WEIGHTS', '').split(',') if '=' in item
+    )
+}
+# Delayed-retry policies for queued transactions, by error class (unlisted classes are not retried)
+TRANSACTION_RETRY_POLICIES = {
+    'connection': {'max_retries': 3, 'base_delay': 5.0, 'max_delay': 60.0},
+    'timeout': {'max_retries': 3, 'base_delay': 5.0, 'max_delay': 60.0},
+    'rate_limited': {'max_retries': 5, 'base_delay': 15.0, 'max_delay': 300.0},
+    'nonce': {'max_retries': 3, 'base_delay': 1.0, 'max_delay': 10.0},
+}
+FUND_REQUEST_DEADLINE = float(os.environ.get('FUND_REQUEST_DEADLINE', '25.0'))  # Total time budget for a synchronous fund request in seconds
+FAUCET_WORKER_DEADLINE = float(os.environ.get('FAUCET_WORKER_DEADLINE', '60.0'))  # Total time budget for sending one queued transaction in seconds
+FUND_SYNC_DEADLINE_MS = int(os.environ.get('FUND_SYNC_DEADLINE_MS', '0'))  # Wait this long for the queue worker's tx hash (0 = always return 202)
+FAUCET_BULK_MAX_ADDRESSES = int(os.environ.get('FAUCET_BULK_MAX_ADDRESSES', '500'))  # Max addresses per partner bulk request
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', '86400'))  # Seconds to replay the stored response for an Idempotency-Key
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.environ.get('IDEMPOTENCY_WAIT_TIMEOUT', '10'))  # Max seconds a duplicate waits for the in-flight original
+
+# Transaction table partitioning (PostgreSQL only)
+TRANSACTION_PARTITION_INTERVAL = os.environ.get('TRANSACTION_PARTITION_INTERVAL', 'week')  # 'day' or 'week' range partitions on created_at
+TRANSACTION_RETENTION_DAYS = int(os.environ.get('TRANSACTION_RETENTION_DAYS', '90'))  # Partitions older than this are archived and dropped
+TRANSACTION_ARCHIVE_DIR = os.environ.get('TRANSACTION_ARCHIVE_DIR', os.path.join(BASE_DIR, 'archive'))  # Where manage_partitions writes archived partitions
+
+# Transaction status endpoint settings
+TRANSACTION_STATUS_CACHE_TTL = int(os.environ.get('TRANSACTION_STATUS_CACHE_TTL', '3600'))  # Seconds to cache status snapshots
+TRANSACTION_STATUS_MAX_WAIT = float(os.environ.get('TRANSACTION_STATUS_MAX_WAIT', '30'))  # Maximum long-poll wait in seconds
+TRANSACTION_STATUS_STREAM_TIMEOUT = float(os.environ.get('TRANSACTION_STATUS_STREAM_TIMEOUT', '300'))  # Maximum SSE stream duration in seconds
+TRANSACTION_STATUS_MAX_WAITERS = int(os.environ.get('TRANSACTION_STATUS_MAX_WAITERS', '40'))  # Long-polls, SSE streams and fund waits held at once per process; the rest get 503
+if TRANSACTION_STATUS_MAX_WAITERS >= int(os.environ.get('GUNICORN_THREADS', '50')):
+    # Each waiter holds a gunicorn thread; fund requests need the threads left over
+    raise ImproperlyConfigured("TRANSACTION_STATUS_MAX_WAITERS must be below GUNICORN_THREADS")
+TRANSACTION_HISTORY_MAX_PAGE_SIZE = int(os.environ.get('TRANSACTION_HISTORY_MAX_PAGE_SIZE', '500'))  # Largest page the history API returns
+TRANSACTION_HISTOGRAM_MAX_DAYS = int(os.environ.get('TRANSACTION_HISTOGRAM_MAX_DAYS', '31'))  # Longest range one histogram request may cover
+
+# Tracing (OpenTelemetry-compatible: W3C traceparent, OTLP/JSON export)
+TRACING_EXPORTER = os.environ.get('TRACING_EXPORTER', 'none')  # 'none', 'file' (OTLP/JSON lines) or 'otlp' (HTTP collector)
+TRACING_SAMPLE_RATE = float(os.environ.get('TRACING_SAMPLE_RATE', '0.1'))  # Share of new traces recorded; callers' sampling decisions are kept
+TRACING_FILE = os.environ.get('TRACING_FILE', os.path.join(BASE_DIR, 'traces.jsonl'))  # Output of the file exporter
+TRACING_OTLP_ENDPOINT = os.environ.get('TRACING_OTLP_ENDPOINT', 'http://localhost:4318/v1/traces')  # OTLP/HTTP traces endpoint
+TRACING_SERVICE_NAME = os.environ.get('TRACING_SERVICE_NAME', 'eth-faucet')  # service.name of exported spans
+TRACING_EXPORT_INTERVAL = float(os.environ.get('TRACING_EXPORT_INTERVAL', '5.0'))  # Seconds between exports of buffered spans
+
+# Profiling (see the profile/ endpoint and the profile_worker command)
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(BASE_DIR, 'profiles'))  # Where request profiles and stack samples are saved
+PROFILE_STACK_INTERVAL = float(os.environ.get('PROFILE_STACK_INTERVAL', '0.01'))  # Seconds between stack samples
+PROFILE_STACK_SECONDS = float(os.environ.get('PROFILE_STACK_SECONDS', '30'))  # Default stack sampling duration
+
+# Memory instrumentation and worker recycling
+MEMORY_TRACE_FRAMES = int(os.environ.get('MEMORY_TRACE_FRAMES', '0'))  # Trace allocations with tracemalloc from startup, keeping this many frames (0 = only on demand)
+MEMORY_REPORT_INTERVAL = float(os.environ.get('MEMORY_REPORT_INTERVAL', '3600'))  # Seconds between logs of the largest allocation sites while tracing
+WORKER_MAX_ITEMS = int(os.environ.get('WORKER_MAX_ITEMS', '0'))  # run_faucet_worker drains and exits after this many items (0 = never)
+WORKER_MAX_RSS_MB = float(os.environ.get('WORKER_MAX_RSS_MB', '0'))  # run_faucet_worker drains and exits above this resident memory (0 = never)
 
 # Logging configuration
+# Records are queued and written by a background thread; LOG_FORMAT=json adds transaction and trace ids
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')  # 'text' or 'json'
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', '10'))  # Records per second let through per message below ERROR (0 = no sampling)
+LOG_SAMPLE_BURST = int(os.environ.get('LOG_SAMPLE_BURST', '20'))  # Records per message let through at once before sampling starts
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', '10000'))  # Records waiting to be written before new ones are dropped
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -129,11 +245,26 @@ LOGGING = {
             'format': '{levelname} {asctime} {module} {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'faucet.log.JSONFormatter',
+        },
+    },
+    'filters': {
+        'trace_context': {
+            '()': 'faucet.log.TraceContextFilter',
+        },
+        'sampling': {
+            '()': 'faucet.log.SamplingFilter',
+            'rate': LOG_SAMPLE_RATE,
+            'burst': LOG_SAMPLE_BURST,
+        },
     },
     'handlers': {
         'console': {
-            'class': 'logging.StreamHandler',
-            'formatter': 'verbose',
+            'class': 'faucet.log.BackgroundStreamHandler',
+            'maxsize': LOG_QUEUE_SIZE,
+            'formatter': 'json' if LOG_FORMAT == 'json' else 'verbose',
+            'filters': ['sampling', 'trace_context'],
         },
     },
     'root': {
@@ -1,22 +1,301 @@
-from django.contrib import admin
-from .models import Transaction
+import re
+import uuid
+import ipaddress
+from datetime import timedelta
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max, Min, QuerySet, Sum
+from django.utils import timezone
+from django.utils.functional import cached_property
+from .models import Transaction, Partner
+from .services.transaction_queue import transaction_queue, TransactionQueueFull
+from .services.transaction_events import transaction_events
+from .services.spend_budget import spend_budget
+from .services.wallet_caps import wallet_caps
+from .services.replica import reads_from_replica
+
+# Counts below this are exact; above it the planner's estimate is shown instead
+EXACT_COUNT_THRESHOLD = 10000
+
+# Rows changed by each UPDATE of a bulk action
+ADMIN_UPDATE_CHUNK_SIZE = 1000
+
+# Hex prefix of an address or transaction hash, long enough to be selective
+HEX_PREFIX_PATTERN = re.compile(r'0x[0-9a-f]{4,64}')
+
+
+def estimated_count(queryset):
+    """
+    Row count of a queryset as estimated by PostgreSQL, or None where there is no estimate.
+    An unfiltered table uses the reltuples statistics of the table and its partitions;
+    a filtered one the row estimate of the query plan. Neither reads any rows.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                """
+                SELECT coalesce(sum(greatest(c.reltuples, 0)), 0) FROM pg_class c
+                WHERE c.oid = %s::regclass
+                   OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass)
+                """,
+                [queryset.model._meta.db_table] * 2
+            )
+            return int(cursor.fetchone()[0])
+
+        sql, params = queryset.order_by().query.sql_with_params()
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+        return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that trusts the planner's estimate for large result sets instead of COUNT(*)"""
+
+    @cached_property
+    def count(self):
+        estimate = estimated_count(self.object_list)
+        if estimate is None or estimate < EXACT_COUNT_THRESHOLD:
+            return super().count
+        return estimate
+
+
+def period_starts(first, last, kind):
+    """Start of every year, month or day from the one containing `first` through `last`"""
+    if kind == 'year':
+        start = first.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+    elif kind == 'month':
+        start = first.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    else:
+        start = first.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    while start <= last:
+        if kind == 'year':
+            following = start.replace(year=start.year + 1)
+        elif kind == 'month':
+            following = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+        else:
+            following = start + timedelta(days=1)
+        yield start, following
+        start = following
+
+
+class DateHierarchyQuerySet(QuerySet):
+    """
+    QuerySet for the admin changelist whose datetimes() probes the created_at index once
+    per candidate year, month or day instead of running SELECT DISTINCT over every row
+    """
+
+    def datetimes(self, field_name, kind, order='ASC', tzinfo=None, is_dst=None):
+        if kind not in ('year', 'month', 'day'):
+            return super().datetimes(field_name, kind, order=order, tzinfo=tzinfo)
+
+        bounds = self.aggregate(first=Min(field_name), last=Max(field_name))
+        if bounds['first'] is None:
+            return []
+
+        tzinfo = tzinfo or timezone.get_current_timezone()
+        first = timezone.localtime(bounds['first'], tzinfo)
+        last = timezone.localtime(bounds['last'], tzinfo)
+        periods = [
+            start for start, following in period_starts(first, last, kind)
+            if self.filter(**{f'{field_name}__gte': start, f'{field_name}__lt': following}).exists()
+        ]
+        return periods if order == 'ASC' else periods[::-1]
 
 
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
-    """Admin configuration for Transaction model"""
+    """
+    Admin configuration for Transaction model, built for a table of millions of rows:
+    estimated counts, searches that only use indexed equality or prefix lookups, a date
+    hierarchy on the created_at index, and actions that update rows with set-based UPDATEs
+    """
     list_display = ('wallet_address', 'status', 'amount', 'created_at', 'ip_address')
-    list_filter = ('status', 'created_at')
-    search_fields = ('wallet_address', 'transaction_hash', 'ip_address')
+    list_filter = ('status',)
+    date_hierarchy = 'created_at'
+    ordering = ('-created_at', '-id')
+    search_fields = ('wallet_address', 'transaction_hash', 'ip_address', 'batch_id')
+    search_help_text = "Wallet address or transaction hash (or a prefix of at least 4 hex digits), IP address, batch ID or transaction ID"
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ('requeue_transactions', 'fail_transactions')
     readonly_fields = ('created_at', 'updated_at')
     fieldsets = (
         (None, {
             'fields': ('wallet_address', 'transaction_hash', 'status', 'amount')
         }),
         ('Details', {
-            'fields': ('ip_address', 'error_message', 'retry_count', 'priority')
+            'fields': ('ip_address', 'error_message', 'retry_count', 'priority', 'batch_id')
+        }),
+        ('Signed Transaction', {
+            'fields': ('nonce', 'gas_price', 'raw_transaction'),
+            'classes': ('collapse',)
         }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at')
         }),
-    )
\ No newline at end of file
+    )
+
+    def changelist_view(self, request, extra_context=None):
+        # Browsing goes to the replica; actions (POST) read and write the primary
+        if request.method != 'GET':
+            return super().changelist_view(request, extra_context)
+        with reads_from_replica():
+            response = super().changelist_view(request, extra_context)
+            # The page's querysets are only evaluated when the template renders
+            if hasattr(response, 'render'):
+                response.render()
+            return response
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return DateHierarchyQuerySet(model=queryset.model, query=queryset.query, using=queryset._db)
+
+    def get_actions(self, request):
+        # The stock delete action loads every selected row into memory first
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Match the term by its shape against one indexed column, never with a leading-wildcard
+        LIKE. Addresses and hashes are stored lowercase, so prefixes are matched case-sensitively.
+        """
+        term = search_term.strip().lower()
+        if not term:
+            return queryset, False
+
+        if len(term) == 42 and HEX_PREFIX_PATTERN.fullmatch(term):
+            return queryset.filter(wallet_address=term), False
+        if len(term) == 66 and HEX_PREFIX_PATTERN.fullmatch(term):
+            return queryset.filter(transaction_hash=term), False
+        if HEX_PREFIX_PATTERN.fullmatch(term):
+            prefix_matches = queryset.filter(wallet_address__startswith=term) | queryset.filter(transaction_hash__startswith=term)
+            return prefix_matches, False
+        if term.isdigit():
+            return queryset.filter(id=int(term)), False
+
+        try:
+            return queryset.filter(ip_address=str(ipaddress.ip_address(term))), False
+        except ValueError:
+            pass
+        try:
+            return queryset.filter(batch_id=uuid.UUID(term)), False
+        except ValueError:
+            pass
+
+        return queryset.none(), False
+
+    def update_rows(self, queryset, **values):
+        """
+        Apply `values` to the rows of `queryset` with one UPDATE per chunk of ids, re-checking
+        the queryset's conditions in the UPDATE itself. Returns the rows it updated.
+        """
+        ids = list(queryset.values_list('id', flat=True))
+        rows = []
+        for start in range(0, len(ids), ADMIN_UPDATE_CHUNK_SIZE):
+            chunk = ids[start:start + ADMIN_UPDATE_CHUNK_SIZE]
+            updated_at = timezone.now()
+            queryset.filter(id__in=chunk).update(updated_at=updated_at, **values)
+            # update() sends no post_save, so the status changes are published here
+            for transaction in Transaction.objects.filter(id__in=chunk, updated_at=updated_at).order_by('created_at', 'id'):
+                transaction_events.publish(transaction)
+                rows.append(transaction)
+        return rows
+
+    @admin.action(description="Requeue selected failed transactions")
+    def requeue_transactions(self, request, queryset):
+        # No more than the queue can hold; the rest can be requeued once it drains
+        failed = queryset.filter(status='failed').order_by('created_at', 'id')
+        ids = list(failed.values_list('id', flat=True)[:transaction_queue.max_size])
+
+        # Unsigned rows were refunded when they failed, so they reserve their amount again
+        reservation = Transaction.objects.filter(
+            id__in=ids, raw_transaction__isnull=True
+        ).aggregate(total=Sum('amount'))['total'] or 0
+        reserved, retry_after = spend_budget.reserve(reservation)
+        if not reserved:
+            self.message_user(
+                request,
+                f"The spend budget can't cover {reservation} ETH now; try again in {retry_after} seconds",
+                messages.ERROR
+            )
+            return
+
+        # Signed bytes are kept: the worker rebroadcasts them, and only re-signs if their nonce was taken
+        rows = self.update_rows(
+            Transaction.objects.filter(id__in=ids, status='failed'),
+            status='pending',
+            error_message=None,
+            retry_count=0
+        )
+
+        enqueued = []
+        try:
+            for transaction in rows:
+                transaction_queue.enqueue_transaction(
+                    transaction.id, transaction.wallet_address, transaction.ip_address, transaction.priority
+                )
+                enqueued.append(transaction)
+        except TransactionQueueFull:
+            # Rows still as this action left them go back to failed; the rest was claimed meanwhile
+            left = rows[len(enqueued):]
+            unqueued = self.update_rows(
+                Transaction.objects.filter(
+                    id__in=[transaction.id for transaction in left],
+                    status='pending',
+                    updated_at__in={transaction.updated_at for transaction in left}
+                ),
+                status='failed',
+                error_message="Transaction queue is full"
+            )
+            self.message_user(
+                request,
+                f"The queue is full; {len(unqueued)} transactions were left failed, requeue them once it drains",
+                messages.WARNING
+            )
+
+        # Whatever was reserved for rows that didn't get queued goes back
+        unsigned = [transaction for transaction in enqueued if transaction.raw_transaction is None]
+        spend_budget.refund(reservation - sum((transaction.amount for transaction in unsigned), 0))
+        for transaction in unsigned:
+            if transaction.batch_id is None:
+                wallet_caps.record(transaction.wallet_address)
+
+        self.message_user(request, f"Requeued {len(enqueued)} failed transactions")
+
+    @admin.action(description="Mark selected pending transactions as failed")
+    def fail_transactions(self, request, queryset):
+        # Signed rows may still be mined, so they are left to the worker
+        rows = self.update_rows(
+            queryset.filter(status='pending', nonce__isnull=True),
+            status='failed',
+            error_message="Failed by an administrator"
+        )
+
+        # Never signed, so never sent: the same returns as a row the worker fails for good
+        spend_budget.refund(sum((transaction.amount for transaction in rows), 0))
+        for transaction in rows:
+            if transaction.batch_id is None:
+                wallet_caps.release(transaction.wallet_address, transaction.created_at)
+
+        skipped = queryset.filter(status='pending', nonce__isnull=False).count()
+        message = f"Marked {len(rows)} pending transactions as failed"
+        if skipped:
+            message += f"; {skipped} already signed transactions were left alone"
+        self.message_user(request, message)
+
+
+@admin.register(Partner)
+class PartnerAdmin(admin.ModelAdmin):
+    """Admin configuration for Partner model; keys are issued with the create_faucet_partner command"""
+    list_display = ('name', 'daily_quota', 'is_active', 'created_at')
+    list_filter = ('is_active',)
+    search_fields = ('name',)
+    readonly_fields = ('api_key_hash', 'created_at')
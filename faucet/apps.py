@@ -1,3 +1,4 @@
+import logging
 from django.apps import AppConfig
 
 
@@ -10,9 +11,27 @@ class FaucetConfig(AppConfig):
         Start the transaction queue worker when Django is ready.
         This ensures the worker is started when running with gunicorn.
         """
+        # Register signal handlers that publish transaction status changes
+        from . import signals  # noqa: F401
+
         from .services.transaction_queue import transaction_queue
+        from .services.chain_heads import chain_heads
 
-        # Start the worker only if running with Django server, not during migrations or other commands
+        # Start the worker only if running with Django server, not during migrations or other commands.
+        # In external mode the run_faucet_worker command does the sending instead.
         import sys
-        if 'runserver' in sys.argv or 'gunicorn' in sys.argv[0]:
-            transaction_queue.start_worker()
\ No newline at end of file
+        serving = 'runserver' in sys.argv or 'gunicorn' in sys.argv[0]
+        if serving:
+            # Only does anything if ETHEREUM_WS_PROVIDER_URL is set
+            chain_heads.start()
+        if transaction_queue.external:
+            return
+        if serving:
+            # Rows a previous run left pending (signed bytes awaiting rebroadcast, retries
+            # that were waiting in memory) would otherwise never be sent. Other processes
+            # may recover the same rows; each item is claimed before it is processed.
+            try:
+                transaction_queue.recover_pending()
+            except Exception as e:
+                logging.getLogger(__name__).error(f"Failed to recover pending transactions: {str(e)}")
+            transaction_queue.start_worker()
@@ -0,0 +1,37 @@
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.permissions import BasePermission
+from .models import Partner
+
+
+class PartnerAPIKeyAuthentication(BaseAuthentication):
+    """Authenticates partners by the `Authorization: Api-Key <key>` header"""
+    keyword = 'Api-Key'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed("Invalid API key header")
+
+        try:
+            api_key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed("Invalid API key header")
+
+        partner = Partner.objects.filter(api_key_hash=Partner.hash_key(api_key), is_active=True).first()
+        if partner is None:
+            raise exceptions.AuthenticationFailed("Invalid API key")
+        return (partner, None)
+
+    def authenticate_header(self, request):
+        # Makes DRF answer 401 with a WWW-Authenticate challenge instead of 403
+        return self.keyword
+
+
+class IsPartner(BasePermission):
+    """Allows access only to requests authenticated as a partner"""
+
+    def has_permission(self, request, view):
+        return isinstance(request.user, Partner)
@@ -0,0 +1,149 @@
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime, timezone as dt_timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# Record attributes set with `extra=` that the JSON formatter includes
+CONTEXT_FIELDS = ('transaction_id', 'batch_id', 'trace_id', 'span_id', 'suppressed')
+
+_tracer = None
+
+
+def current_trace_ids():
+    """(trace_id, span_id) of the current span, or (None, None) outside a trace"""
+    global _tracer
+    if _tracer is None:
+        # Imported on first use: logging is configured before the faucet app is loaded
+        from .services.tracing import tracer as _tracer
+    span = _tracer.current_span()
+    context = getattr(span, 'context', None)
+    if context is None:
+        return None, None
+    return context.trace_id, context.span_id
+
+
+class TraceContextFilter(logging.Filter):
+    """Stamps records with the current trace while still on the thread that logged them"""
+
+    def filter(self, record):
+        if getattr(record, 'trace_id', None) is None:
+            record.trace_id, record.span_id = current_trace_ids()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Lets through at most `rate` records per second (bursts of up to `burst`) for each
+    message template, or for the `sample_key` given in `extra`. Records at `max_level`
+    and above always pass. The next record let through for a key carries the number
+    suppressed since the last one as `suppressed`. A rate of 0 disables sampling.
+    """
+
+    def __init__(self, rate=10.0, burst=20, max_level='ERROR', max_keys=10000):
+        super().__init__()
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.max_level = logging.getLevelName(max_level) if isinstance(max_level, str) else max_level
+        self.max_keys = max_keys
+        self.buckets = {}  # key -> [tokens, updated_at, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if self.rate <= 0 or record.levelno >= self.max_level:
+            return True
+
+        key = getattr(record, 'sample_key', None) or (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                if len(self.buckets) >= self.max_keys:
+                    # Unbounded templates (f-strings) would otherwise grow this forever
+                    self.buckets.clear()
+                bucket = self.buckets[key] = [self.burst, now, 0]
+
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                return False
+            bucket[0] -= 1
+            if bucket[2]:
+                record.suppressed = bucket[2]
+                bucket[2] = 0
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, with the context fields of the record when they are set"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, dt_timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info or record.exc_text:
+            entry['exception'] = record.exc_text or self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class BackgroundStreamHandler(QueueHandler):
+    """
+    Stream handler that never blocks the caller: records go onto a bounded queue and a
+    listener thread formats and writes them. The message is formatted there too, so
+    %-style arguments are only rendered for records that are actually written. When the
+    queue is full records are dropped and counted rather than stalling a request.
+    """
+
+    def __init__(self, stream=None, maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        self.target = logging.StreamHandler(stream)
+        self.dropped = 0
+        self.listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def setFormatter(self, fmt):
+        # Formatting happens on the listener thread
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # QueueHandler.prepare would format the message here, on the logging thread
+        return record
+
+    def enqueue(self, record):
+        # Threads don't survive a fork (gunicorn workers), so each process starts its own listener
+        if self._pid != os.getpid():
+            self.start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self):
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self.listener = QueueListener(self.queue, self.target)
+            self.listener.start()
+            self._pid = os.getpid()
+            atexit.register(self.flush_and_stop)
+
+    def flush_and_stop(self):
+        """Write everything queued and stop the listener"""
+        if self.listener is not None and self._pid == os.getpid():
+            self.listener.stop()
+            self.listener = None
+            self._pid = None
+        self.target.flush()
@@ -0,0 +1,59 @@
+import os
+import time
+from django.core.management.base import BaseCommand
+from eth_account import Account
+from faucet.services.signing import TransactionSigner
+
+
+class Command(BaseCommand):
+    help = "Measure transaction signing throughput for different signing process counts"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count',
+            type=int,
+            default=2000,
+            help="Transactions to sign per run"
+        )
+        parser.add_argument(
+            '--processes',
+            default=None,
+            help="Comma-separated process counts to compare (default: 1 up to the number of CPUs)"
+        )
+
+    def handle(self, *args, **options):
+        if options['processes']:
+            process_counts = [int(count) for count in options['processes'].split(',')]
+        else:
+            process_counts = list(range(1, (os.cpu_count() or 1) + 1))
+
+        # Throwaway key: the benchmark never broadcasts anything
+        account = Account.create()
+        transactions = [
+            {
+                'nonce': nonce,
+                'to': account.address,
+                'value': 100000000000000,
+                'gas': 21000,
+                'gasPrice': 20000000000,
+                'chainId': 11155111,
+            }
+            for nonce in range(options['count'])
+        ]
+
+        baseline = None
+        for processes in process_counts:
+            signer = TransactionSigner(account.key, processes=processes)
+            try:
+                # Warm up so pool startup and key loading aren't counted
+                signer.sign_batch(transactions[:signer.min_batch * max(processes, 1)])
+
+                started_at = time.perf_counter()
+                signed = signer.sign_batch(transactions)
+                elapsed = time.perf_counter() - started_at
+            finally:
+                signer.shutdown()
+
+            rate = len(signed) / elapsed
+            baseline = baseline or rate
+            self.stdout.write(f"processes={processes}: {rate:,.0f} signatures/sec ({rate / baseline:.2f}x)")
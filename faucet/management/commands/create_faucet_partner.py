@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from faucet.models import Partner
+
+
+class Command(BaseCommand):
+    help = "Create a partner for the bulk funding endpoint and print its API key"
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', help="Partner name, e.g. the hackathon or CI project")
+        parser.add_argument(
+            '--daily-quota',
+            type=int,
+            default=1000,
+            help="Addresses the partner may fund per UTC day"
+        )
+
+    def handle(self, *args, **options):
+        partner, api_key = Partner.create_with_key(options['name'], daily_quota=options['daily_quota'])
+        self.stdout.write(f"Created partner {partner.id} ({partner.name}) with a daily quota of {partner.daily_quota}")
+        # Only a hash is stored, so this is the one chance to see the key
+        self.stdout.write(f"API key: {api_key}")
@@ -0,0 +1,109 @@
+import os
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+from faucet.services.partitions import PartitionManager
+
+
+class Command(BaseCommand):
+    help = "Create upcoming Transaction partitions and archive the ones past the retention window"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--create-ahead',
+            type=int,
+            default=4,
+            help="Partitions to keep ready beyond the current period"
+        )
+        parser.add_argument(
+            '--retention-days',
+            type=int,
+            default=None,
+            help="Archive partitions entirely older than this (default: TRANSACTION_RETENTION_DAYS)"
+        )
+        parser.add_argument(
+            '--archive-dir',
+            default=None,
+            help="Directory for archived partitions (default: TRANSACTION_ARCHIVE_DIR)"
+        )
+        parser.add_argument(
+            '--format',
+            choices=['jsonl', 'parquet'],
+            default='jsonl',
+            help="Archive format: gzip-compressed JSON lines, or Parquet (needs pyarrow)"
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Only report what would be created and archived"
+        )
+        parser.add_argument(
+            '--every',
+            type=float,
+            default=0,
+            help="Keep running, repeating the maintenance every this many seconds (0: run once)"
+        )
+
+    def handle(self, *args, **options):
+        if not options['every']:
+            return self.maintain(options)
+
+        while True:
+            try:
+                self.maintain(options)
+                delay = options['every']
+            except (CommandError, DatabaseError) as e:
+                # e.g. the web service hasn't applied the migrations yet
+                self.stderr.write(f"Partition maintenance failed: {str(e)}")
+                delay = min(60, options['every'])
+            time.sleep(delay)
+
+    def maintain(self, options):
+        manager = PartitionManager()
+        if not manager.is_partitioned():
+            raise CommandError("The transaction table is not partitioned; partitioning requires PostgreSQL")
+
+        if options['format'] == 'parquet':
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise CommandError("Parquet archives need the pyarrow package")
+
+        retention_days = options['retention_days'] or getattr(settings, 'TRANSACTION_RETENTION_DAYS', 90)
+        archive_dir = options['archive_dir'] or getattr(settings, 'TRANSACTION_ARCHIVE_DIR', 'archive')
+        dry_run = options['dry_run']
+
+        if dry_run:
+            existing = {name for name, _, _ in manager.partitions()}
+            self.stdout.write(f"{len(existing)} partitions attached")
+        else:
+            for name in manager.create_ahead(options['create_ahead']):
+                self.stdout.write(f"Created partition {name}")
+
+        default_rows = manager.default_partition_rows()
+        if default_rows:
+            self.stderr.write(
+                f"{default_rows} rows are in the default partition; they are outside every range "
+                f"partition and are moved into their own partition when it is created"
+            )
+
+        # Detached by an earlier run that stopped before exporting and dropping them
+        leftovers = manager.detached_partitions()
+        expired = manager.expired(retention_days)
+        if not leftovers and not expired:
+            self.stdout.write(f"No partitions older than {retention_days} days")
+            return
+
+        if dry_run:
+            for name in leftovers + expired:
+                self.stdout.write(f"Would archive partition {name} to {archive_dir}")
+            return
+
+        os.makedirs(archive_dir, exist_ok=True)
+        for name in leftovers:
+            path, count = manager.archive(name, archive_dir, options['format'], detach=False)
+            self.stdout.write(f"Archived partition {name} ({count} rows) to {path}")
+        for name in expired:
+            path, count = manager.archive(name, archive_dir, options['format'])
+            self.stdout.write(f"Archived partition {name} ({count} rows) to {path}")
@@ -0,0 +1,81 @@
+import os
+import json
+import time
+import signal
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from faucet.services.profiling import profile_dir, stack_request_path
+
+
+class Command(BaseCommand):
+    help = "Sample the thread stacks of a running run_faucet_worker process into a flame graph file, or report its memory"
+
+    def add_arguments(self, parser):
+        parser.add_argument('pid', type=int, help="Process id of the worker")
+        parser.add_argument(
+            '--seconds',
+            type=float,
+            default=getattr(settings, 'PROFILE_STACK_SECONDS', 30),
+            help="How long to sample for"
+        )
+        parser.add_argument(
+            '--threads',
+            default='faucet-worker',
+            help="Only sample threads whose name starts with this (empty for all threads)"
+        )
+        parser.add_argument(
+            '--memory',
+            choices=['snapshot', 'diff', 'top'],
+            default=None,
+            help="Instead of sampling stacks, take a tracemalloc baseline, diff against it or list the largest allocation sites"
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=25,
+            help="Allocation sites to list in a memory report"
+        )
+        parser.add_argument(
+            '--output',
+            default=None,
+            help="File to write (default: a new file in PROFILE_DIR)"
+        )
+
+    def handle(self, *args, **options):
+        pid = options['pid']
+        if options['memory']:
+            default_name = f"memory-{time.strftime('%Y%m%dT%H%M%S')}-{pid}.txt"
+            request = {'memory': options['memory'], 'limit': options['limit']}
+            # A snapshot of a large heap takes a while, but doesn't depend on --seconds
+            wait = 60
+        else:
+            default_name = f"stacks-{time.strftime('%Y%m%dT%H%M%S')}-{pid}.folded"
+            request = {'seconds': options['seconds'], 'threads': options['threads']}
+            wait = options['seconds'] + 10
+        output = os.path.abspath(options['output'] or os.path.join(profile_dir(), default_name))
+        if os.path.exists(output):
+            raise CommandError(f"{output} already exists")
+
+        # The worker reads its options from here when the signal arrives
+        with open(stack_request_path(pid), 'w') as f:
+            json.dump({**request, 'output': output}, f)
+        try:
+            os.kill(pid, signal.SIGUSR2)
+        except ProcessLookupError:
+            os.remove(stack_request_path(pid))
+            raise CommandError(f"No process with id {pid}")
+
+        if options['memory']:
+            self.stdout.write(f"Asking process {pid} for a memory {options['memory']}...")
+        else:
+            self.stdout.write(f"Sampling process {pid} for {options['seconds']} seconds...")
+        stop_at = time.monotonic() + wait
+        while not os.path.exists(output):
+            if time.monotonic() > stop_at:
+                raise CommandError(f"Process {pid} wrote nothing; is it a run_faucet_worker process?")
+            time.sleep(0.2)
+
+        if options['memory']:
+            self.stdout.write(f"Wrote {output}")
+        else:
+            self.stdout.write(f"Wrote {output}; render it with flamegraph.pl or open it in speedscope")
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+from faucet.services.wallet_caps import wallet_caps
+
+
+class Command(BaseCommand):
+    help = "Recreate the wallet cap filters in Redis from the lifetime counts and the transaction table"
+
+    def handle(self, *args, **options):
+        if not wallet_caps.enabled:
+            raise CommandError("No wallet caps are configured (WALLET_CAP_PER_WINDOW / WALLET_CAP_LIFETIME)")
+        try:
+            count = wallet_caps.rebuild()
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        self.stdout.write(f"Rebuilt wallet cap filters from {count} payouts")
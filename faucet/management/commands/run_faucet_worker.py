@@ -0,0 +1,149 @@
+import json
+import time
+import signal
+import threading
+import logging
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from faucet.services.transaction_queue import transaction_queue
+from faucet.services.chain_heads import chain_heads
+from faucet.services.profiling import install_signal_handler
+from faucet.services.memory import memory_tracker, rss_bytes
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Run the transaction queue worker as a standalone process, separate from the web tier"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=getattr(settings, 'TRANSACTION_QUEUE_CONCURRENCY', 1),
+            help="Number of worker threads sending transactions"
+        )
+        parser.add_argument(
+            '--drain-timeout',
+            type=float,
+            default=30.0,
+            help="Seconds to wait for in-flight transactions to finish on shutdown"
+        )
+        parser.add_argument(
+            '--health-interval',
+            type=float,
+            default=getattr(settings, 'TRANSACTION_QUEUE_HEALTH_INTERVAL', 10),
+            help="Seconds between health reports"
+        )
+        parser.add_argument(
+            '--health-file',
+            default=None,
+            help="Also write the health report to this file (for container liveness checks)"
+        )
+        parser.add_argument(
+            '--max-items',
+            type=int,
+            default=getattr(settings, 'WORKER_MAX_ITEMS', 0),
+            help="Drain and exit after processing this many items, for the supervisor to restart (0: never)"
+        )
+        parser.add_argument(
+            '--max-rss-mb',
+            type=float,
+            default=getattr(settings, 'WORKER_MAX_RSS_MB', 0),
+            help="Drain and exit once resident memory exceeds this many MiB (0: never)"
+        )
+
+    def handle(self, *args, **options):
+        if not transaction_queue.external:
+            # Web processes would run their own worker threads beside this one
+            raise CommandError("run_faucet_worker requires TRANSACTION_QUEUE_WORKER=external for every process")
+
+        self.stop_requested = threading.Event()
+        signal.signal(signal.SIGTERM, self.handle_signal)
+        signal.signal(signal.SIGINT, self.handle_signal)
+        # SIGUSR2 (sent by profile_worker) samples the worker threads' stacks
+        install_signal_handler()
+
+        transaction_queue.is_worker_process = True
+        transaction_queue.worker_count = options['concurrency']
+        transaction_queue.health_interval = options['health_interval']
+
+        # Pick up work left pending by previous workers, then start pulling new work
+        transaction_queue.recover_pending()
+        chain_heads.start()
+        if getattr(settings, 'MEMORY_TRACE_FRAMES', 0):
+            memory_tracker.start()
+        if transaction_queue.external:
+            transaction_queue.start_consumer()
+        transaction_queue.start_worker()
+
+        self.stdout.write(f"Faucet worker {transaction_queue.worker_id} started with concurrency {options['concurrency']}")
+
+        memory_report_interval = getattr(settings, 'MEMORY_REPORT_INTERVAL', 3600)
+        next_memory_report = time.monotonic() + memory_report_interval
+        recycle_reason = None
+        while not self.stop_requested.is_set():
+            self.report_health(options['health_file'])
+            if memory_tracker.tracing and memory_report_interval and time.monotonic() >= next_memory_report:
+                memory_tracker.log_top()
+                next_memory_report = time.monotonic() + memory_report_interval
+            recycle_reason = self.recycle_reason(options['max_items'], options['max_rss_mb'])
+            if recycle_reason:
+                logger.warning(f"Recycling worker {transaction_queue.worker_id}: {recycle_reason}")
+                break
+            self.stop_requested.wait(options['health_interval'])
+
+        self.drain(options['drain_timeout'])
+        if recycle_reason:
+            self.stdout.write(f"Faucet worker {transaction_queue.worker_id} recycled after {recycle_reason}")
+        else:
+            self.stdout.write(f"Faucet worker {transaction_queue.worker_id} stopped")
+
+    def handle_signal(self, signum, frame):
+        """Begin a graceful shutdown on SIGTERM/SIGINT"""
+        logger.info(f"Received signal {signum}, draining worker")
+        self.stop_requested.set()
+
+    def recycle_reason(self, max_items, max_rss_mb):
+        """
+        Why this process should be replaced by a fresh one, or None. A slow leak is then
+        bounded: the worker drains like on SIGTERM and exits, and its supervisor restarts it.
+        """
+        if max_items and transaction_queue.processed_count >= max_items:
+            return f"{transaction_queue.processed_count} items"
+        if max_rss_mb:
+            rss = rss_bytes()
+            if rss is not None and rss > max_rss_mb * 1024 * 1024:
+                return f"reaching {rss / (1024 * 1024):.0f} MiB resident memory"
+        return None
+
+    def report_health(self, health_file):
+        """Publish the health report, and write it to a file if requested"""
+        try:
+            report = transaction_queue.report_health()
+            if health_file:
+                with open(health_file, 'w') as f:
+                    json.dump(report, f)
+        except Exception as e:
+            logger.error(f"Failed to report worker health: {str(e)}")
+
+    def drain(self, drain_timeout):
+        """Stop taking work, hand back unstarted items and let in-flight sends finish"""
+        transaction_queue.stop_consumer()
+        if transaction_queue.external:
+            # The scheduler moves due retries from Redis into the local queue; once it has
+            # stopped, nothing arrives there after the items are handed back
+            transaction_queue.retry_scheduler.stop()
+            transaction_queue.return_local_items()
+
+        stop_at = time.monotonic() + drain_timeout
+        while time.monotonic() < stop_at and (
+            transaction_queue.in_flight > 0
+            or (not transaction_queue.external and transaction_queue.queue.qsize() > 0)
+        ):
+            time.sleep(0.1)
+
+        transaction_queue.stop_worker()
+        chain_heads.stop()
+        if transaction_queue.external:
+            transaction_queue.backend.remove_health(transaction_queue.worker_id)
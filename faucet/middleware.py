@@ -0,0 +1,29 @@
+from .services.tracing import tracer, SERVER
+
+
+class TracingMiddleware:
+    """
+    Trace each request as a server span, continuing the caller's trace if the request
+    carries a W3C traceparent header
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not tracer.enabled:
+            return self.get_response(request)
+
+        attributes = {
+            'http.request.method': request.method,
+            'url.path': request.path,
+        }
+        with tracer.span(request.method, attributes, kind=SERVER, parent=request.headers.get('traceparent')) as span:
+            response = self.get_response(request)
+            match = request.resolver_match
+            if match is not None:
+                route = f"/{match.route}"
+                span.name = f"{request.method} {route}"
+                span.set_attribute('http.route', route)
+            span.set_attribute('http.response.status_code', response.status_code)
+            return response
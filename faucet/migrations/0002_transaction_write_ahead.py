@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('faucet', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='gas_price',
+            field=models.DecimalField(blank=True, decimal_places=0, max_digits=30, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='nonce',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='raw_transaction',
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,144 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:50
+
+from datetime import datetime, timedelta, timezone
+from django.conf import settings
+from django.db import migrations, models
+
+# Partitions created up front, beyond the current period; manage_partitions keeps this going
+PERIODS_AHEAD = 4
+
+
+def _period_start(moment, interval):
+    start = moment.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == 'week':
+        start -= timedelta(days=start.weekday())
+    return start
+
+
+def _recreate_indexes(schema_editor, model):
+    for index in model._meta.indexes:
+        schema_editor.add_index(model, index)
+
+
+def partition_transactions(apps, schema_editor):
+    """
+    Rebuild faucet_transaction as a table range-partitioned by created_at (PostgreSQL only).
+    The primary key becomes (id, created_at), as Postgres requires the partition key in
+    unique constraints; ids still come from one sequence, so they stay unique.
+
+    The rows are copied in this migration's transaction, which keeps the table locked
+    until the copy is done: on a large table, run it in a maintenance window with the
+    web and worker processes stopped. A failure part way rolls everything back.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    Transaction = apps.get_model('faucet', 'Transaction')
+    interval = getattr(settings, 'TRANSACTION_PARTITION_INTERVAL', 'week')
+    step = timedelta(days=7 if interval == 'week' else 1)
+    execute = schema_editor.execute
+
+    execute("ALTER TABLE faucet_transaction RENAME TO faucet_transaction_legacy")
+    execute(
+        "CREATE TABLE faucet_transaction (LIKE faucet_transaction_legacy INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (created_at)"
+    )
+    # Catches rows outside every range partition, so inserts never fail for lack of one
+    execute("CREATE TABLE faucet_transaction_default PARTITION OF faucet_transaction DEFAULT")
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT min(created_at), coalesce(max(id), 0) FROM faucet_transaction_legacy")
+        oldest, max_id = cursor.fetchone()
+
+    now = datetime.now(timezone.utc)
+    start = _period_start(oldest or now, interval)
+    last = _period_start(now, interval) + step * PERIODS_AHEAD
+    while start <= last:
+        execute(
+            f"CREATE TABLE faucet_transaction_p{start:%Y%m%d} PARTITION OF faucet_transaction "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{(start + step).isoformat()}')"
+        )
+        start += step
+
+    execute("INSERT INTO faucet_transaction SELECT * FROM faucet_transaction_legacy")
+    execute("DROP TABLE faucet_transaction_legacy")
+
+    # The legacy identity sequence went with the old table; a plain sequence replaces it
+    execute(f"CREATE SEQUENCE faucet_transaction_id_seq START WITH {max_id + 1} OWNED BY faucet_transaction.id")
+    execute("ALTER TABLE faucet_transaction ALTER COLUMN id SET DEFAULT nextval('faucet_transaction_id_seq')")
+    execute("ALTER TABLE faucet_transaction ADD PRIMARY KEY (id, created_at)")
+    _recreate_indexes(schema_editor, Transaction)
+
+
+def unpartition_transactions(apps, schema_editor):
+    """Move the rows back into a plain table with an identity primary key"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    Transaction = apps.get_model('faucet', 'Transaction')
+    execute = schema_editor.execute
+
+    execute("ALTER TABLE faucet_transaction RENAME TO faucet_transaction_partitioned")
+    execute("CREATE TABLE faucet_transaction (LIKE faucet_transaction_partitioned INCLUDING DEFAULTS)")
+    execute("ALTER TABLE faucet_transaction ALTER COLUMN id DROP DEFAULT")
+    execute("INSERT INTO faucet_transaction SELECT * FROM faucet_transaction_partitioned")
+    execute("DROP TABLE faucet_transaction_partitioned CASCADE")
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT coalesce(max(id), 0) FROM faucet_transaction")
+        max_id = cursor.fetchone()[0]
+
+    execute(f"ALTER TABLE faucet_transaction ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY (START WITH {max_id + 1})")
+    execute("ALTER TABLE faucet_transaction ADD PRIMARY KEY (id)")
+    _recreate_indexes(schema_editor, Transaction)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('faucet', '0003_partner_bulk_funding'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='faucet_tran_wallet__c49ff4_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='faucet_tran_status_5d1276_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='faucet_tran_created_d24396_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='faucet_tran_ip_addr_2f96ca_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='faucet_tran_updated_738818_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='faucet_tran_priorit_d9a7dc_idx',
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['status', 'created_at'], name='faucet_tran_status_1ef5d2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['wallet_address', 'created_at'], name='faucet_tran_wallet__534c15_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['ip_address', 'created_at'], name='faucet_tran_ip_addr_7f96e1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['created_at', 'id'], name='faucet_tran_created_281e60_idx'),
+        ),
+        migrations.RunPython(partition_transactions, unpartition_transactions),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('faucet', '0004_partition_transactions'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['wallet_address'], name='faucet_tx_wallet_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['transaction_hash'], name='faucet_tx_hash_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
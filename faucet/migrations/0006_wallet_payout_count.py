@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-19 06:29
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def count_existing_payouts(apps, schema_editor):
+    """Seed the lifetime counts from the payouts still in the transaction table"""
+    Transaction = apps.get_model('faucet', 'Transaction')
+    WalletPayoutCount = apps.get_model('faucet', 'WalletPayoutCount')
+    counts = (
+        Transaction.objects.filter(status__in=('pending', 'success'), batch_id__isnull=True)
+        .annotate(wallet=Lower('wallet_address'))
+        .values('wallet')
+        .annotate(payouts=Count('id'))
+    )
+    WalletPayoutCount.objects.bulk_create(
+        (WalletPayoutCount(wallet_address=row['wallet'], count=row['payouts']) for row in counts.iterator()),
+        batch_size=5000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('faucet', '0005_transaction_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WalletPayoutCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('wallet_address', models.CharField(max_length=42, unique=True)),
+                ('count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(count_existing_payouts, migrations.RunPython.noop),
+    ]
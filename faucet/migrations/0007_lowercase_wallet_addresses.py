@@ -0,0 +1,38 @@
+from django.db import migrations
+from django.db.models import Max, Min
+from django.db.models.functions import Lower
+
+# Rows whose ids fall in one UPDATE; each range is its own transaction
+CHUNK_SIZE = 50000
+
+
+def lowercase_wallet_addresses(apps, schema_editor):
+    """
+    Store the wallet addresses written before addresses were normalized in their canonical
+    lowercase form, so the equality lookups on the wallet_address index find them.
+    Only rows with uppercase letters are rewritten.
+    """
+    Transaction = apps.get_model('faucet', 'Transaction')
+    bounds = Transaction.objects.aggregate(first=Min('id'), last=Max('id'))
+    if bounds['first'] is None:
+        return
+
+    for start in range(bounds['first'], bounds['last'] + 1, CHUNK_SIZE):
+        Transaction.objects.filter(
+            id__gte=start, id__lt=start + CHUNK_SIZE
+        ).exclude(
+            wallet_address=Lower('wallet_address')
+        ).update(wallet_address=Lower('wallet_address'))
+
+
+class Migration(migrations.Migration):
+    # Not one long transaction over the whole table
+    atomic = False
+
+    dependencies = [
+        ('faucet', '0006_wallet_payout_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(lowercase_wallet_addresses, migrations.RunPython.noop),
+    ]
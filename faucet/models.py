@@ -1,3 +1,5 @@
+import hashlib
+import secrets
 from django.db import models
 
 
@@ -21,15 +23,68 @@ class Transaction(models.Model):
     retry_count = models.IntegerField(default=0)  # Track retry attempts for failed transactions
     priority = models.IntegerField(default=0)  # Lower numbers = higher priority
 
+    # Write-ahead record of the signed transfer, saved before broadcast so recovery can resend the exact bytes
+    raw_transaction = models.TextField(null=True, blank=True)  # Signed transaction as a hex string
+    nonce = models.BigIntegerField(null=True, blank=True)
+    gas_price = models.DecimalField(max_digits=30, decimal_places=0, null=True, blank=True)  # In Wei
+
+    batch_id = models.UUIDField(null=True, blank=True)  # Set for rows created together by a partner bulk request
+
     def __str__(self):
         return f"{self.wallet_address} - {self.status} - {self.created_at}"
 
     class Meta:
+        # On PostgreSQL the table is range-partitioned by created_at (see migration 0004), so
+        # indexes lead with the column queries filter on and end with created_at for pruning
         indexes = [
-            models.Index(fields=['wallet_address']),
-            models.Index(fields=['status']),
-            models.Index(fields=['created_at']),
-            models.Index(fields=['ip_address']),
-            models.Index(fields=['updated_at']),
-            models.Index(fields=['priority']),  # For priority-based processing
-        ]
\ No newline at end of file
+            models.Index(fields=['status', 'created_at']),  # Pending recovery, stats
+            models.Index(fields=['wallet_address', 'created_at']),  # Per-wallet history
+            models.Index(fields=['ip_address', 'created_at']),  # Per-IP history
+            models.Index(fields=['created_at', 'id']),  # Time ranges and keyset pagination
+            models.Index(fields=['batch_id']),
+            # Prefix search in the admin: pattern ops let LIKE 'abc%' use the index under any collation
+            models.Index(fields=['wallet_address'], name='faucet_tx_wallet_prefix_idx', opclasses=['varchar_pattern_ops']),
+            models.Index(fields=['transaction_hash'], name='faucet_tx_hash_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ]
+
+
+class WalletPayoutCount(models.Model):
+    """
+    Payouts ever made to a wallet, for the lifetime wallet cap. Kept outside the partitioned
+    Transaction table, so the count survives the archiving of old partitions.
+    """
+    wallet_address = models.CharField(max_length=42, unique=True)
+    count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.wallet_address} - {self.count}"
+
+
+class Partner(models.Model):
+    """Organization (hackathon, CI pipeline) allowed to fund many addresses per request via API key"""
+
+    name = models.CharField(max_length=100)
+    api_key_hash = models.CharField(max_length=64, unique=True)  # SHA-256 of the key; the key itself is never stored
+    daily_quota = models.IntegerField(default=1000)  # Addresses fundable per UTC day
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def is_authenticated(self):
+        # Lets DRF treat an authenticated partner like a logged-in user
+        return True
+
+    @staticmethod
+    def hash_key(api_key):
+        return hashlib.sha256(api_key.encode()).hexdigest()
+
+    @classmethod
+    def create_with_key(cls, name, **fields):
+        """Create a partner and return it with its API key, which can't be recovered later"""
+        api_key = secrets.token_urlsafe(32)
+        partner = cls.objects.create(name=name, api_key_hash=cls.hash_key(api_key), **fields)
+        return partner, api_key
\ No newline at end of file
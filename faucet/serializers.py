@@ -1,5 +1,7 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import Transaction
+from .services.addresses import normalize_address, InvalidAddressError
 
 
 class WalletAddressSerializer(serializers.Serializer):
@@ -7,14 +9,60 @@ class WalletAddressSerializer(serializers.Serializer):
     wallet_address = serializers.CharField(max_length=42)
 
     def validate_wallet_address(self, value):
-        """Validate the wallet address format"""
-        # Basic Ethereum address validation
-        if not value.startswith('0x') or len(value) != 42:
-            raise serializers.ValidationError("Invalid Ethereum wallet address format")
+        """Validate the wallet address (format and EIP-55 checksum) and normalize it to lowercase"""
+        try:
+            return normalize_address(value)
+        except InvalidAddressError as e:
+            raise serializers.ValidationError(str(e))
 
-        # Additional validation could be added here
 
-        return value
+class BulkFundSerializer(serializers.Serializer):
+    """Serializer for bulk funding input; addresses are checked one by one in the view"""
+    wallet_addresses = serializers.ListField(
+        child=serializers.CharField(max_length=100),
+        allow_empty=False,
+        max_length=getattr(settings, 'FAUCET_BULK_MAX_ADDRESSES', 500)
+    )
+
+
+class TransactionHistoryQuerySerializer(serializers.Serializer):
+    """Serializer for transaction history filters, given as query parameters"""
+    wallet = serializers.CharField(max_length=42, required=False)
+    ip = serializers.IPAddressField(required=False)
+    status = serializers.ChoiceField(choices=Transaction.STATUS_CHOICES, required=False)
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+    cursor = serializers.CharField(max_length=200, required=False)
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=getattr(settings, 'TRANSACTION_HISTORY_MAX_PAGE_SIZE', 500),
+        default=100
+    )
+
+    def validate_wallet(self, value):
+        """Stored addresses are lowercase, so filter on the canonical form"""
+        try:
+            return normalize_address(value)
+        except InvalidAddressError as e:
+            raise serializers.ValidationError(str(e))
+
+    def validate(self, data):
+        if data.get('since') and data.get('until') and data['since'] >= data['until']:
+            raise serializers.ValidationError("'since' must be before 'until'")
+        return data
+
+
+class ProfilingRequestSerializer(serializers.Serializer):
+    """Serializer for arming the profilers of the process serving the request"""
+    requests = serializers.IntegerField(min_value=0, max_value=100, required=False)
+    stack_seconds = serializers.FloatField(min_value=0.1, max_value=300, required=False)
+    threads = serializers.CharField(max_length=100, required=False, default='')
+    memory = serializers.ChoiceField(choices=['snapshot', 'diff', 'top', 'stop'], required=False)
+
+    def validate(self, data):
+        if not {'requests', 'stack_seconds', 'memory'} & set(data):
+            raise serializers.ValidationError("Give at least one of 'requests', 'stack_seconds' and 'memory'")
+        return data
 
 
 class TransactionResponseSerializer(serializers.Serializer):
@@ -32,5 +80,6 @@ class StatsResponseSerializer(serializers.Serializer):
     failed_transactions = serializers.IntegerField()
     pending_transactions = serializers.IntegerField(required=False)
     queue_size = serializers.IntegerField(required=False)
+    estimated_wait_seconds = serializers.FloatField(required=False)
     time_period = serializers.CharField(required=False)
     faucet_balance = serializers.FloatField(required=False)
\ No newline at end of file
@@ -0,0 +1,60 @@
+import re
+from functools import lru_cache
+from eth_utils import keccak
+
+# 0x followed by exactly 40 hex digits
+ADDRESS_PATTERN = re.compile(r'0x[0-9a-fA-F]{40}')
+
+# Distinct addresses whose validation result is kept; repeat requests skip the keccak
+ADDRESS_CACHE_SIZE = 65536
+
+
+class InvalidAddressError(ValueError):
+    """The string is not a well-formed Ethereum address (or has a bad EIP-55 checksum)"""
+
+
+@lru_cache(maxsize=ADDRESS_CACHE_SIZE)
+def _canonical(address):
+    """Lowercase form of a valid address, or None if it is invalid"""
+    if not ADDRESS_PATTERN.fullmatch(address):
+        return None
+
+    hex_digits = address[2:]
+    lower = hex_digits.lower()
+    if hex_digits != lower and hex_digits != hex_digits.upper():
+        # Mixed case means EIP-55: each letter is uppercase iff its nibble of keccak(lowercase hex) >= 8
+        digest = keccak(text=lower).hex()
+        for char, nibble in zip(hex_digits, digest):
+            if char.isalpha() and char.isupper() != (int(nibble, 16) >= 8):
+                return None
+
+    return '0x' + lower
+
+
+def normalize_address(address):
+    """
+    Validate an address and return its canonical lowercase form, which is what is stored
+    and used for rate-limit keys. Raises InvalidAddressError.
+    """
+    # Length check first, so junk input never reaches the regex or takes a cache slot
+    if not isinstance(address, str) or len(address) != 42:
+        raise InvalidAddressError("Invalid Ethereum wallet address format")
+
+    canonical = _canonical(address)
+    if canonical is None:
+        raise InvalidAddressError("Invalid Ethereum wallet address format")
+    return canonical
+
+
+def is_valid_address(address):
+    """Whether `address` is a well-formed address with a valid checksum if it has one"""
+    try:
+        normalize_address(address)
+    except InvalidAddressError:
+        return False
+    return True
+
+
+def address_bytes(address):
+    """The 20-byte form of an address, as used in a transaction's `to` field"""
+    return bytes.fromhex(normalize_address(address)[2:])
@@ -0,0 +1,195 @@
+import json
+import time
+import random
+import logging
+import threading
+from django.conf import settings
+
+try:
+    from websockets.sync.client import connect
+except ImportError:  # Optional: without it chain state is read over HTTP on every use
+    connect = None
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBE_REQUEST_ID = 1
+
+
+def parse_head(header):
+    """The fields of a newHeads header the faucet uses, with hex quantities as ints"""
+    base_fee = header.get('baseFeePerGas')
+    return {
+        'number': int(header['number'], 16),
+        'hash': header['hash'],
+        'timestamp': int(header['timestamp'], 16),
+        'base_fee': int(base_fee, 16) if base_fee is not None else None,
+    }
+
+
+class ChainHeadSubscriber:
+    """
+    Persistent WebSocket connection to ETHEREUM_WS_PROVIDER_URL subscribed to newHeads.
+    Each new block is passed to the callbacks registered with subscribe(), from one
+    background thread. A dropped or silent connection is reopened with exponential
+    backoff and the subscription made again. Heads are only trusted while they keep
+    arriving: is_live() turns false after ETHEREUM_WS_MAX_HEAD_AGE seconds without one.
+    """
+
+    def __init__(self, url=None):
+        self.url = getattr(settings, 'ETHEREUM_WS_PROVIDER_URL', '') if url is None else url
+        self.max_head_age = getattr(settings, 'ETHEREUM_WS_MAX_HEAD_AGE', 60.0)
+        self.reconnect_delay = getattr(settings, 'ETHEREUM_WS_RECONNECT_DELAY', 1.0)
+        self.max_reconnect_delay = 30.0
+        self.head = None  # Latest head since the connection was opened; None while disconnected
+        self.received_at = 0.0
+        self._callbacks = []
+        self._stop = threading.Event()
+        self._thread = None
+        self._connection = None
+
+    def subscribe(self, callback):
+        """Call `callback(head)` for every new head; returns the callback"""
+        self._callbacks.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        if callback in self._callbacks:
+            self._callbacks.remove(callback)
+
+    def is_live(self):
+        return self.head is not None and time.monotonic() - self.received_at <= self.max_head_age
+
+    def start(self):
+        """Start the subscription thread; False if no WebSocket provider is configured"""
+        if not self.url:
+            return False
+        if connect is None:
+            logger.error("ETHEREUM_WS_PROVIDER_URL is set but the websockets package is not installed")
+            return False
+        if self._thread is not None and self._thread.is_alive():
+            return True
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="faucet-chain-heads")
+        self._thread.daemon = True
+        self._thread.start()
+        logger.info(f"Subscribing to new heads at {self.url}")
+        return True
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        connection = self._connection
+        if connection is not None:
+            connection.close()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        delay = self.reconnect_delay
+        while not self._stop.is_set():
+            try:
+                with connect(self.url, open_timeout=10, close_timeout=1) as connection:
+                    self._connection = connection
+                    subscription = self._subscribe(connection)
+                    logger.info(f"Subscribed to new heads at {self.url}")
+                    delay = self.reconnect_delay
+                    self._listen(connection, subscription)
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                logger.warning(f"Lost new heads subscription at {self.url}: {str(e)}")
+            finally:
+                self._connection = None
+                self.head = None
+
+            # Jittered so every process doesn't reconnect to the node at once
+            self._stop.wait(delay * random.uniform(0.5, 1.0))
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def _subscribe(self, connection):
+        """Send eth_subscribe and return the subscription id"""
+        connection.send(json.dumps({
+            'jsonrpc': '2.0',
+            'id': SUBSCRIBE_REQUEST_ID,
+            'method': 'eth_subscribe',
+            'params': ['newHeads'],
+        }))
+        while True:
+            message = json.loads(connection.recv(timeout=10))
+            if message.get('id') != SUBSCRIBE_REQUEST_ID:
+                continue
+            if 'error' in message:
+                raise ConnectionError(f"eth_subscribe failed: {message['error']}")
+            return message['result']
+
+    def _listen(self, connection, subscription):
+        """Publish heads until the connection closes or goes quiet for longer than max_head_age"""
+        while not self._stop.is_set():
+            # TimeoutError here means a connection that looks open but delivers nothing
+            message = json.loads(connection.recv(timeout=self.max_head_age))
+            params = message.get('params') or {}
+            if message.get('method') == 'eth_subscription' and params.get('subscription') == subscription:
+                self.publish(parse_head(params['result']))
+
+    def publish(self, head):
+        """Record `head` as the latest and pass it to every subscriber"""
+        if self.head is not None and self.head['hash'] == head['hash']:
+            self.received_at = time.monotonic()
+            return
+        self.head = head
+        self.received_at = time.monotonic()
+        for callback in list(self._callbacks):
+            try:
+                callback(head)
+            except Exception as e:
+                logger.error(f"New head subscriber failed on block {head['number']}: {str(e)}")
+
+
+class BlockCache:
+    """
+    Chain reads kept for as long as the head they were read at, e.g. the faucet balance,
+    which can only change with a new block. Each value is read at most once per block
+    instead of on every use. While the head subscription isn't live every call reads.
+    """
+
+    def __init__(self, subscriber):
+        self.subscriber = subscriber
+        self._values = {}
+        self._lock = threading.Lock()
+        subscriber.subscribe(self.on_head)
+
+    def on_head(self, head):
+        with self._lock:
+            self._values.clear()
+
+    def get(self, key, fetch):
+        """The value of `key` at the current head, calling `fetch()` if it hasn't been read yet"""
+        head = self.subscriber.head
+        if head is None or not self.subscriber.is_live():
+            return fetch()
+
+        with self._lock:
+            cached = self._values.get(key)
+        if cached is not None and cached[0] == head['hash']:
+            return cached[1]
+
+        value = fetch()
+        # Not kept if a new head arrived meanwhile: the value may belong to the previous block
+        current = self.subscriber.head
+        if current is not None and current['hash'] == head['hash']:
+            with self._lock:
+                self._values[key] = (head['hash'], value)
+        return value
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._values.clear()
+            else:
+                self._values.pop(key, None)
+
+
+# Singleton instance
+chain_heads = ChainHeadSubscriber()
+block_cache = BlockCache(chain_heads)
@@ -0,0 +1,68 @@
+import time
+import contextvars
+from contextlib import contextmanager
+
+_current_deadline = contextvars.ContextVar('faucet_deadline', default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when an operation runs out of its overall time budget"""
+
+
+class Deadline:
+    """
+    Absolute time budget for one unit of work (a fund request or a queue item).
+    Passed down through service calls so per-call timeouts, retries and backoff
+    are derived from the time actually remaining.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        """Seconds left before the deadline (never negative)"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+    def check(self, operation='operation'):
+        """Raise DeadlineExceeded if no time is left"""
+        if self.expired:
+            raise DeadlineExceeded(f"Deadline of {self.seconds}s exceeded before {operation}")
+
+    def timeout(self, cap=None, operation='call'):
+        """Timeout for the next call: the time remaining, capped at `cap` seconds"""
+        self.check(operation)
+        remaining = self.remaining()
+        return min(cap, remaining) if cap else remaining
+
+    def sleep(self, seconds, reserve=0.0, operation='retry'):
+        """
+        Sleep before a retry, shortened so at least `reserve` seconds remain for the
+        next call. Raises DeadlineExceeded if there isn't room for another attempt.
+        """
+        budget = self.remaining() - reserve
+        if budget <= 0:
+            raise DeadlineExceeded(f"Deadline of {self.seconds}s leaves no time for {operation}")
+        time.sleep(min(seconds, budget))
+
+    def __repr__(self):
+        return f"Deadline(remaining={self.remaining():.3f}s)"
+
+
+def current_deadline():
+    """Return the deadline active in this thread/context, if any"""
+    return _current_deadline.get()
+
+
+@contextmanager
+def deadline_scope(deadline):
+    """Make `deadline` the active deadline for code (e.g. RPC providers) running in this block"""
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
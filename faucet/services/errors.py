@@ -0,0 +1,80 @@
+import random
+from requests.exceptions import ConnectionError as RequestsConnectionError, HTTPError, Timeout
+from .deadline import DeadlineExceeded
+
+
+class TransactionError(Exception):
+    """Base class for classified transaction failures"""
+    error_class = 'fatal'
+
+
+class InsufficientFundsError(TransactionError, ValueError):
+    """The faucet wallet can't cover the payout"""
+    error_class = 'insufficient_funds'
+
+
+class RPCConnectionError(TransactionError, ConnectionError):
+    """The RPC node could not be reached"""
+    error_class = 'connection'
+
+
+class RPCTimeoutError(TransactionError, TimeoutError):
+    """The RPC node did not answer in time"""
+    error_class = 'timeout'
+
+
+class RPCRateLimitedError(TransactionError):
+    """The RPC provider is throttling us"""
+    error_class = 'rate_limited'
+
+
+class NonceError(TransactionError):
+    """The node rejected the transaction's nonce (too low, already known or underpriced replacement)"""
+    error_class = 'nonce'
+
+
+class TransactionReplacedError(NonceError):
+    """A different transaction was mined with the nonce of signed bytes, which can now never be mined"""
+
+
+# JSON-RPC error messages nodes use for nonce conflicts
+NONCE_ERROR_MESSAGES = ('nonce too low', 'already known', 'replacement transaction underpriced')
+
+
+def classify_error(error):
+    """
+    Map an exception raised while sending to an error class name used to pick a retry policy:
+    'connection', 'timeout', 'rate_limited', 'nonce', 'insufficient_funds' or 'fatal'.
+    """
+    if isinstance(error, TransactionError):
+        return error.error_class
+    if isinstance(error, (DeadlineExceeded, Timeout, TimeoutError)):
+        return 'timeout'
+    if isinstance(error, HTTPError) and error.response is not None:
+        if error.response.status_code == 429:
+            return 'rate_limited'
+        if error.response.status_code >= 500:
+            return 'connection'
+        return 'fatal'
+    if isinstance(error, (RequestsConnectionError, ConnectionError)):
+        return 'connection'
+
+    # web3 raises ValueError carrying the node's JSON-RPC error object
+    rpc_error = error.args[0] if isinstance(error, ValueError) and error.args else None
+    if isinstance(rpc_error, dict):
+        message = str(rpc_error.get('message', '')).lower()
+        if any(nonce_message in message for nonce_message in NONCE_ERROR_MESSAGES):
+            return 'nonce'
+        if rpc_error.get('code') == 429:
+            return 'rate_limited'
+
+    return 'fatal'
+
+
+def retry_delay(policy, retry_count):
+    """
+    Exponential backoff with "equal jitter": half the capped delay is fixed and the
+    other half random, so retries from a burst of failures spread out
+    """
+    delay = min(policy['max_delay'], policy['base_delay'] * (2 ** retry_count))
+    return delay / 2 + random.uniform(0, delay / 2)
@@ -1,17 +1,59 @@
 import os
 import logging
 import time
+import threading
+from collections import namedtuple
 from decimal import Decimal
-from web3 import Web3
+from requests.exceptions import RequestException
+from web3 import Web3, HTTPProvider
 from web3.middleware import geth_poa_middleware
-from web3.exceptions import Web3Exception
+from web3.exceptions import TransactionNotFound, Web3Exception
 from django.conf import settings
+from .deadline import DeadlineExceeded, current_deadline, deadline_scope
+from .errors import InsufficientFundsError, NonceError, TransactionReplacedError, classify_error
+from .addresses import address_bytes, is_valid_address
+from .rpc_client import JSONRPCClient
+from .signing import TransactionSigner
+from .chain_heads import block_cache
+from .tracing import tracer, span_attributes, server_address, CLIENT
 
 logger = logging.getLogger(__name__)
 
+# Errors worth retrying: RPC-level errors plus transport failures and per-call timeouts
+RETRYABLE_ERRORS = (Web3Exception, RequestException)
+
+# A signed transfer as recorded before broadcast; raw_transaction and transaction_hash are hex strings
+SignedPayout = namedtuple('SignedPayout', ['raw_transaction', 'transaction_hash', 'nonce', 'gas_price'])
+
+
+class DeadlineHTTPProvider(HTTPProvider):
+    """HTTPProvider whose per-request timeout is capped by the active deadline"""
+
+    def __init__(self, endpoint_uri, timeout, **kwargs):
+        super().__init__(endpoint_uri, request_kwargs={'timeout': timeout}, **kwargs)
+        self.timeout = timeout
+        self.host = server_address(endpoint_uri)
+
+    def get_request_kwargs(self):
+        request_kwargs = super().get_request_kwargs()
+        deadline = current_deadline()
+        if deadline is not None:
+            request_kwargs['timeout'] = deadline.timeout(self.timeout, operation='RPC call')
+        return request_kwargs
+
+    def make_request(self, method, params):
+        attributes = {'rpc.system': 'jsonrpc', 'rpc.method': method, 'server.address': self.host}
+        with tracer.span(f"rpc {method}", attributes, kind=CLIENT):
+            return super().make_request(method, params)
+
+
 class EthereumService:
     """Service for interacting with Ethereum blockchain (Sepolia testnet)"""
 
+    # Serializes nonce assignment and broadcast across worker threads sharing the faucet wallet
+    send_lock = threading.Lock()
+    _signer = None
+
     def __init__(self):
         # Get configuration from environment variables or settings
         self.primary_provider_url = settings.ETHEREUM_PROVIDER_URL
@@ -22,6 +64,10 @@ class EthereumService:
         self.amount = Decimal(settings.FAUCET_AMOUNT)  # Default 0.0001 ETH
         self.max_retries = settings.ETHEREUM_MAX_RETRIES
         self.retry_delay = settings.ETHEREUM_RETRY_DELAY
+        self.rpc_timeout = getattr(settings, 'ETHEREUM_RPC_TIMEOUT', 10.0)  # Per-call timeout cap in seconds
+        self.min_rpc_timeout = getattr(settings, 'ETHEREUM_MIN_RPC_TIMEOUT', 0.5)  # Don't start a call with less time left
+        self.fast_rpc = getattr(settings, 'ETHEREUM_FAST_RPC', False)  # Lean JSON-RPC client for the hot path
+        self.rpc = None
 
         # Initialize Web3 connection with primary provider
         self.w3 = self._initialize_web3(self.primary_provider_url)
@@ -33,7 +79,11 @@ class EthereumService:
 
     def _initialize_web3(self, provider_url):
         """Initialize Web3 connection with given provider URL"""
-        w3 = Web3(Web3.HTTPProvider(provider_url))
+        w3 = Web3(DeadlineHTTPProvider(provider_url, timeout=self.rpc_timeout))
+
+        # The lean client always talks to the same node as web3, including after failover
+        if self.fast_rpc:
+            self.rpc = JSONRPCClient(provider_url, timeout=self.rpc_timeout)
 
         # Inject middleware for Sepolia (PoA network)
         w3.middleware_onion.inject(geth_poa_middleware, layer=0)
@@ -44,97 +94,293 @@ class EthereumService:
         """Ensure connection to an Ethereum node, try fallbacks if needed"""
         # First try primary provider
         if self.w3.is_connected():
-            logger.info(f"Connected to primary Ethereum node at {self.primary_provider_url}")
+            logger.info("Connected to primary Ethereum node at %s", self.primary_provider_url)
             return True
 
         # If primary fails, try fallbacks
         for provider_url in self.fallback_provider_urls:
-            logger.warning(f"Trying fallback Ethereum node at {provider_url}")
+            logger.warning("Trying fallback Ethereum node at %s", provider_url)
             self.w3 = self._initialize_web3(provider_url)
             if self.w3.is_connected():
-                logger.info(f"Connected to fallback Ethereum node at {provider_url}")
+                logger.info("Connected to fallback Ethereum node at %s", provider_url)
                 return True
 
         return False
 
+    @property
+    def signer(self):
+        """Signing stage shared by all services in this process (see ETHEREUM_SIGNING_PROCESSES)"""
+        if EthereumService._signer is None:
+            EthereumService._signer = TransactionSigner(
+                self.private_key, processes=getattr(settings, 'ETHEREUM_SIGNING_PROCESSES', 0)
+            )
+        return EthereumService._signer
+
+    @property
+    def eth(self):
+        """Hot-path RPC methods: the lean JSON-RPC client if ETHEREUM_FAST_RPC is on, else web3's"""
+        return self.rpc if self.rpc is not None else self.w3.eth
+
+    def reconnect(self):
+        """Re-check the current node and fail over to a fallback provider if it's down"""
+        return self._ensure_connection()
+
     def validate_address(self, address):
         """Validate if the provided address is a valid Ethereum address"""
-        return self.w3.is_address(address)
+        return is_valid_address(address)
+
+    def _backoff(self, attempt, deadline):
+        """Sleep before the next attempt with exponential backoff, bounded by the deadline"""
+        wait_time = self.retry_delay * (2 ** attempt)
+        logger.info("Retrying in %s seconds...", wait_time)
+        with tracer.span('ethereum.backoff', {'faucet.backoff_seconds': wait_time}):
+            if deadline is not None:
+                # Shortened so there is still time for one more call, or raises if there isn't
+                deadline.sleep(wait_time, reserve=self.min_rpc_timeout)
+            else:
+                time.sleep(wait_time)
+
+    def get_balance(self, deadline=None):
+        """Get the balance of the faucet wallet, read once per block while new heads are subscribed"""
+        deadline = deadline or current_deadline()
+        return block_cache.get(('balance', self.from_address), lambda: self._fetch_balance(deadline))
+
+    def gas_price(self):
+        """Node's gas price suggestion, read once per block while new heads are subscribed"""
+        return block_cache.get('gas_price', lambda: self.eth.gas_price)
+
+    def _can_retry(self, attempts, deadline, max_attempts=None):
+        """
+        Whether to try again after `attempts` failed attempts: with a deadline, while it
+        leaves time for another call, else up to max_attempts (default ETHEREUM_MAX_RETRIES)
+        """
+        if max_attempts is None and deadline is not None:
+            # _backoff raises DeadlineExceeded once less than min_rpc_timeout would be left
+            return True
+        return attempts < (max_attempts or self.max_retries)
+
+    def _fetch_balance(self, deadline):
+        with deadline_scope(deadline):
+            attempt = 0
+            while True:
+                try:
+                    with span_attributes({'faucet.attempt': attempt + 1}):
+                        balance_wei = self.eth.get_balance(self.from_address)
+                    balance_eth = self.w3.from_wei(balance_wei, 'ether')
+                    return balance_eth
+                except RETRYABLE_ERRORS as e:
+                    logger.warning("Error getting balance (attempt %s): %s", attempt + 1, e)
+                    if not self._can_retry(attempt + 1, deadline):
+                        raise
+                    try:
+                        # Try to reconnect
+                        self._ensure_connection()
+                        self._backoff(attempt, deadline)
+                    except DeadlineExceeded as deadline_error:
+                        raise deadline_error from e
+                    attempt += 1
+
+    def send_transaction(self, to_address, deadline=None, max_attempts=None, write_ahead=None):
+        """
+        Send ETH from the faucet wallet to the specified address.
+        If a deadline is given, every RPC call, retry and backoff fits inside it, and
+        attempts continue while it leaves time for another call. Without one, at most
+        ETHEREUM_MAX_RETRIES attempts are made. max_attempts caps the attempts either way,
+        e.g. 1 for callers that schedule their own retries instead of sleeping here.
+        `write_ahead`, if given, is called with the signed payout before its first broadcast.
+        """
+        deadline = deadline or current_deadline()
+        try:
+            with deadline_scope(deadline):
+                return self._send_transaction(to_address, deadline, max_attempts, write_ahead)
+        except Exception as e:
+            logger.error("Error sending transaction to %s: %s", to_address, e)
+            raise
 
-    def get_balance(self):
-        """Get the balance of the faucet wallet"""
-        for attempt in range(self.max_retries):
+    def _send_transaction(self, to_address, deadline, max_attempts, write_ahead=None):
+        """Build, sign and broadcast the transfer, retrying within the deadline"""
+        amount_wei = self._check_payout(to_address, deadline)
+
+        # Try multiple times with exponential backoff. The transfer is signed once: after a
+        # broadcast whose outcome is unknown, retries resend the same bytes and nonce, so a
+        # transfer the node accepted before the error can't be paid out a second time
+        payout = None
+        attempt = 0
+        while True:
             try:
-                balance_wei = self.w3.eth.get_balance(self.from_address)
-                balance_eth = self.w3.from_wei(balance_wei, 'ether')
-                return balance_eth
-            except Web3Exception as e:
-                logger.warning(f"Error getting balance (attempt {attempt+1}/{self.max_retries}): {str(e)}")
-                if attempt < self.max_retries - 1:
-                    # Try to reconnect
-                    self._ensure_connection()
-                    time.sleep(self.retry_delay)
-                else:
+                with self.send_lock, span_attributes({'faucet.attempt': attempt + 1}):
+                    if payout is None:
+                        payout = self._sign_payout(to_address, amount_wei)
+                        if write_ahead is not None:
+                            write_ahead(payout)
+                    return self._broadcast(payout.raw_transaction, payout.transaction_hash, payout.nonce)
+
+            except RETRYABLE_ERRORS as e:
+                logger.warning("Error sending transaction (attempt %s): %s", attempt + 1, e)
+                if not self._can_retry(attempt + 1, deadline, max_attempts):
                     raise
+                try:
+                    # Try to reconnect before retrying
+                    self._ensure_connection()
+                    # Exponential backoff, cut short (or cancelled) by the deadline
+                    self._backoff(attempt, deadline)
+                except DeadlineExceeded as deadline_error:
+                    raise deadline_error from e
+                attempt += 1
 
-    def send_transaction(self, to_address):
-        """Send ETH from the faucet wallet to the specified address"""
+    def send_payout(self, to_address, write_ahead, deadline=None):
+        """
+        Send ETH to the specified address with a write-ahead record: the signed
+        transaction is passed to `write_ahead`, which must persist it, before it is
+        broadcast. After a crash the saved bytes can be handed to `rebroadcast`
+        instead of signing a second transfer. Makes a single attempt.
+        """
+        deadline = deadline or current_deadline()
         try:
-            # Validate address format
-            if not self.validate_address(to_address):
-                raise ValueError("Invalid Ethereum address format")
+            with deadline_scope(deadline):
+                amount_wei = self._check_payout(to_address, deadline)
+                with self.send_lock:
+                    payout = self._sign_payout(to_address, amount_wei)
+                    write_ahead(payout)
+                    return self._broadcast(payout.raw_transaction, payout.transaction_hash, payout.nonce)
+        except Exception as e:
+            logger.error("Error sending transaction to %s: %s", to_address, e)
+            raise
 
-            # Check faucet balance
-            balance = self.get_balance()
-            if balance < self.amount:
-                raise ValueError(f"Insufficient funds in faucet wallet: {balance} ETH")
+    def send_payouts(self, to_addresses, write_ahead, deadline=None):
+        """
+        Batch variant of send_payout. The transfers get consecutive nonces and are signed
+        together by the signing stage, recorded with one `write_ahead(payouts)` call, then
+        broadcast in nonce order. Returns the hash, or the exception raised while
+        broadcasting, for each address in order.
+        """
+        deadline = deadline or current_deadline()
+        with deadline_scope(deadline):
+            if not all(self.validate_address(to_address) for to_address in to_addresses):
+                raise ValueError("Invalid Ethereum address format")
 
-            # Convert amount to Wei
+            balance = self.get_balance(deadline)
+            if balance < self.amount * len(to_addresses):
+                raise InsufficientFundsError(f"Insufficient funds in faucet wallet: {balance} ETH")
             amount_wei = self.w3.to_wei(self.amount, 'ether')
 
-            # Try multiple times with exponential backoff
-            for attempt in range(self.max_retries):
-                try:
-                    # Get the nonce for the transaction
-                    nonce = self.w3.eth.get_transaction_count(self.from_address)
-
-                    # Estimate gas price (with flexibility for network congestion)
-                    gas_price = self.w3.eth.gas_price
-                    # Increase gas price slightly for faster confirmation when doing retries
-                    if attempt > 0:
-                        gas_price = int(gas_price * (1 + 0.1 * attempt))  # Increase by 10% per retry
-
-                    # Build transaction
-                    tx = {
-                        'nonce': nonce,
-                        'to': to_address,
-                        'value': amount_wei,
-                        'gas': 21000,  # Standard gas limit for ETH transfers
-                        'gasPrice': gas_price,
-                        'chainId': self.chain_id
-                    }
-
-                    # Sign the transaction
-                    signed_tx = self.w3.eth.account.sign_transaction(tx, self.private_key)
-
-                    # Send the transaction
-                    tx_hash = self.w3.eth.send_raw_transaction(signed_tx.rawTransaction)
-
-                    # Return the transaction hash as a hex string
-                    return self.w3.to_hex(tx_hash)
-
-                except Web3Exception as e:
-                    logger.warning(f"Error sending transaction (attempt {attempt+1}/{self.max_retries}): {str(e)}")
-                    if attempt < self.max_retries - 1:
-                        # Try to reconnect before retrying
-                        self._ensure_connection()
-                        # Exponential backoff
-                        wait_time = self.retry_delay * (2 ** attempt)
-                        logger.info(f"Retrying in {wait_time} seconds...")
-                        time.sleep(wait_time)
-                    else:
-                        raise
+            with self.send_lock:
+                nonce = self.eth.get_transaction_count(self.from_address, 'pending')
+                gas_price = self.gas_price()
+                transactions = [
+                    self._transfer(nonce + offset, to_address, amount_wei, gas_price)
+                    for offset, to_address in enumerate(to_addresses)
+                ]
+                payouts = [
+                    SignedPayout(
+                        raw_transaction=self.w3.to_hex(raw),
+                        transaction_hash=self.w3.to_hex(self.w3.keccak(raw)),
+                        nonce=tx['nonce'],
+                        gas_price=gas_price,
+                    )
+                    for tx, raw in zip(transactions, self.signer.sign_batch(transactions))
+                ]
+                write_ahead(payouts)
 
-        except Exception as e:
-            logger.error(f"Error sending transaction to {to_address}: {str(e)}")
-            raise
\ No newline at end of file
+                # A failed broadcast leaves a nonce gap only until its retry resends the saved bytes
+                results = []
+                for payout in payouts:
+                    try:
+                        results.append(self._broadcast(payout.raw_transaction, payout.transaction_hash, payout.nonce))
+                    except Exception as e:
+                        logger.error("Error broadcasting transaction %s: %s", payout.transaction_hash, e)
+                        results.append(e)
+                return results
+
+    def rebroadcast(self, raw_transaction, transaction_hash, nonce=None, deadline=None):
+        """
+        Broadcast previously signed bytes again. Safe to repeat: if the node already
+        has the transaction, or it has been mined, the original hash is returned.
+        Raises TransactionReplacedError only once a different transaction has been mined
+        with `nonce`, in which case these bytes can never be mined and the payout has to
+        be signed again. Any other nonce rejection raises NonceError: keep the bytes.
+        """
+        deadline = deadline or current_deadline()
+        with deadline_scope(deadline):
+            return self._broadcast(raw_transaction, transaction_hash, nonce)
+
+    def _check_payout(self, to_address, deadline):
+        """Validate the recipient and faucet balance; returns the payout amount in Wei"""
+        # Validate address format
+        if not self.validate_address(to_address):
+            raise ValueError("Invalid Ethereum address format")
+
+        # Check faucet balance
+        balance = self.get_balance(deadline)
+        if balance < self.amount:
+            raise InsufficientFundsError(f"Insufficient funds in faucet wallet: {balance} ETH")
+
+        # Convert amount to Wei
+        return self.w3.to_wei(self.amount, 'ether')
+
+    def _build_transaction(self, to_address, amount_wei):
+        """Build the transfer with the next nonce; callers hold send_lock so nonces don't collide"""
+        nonce = self.eth.get_transaction_count(self.from_address, 'pending')
+        return self._transfer(nonce, to_address, amount_wei, self.gas_price())
+
+    def _transfer(self, nonce, to_address, amount_wei, gas_price):
+        """Unsigned legacy ETH transfer"""
+        return {
+            'nonce': nonce,
+            'to': address_bytes(to_address),
+            'value': amount_wei,
+            'gas': 21000,  # Standard gas limit for ETH transfers
+            'gasPrice': gas_price,
+            'chainId': self.chain_id
+        }
+
+    def _sign_payout(self, to_address, amount_wei):
+        """Build and sign the transfer without broadcasting it"""
+        tx = self._build_transaction(to_address, amount_wei)
+        signed_tx = self.w3.eth.account.sign_transaction(tx, self.private_key)
+        return SignedPayout(
+            raw_transaction=self.w3.to_hex(signed_tx.rawTransaction),
+            transaction_hash=self.w3.to_hex(signed_tx.hash),
+            nonce=tx['nonce'],
+            gas_price=tx['gasPrice'],
+        )
+
+    def _broadcast(self, raw_transaction, transaction_hash, nonce=None):
+        """Send signed bytes, treating "already known" or already mined as success"""
+        try:
+            self.eth.send_raw_transaction(raw_transaction)
+        except ValueError as e:
+            if classify_error(e) != 'nonce':
+                raise
+            if 'already known' in str(e).lower() or self._is_mined(transaction_hash):
+                logger.info("Transaction %s was already broadcast", transaction_hash)
+                return transaction_hash
+            if self._is_replaced(transaction_hash, nonce):
+                raise TransactionReplacedError(
+                    f"Nonce {nonce} of transaction {transaction_hash} was used by another transaction"
+                ) from e
+            # A lagging receipt index or a provider behind the chain looks the same as a
+            # replacement here; the bytes are kept and broadcast again on the next attempt
+            raise NonceError(f"Nonce of transaction {transaction_hash} rejected: {str(e)}") from e
+        return transaction_hash
+
+    def _is_mined(self, transaction_hash):
+        """Whether the transaction has a receipt"""
+        try:
+            return self.eth.get_transaction_receipt(transaction_hash) is not None
+        except TransactionNotFound:
+            return False
+
+    def _is_replaced(self, transaction_hash, nonce):
+        """
+        Whether another transaction was mined with `nonce`: the node doesn't know this
+        one at all and the account's mined nonce count has moved past it
+        """
+        if nonce is None:
+            return False
+        try:
+            if self.eth.get_transaction(transaction_hash) is not None:
+                return False
+        except TransactionNotFound:
+            pass
+        return self.eth.get_transaction_count(self.from_address, 'latest') > nonce
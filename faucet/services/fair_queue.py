@@ -0,0 +1,79 @@
+import heapq
+import ipaddress
+import itertools
+import queue
+from .memory import approximate_size
+
+
+def client_key(ip_address, ipv4_prefix=24, ipv6_prefix=48):
+    """
+    Group a client IP into its fairness bucket: the enclosing IPv4/IPv6 network,
+    so a whole subnet shares one share of the queue
+    """
+    try:
+        ip = ipaddress.ip_address(ip_address)
+    except ValueError:
+        return f"ip:{ip_address}"
+
+    prefix = ipv4_prefix if ip.version == 4 else ipv6_prefix
+    network = ipaddress.ip_network(f"{ip}/{prefix}", strict=False)
+    return f"net:{network}"
+
+
+class FairQueue(queue.Queue):
+    """
+    Weighted fair queue (self-clocked fair queuing) with a drop-in PriorityQueue interface.
+
+    Items are (priority, tx_data) tuples. Lower priority values always go first; within a
+    priority, work is interleaved across clients (tx_data['client_key']) in proportion to
+    their weights, so a client with a deep backlog can't starve newcomers. Each item is
+    stamped with a virtual finish time on arrival and kept in a single heap, so put and
+    get are O(log n) regardless of the number of clients. `bytes` tracks the approximate
+    memory held by the queued items.
+    """
+
+    def __init__(self, maxsize=0, weights=None):
+        self.weights = weights or {}
+        super().__init__(maxsize)
+
+    def _init(self, maxsize):
+        self.heap = []
+        self.flows = {}  # client_key -> [last_finish_tag, queued_count]
+        self.virtual_time = 0.0
+        self.counter = itertools.count()
+        self.bytes = 0
+
+    def _qsize(self):
+        return len(self.heap)
+
+    def _put(self, item):
+        priority, tx_data = item
+        key = tx_data.get('client_key', '')
+        weight = self.weights.get(key, 1)
+
+        flow = self.flows.get(key)
+        if flow is None:
+            flow = self.flows[key] = [self.virtual_time, 0]
+
+        # A flow's next item finishes one weighted slot after its previous one (or after now)
+        finish_tag = max(self.virtual_time, flow[0]) + 1.0 / weight
+        flow[0] = finish_tag
+        flow[1] += 1
+
+        # Measured once on the way in, so the item's own size is subtracted on the way out
+        size = approximate_size(tx_data)
+        self.bytes += size
+        heapq.heappush(self.heap, (priority, finish_tag, next(self.counter), key, tx_data, size))
+
+    def _get(self):
+        priority, finish_tag, _, key, tx_data, size = heapq.heappop(self.heap)
+        self.bytes -= size
+        self.virtual_time = max(self.virtual_time, finish_tag)
+
+        # Drop state for idle flows so memory tracks the number of clients with queued work
+        flow = self.flows[key]
+        flow[1] -= 1
+        if flow[1] == 0:
+            del self.flows[key]
+
+        return priority, tx_data
@@ -0,0 +1,108 @@
+import base64
+from datetime import datetime
+from django.db.models import Count, Q
+from django.db.models.functions import TruncHour
+from faucet.models import Transaction
+
+# Columns exposed by the history API; the signed transaction and nonce stay internal
+HISTORY_FIELDS = (
+    'id', 'wallet_address', 'ip_address', 'status', 'amount', 'transaction_hash',
+    'error_message', 'retry_count', 'batch_id', 'created_at', 'updated_at',
+)
+
+
+class InvalidCursorError(ValueError):
+    """The pagination cursor is malformed"""
+
+
+def encode_cursor(created_at, transaction_id):
+    """Opaque cursor pointing just past the row with this (created_at, id)"""
+    position = f"{created_at.isoformat()}|{transaction_id}"
+    return base64.urlsafe_b64encode(position.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        position = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, transaction_id = position.split('|')
+        return datetime.fromisoformat(created_at), int(transaction_id)
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursorError("Invalid cursor")
+
+
+def filter_transactions(wallet=None, ip=None, status=None, since=None, until=None):
+    """Transactions matching the given filters; a time range also limits the partitions scanned"""
+    queryset = Transaction.objects.all()
+    if wallet:
+        queryset = queryset.filter(wallet_address=wallet)
+    if ip:
+        queryset = queryset.filter(ip_address=ip)
+    if status:
+        queryset = queryset.filter(status=status)
+    if since:
+        queryset = queryset.filter(created_at__gte=since)
+    if until:
+        queryset = queryset.filter(created_at__lt=until)
+    return queryset
+
+
+def after(queryset, position, descending=True):
+    """Rows strictly past `position` = (created_at, id) in (created_at, id) order"""
+    created_at, transaction_id = position
+    if descending:
+        return queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=transaction_id))
+    return queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=transaction_id))
+
+
+def ordered(queryset, descending=True):
+    return queryset.order_by('-created_at', '-id') if descending else queryset.order_by('created_at', 'id')
+
+
+def keyset_page(queryset, cursor=None, limit=100):
+    """
+    One page of rows, newest first, and the cursor of the next page (None on the last).
+    The cursor is a seek position on (created_at, id) rather than an OFFSET, so every
+    page is an index range scan of `limit` rows however deep it is.
+    """
+    if cursor:
+        queryset = after(queryset, decode_cursor(cursor))
+
+    # One extra row tells whether there is a next page without a COUNT
+    rows = list(ordered(queryset).values(*HISTORY_FIELDS)[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1]['created_at'], rows[-1]['id'])
+
+
+def iter_rows(queryset, chunk_size=1000):
+    """
+    Every matching row, oldest first, fetched in keyset chunks so an export of any size
+    holds at most one chunk in memory and never keeps a long query open between chunks
+    """
+    position = None
+    while True:
+        chunk = queryset if position is None else after(queryset, position, descending=False)
+        rows = list(ordered(chunk, descending=False).values(*HISTORY_FIELDS)[:chunk_size])
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        position = (rows[-1]['created_at'], rows[-1]['id'])
+
+
+def hourly_histogram(queryset):
+    """Transaction counts per hour and status, oldest hour first"""
+    buckets = (
+        queryset
+        .annotate(hour=TruncHour('created_at'))
+        .values('hour')
+        .annotate(
+            total=Count('id'),
+            success=Count('id', filter=Q(status='success')),
+            failed=Count('id', filter=Q(status='failed')),
+            pending=Count('id', filter=Q(status='pending')),
+        )
+        .order_by('hour')
+    )
+    return list(buckets)
@@ -0,0 +1,92 @@
+import time
+import hashlib
+import logging
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyStore:
+    """
+    Stores the first response to a request carrying an Idempotency-Key so that
+    retries of it get the same response back without being processed again.
+    While the original is still being processed, the key is held by an in-flight
+    marker and duplicates wait for its response. Each key is bound to a fingerprint
+    of the request body, so reusing a key for a different request is detected.
+    """
+    NEW = 'new'
+    REPLAY = 'replay'
+    MISMATCH = 'mismatch'
+    IN_PROGRESS = 'in_progress'
+
+    def __init__(self):
+        self.ttl = getattr(settings, 'IDEMPOTENCY_KEY_TTL', 86400)  # Seconds a stored response is replayed
+        self.wait_timeout = getattr(settings, 'IDEMPOTENCY_WAIT_TIMEOUT', 10.0)  # Max wait for an in-flight original
+        # In-flight marker outlives the request's own deadline, then expires if the process died
+        self.lock_ttl = int(getattr(settings, 'FUND_REQUEST_DEADLINE', 25.0)) + 5
+        self.poll_interval = 0.05
+
+    def _keys(self, idempotency_key):
+        digest = hashlib.sha256(idempotency_key.encode()).hexdigest()
+        return f"faucet_idempotency_{digest}", f"faucet_idempotency_lock_{digest}"
+
+    def fingerprint(self, *parts):
+        """Fingerprint of the request fields that must match on a retry"""
+        return hashlib.sha256('\x1f'.join(str(part) for part in parts).encode()).hexdigest()
+
+    def begin(self, idempotency_key, fingerprint):
+        """
+        Claim a key before processing. Returns (state, stored): NEW if the caller
+        should process the request and then call complete() or release(); REPLAY
+        with the stored response; MISMATCH if the key was used for another request;
+        IN_PROGRESS if the original is still running after waiting.
+        """
+        response_key, lock_key = self._keys(idempotency_key)
+        wait_until = time.monotonic() + self.wait_timeout
+        poll_interval = self.poll_interval
+
+        while True:
+            stored = cache.get(response_key)
+            if stored is not None:
+                if stored['fingerprint'] != fingerprint:
+                    return self.MISMATCH, None
+                return self.REPLAY, stored
+
+            if cache.add(lock_key, fingerprint, self.lock_ttl):
+                return self.NEW, None
+
+            in_flight = cache.get(lock_key)
+            if in_flight is not None and in_flight != fingerprint:
+                return self.MISMATCH, None
+
+            if time.monotonic() >= wait_until:
+                return self.IN_PROGRESS, None
+
+            # The original is still running: poll for its response with a growing interval
+            time.sleep(min(poll_interval, max(0.0, wait_until - time.monotonic())))
+            poll_interval = min(poll_interval * 2, 0.5)
+
+    def complete(self, idempotency_key, fingerprint, status_code, data, payout_attempted=False):
+        """
+        Store the response and release the key. Responses telling the client to come back
+        later (429 and 5xx) aren't stored, so a retry is processed afresh, unless a payout
+        was already sent or queued: then a retry could pay out a second time
+        """
+        response_key, lock_key = self._keys(idempotency_key)
+        if payout_attempted or (status_code < 500 and status_code != 429):
+            cache.set(response_key, {
+                'fingerprint': fingerprint,
+                'status': status_code,
+                'data': data,
+            }, self.ttl)
+        cache.delete(lock_key)
+
+    def release(self, idempotency_key):
+        """Release the key without storing a response"""
+        _, lock_key = self._keys(idempotency_key)
+        cache.delete(lock_key)
+
+
+# Singleton instance
+idempotency_store = IdempotencyStore()
@@ -0,0 +1,98 @@
+import ipaddress
+import logging
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+ALLOW = 'allow'
+DENY = 'deny'
+
+
+def parse_ip(ip_address):
+    """ip_address object for a string, with IPv4-mapped IPv6 addresses unwrapped; None if invalid"""
+    try:
+        ip = ipaddress.ip_address(ip_address)
+    except ValueError:
+        return None
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        return ip.ipv4_mapped
+    return ip
+
+
+class PrefixTable:
+    """
+    Binary radix trie mapping IP networks to values, one trie per address family.
+    lookup() returns the value of the longest prefix containing an address, walking
+    at most one node per bit of that prefix, so cost doesn't depend on the table size.
+    """
+
+    def __init__(self):
+        # Node: [child for bit 0, child for bit 1, value or None]
+        self.roots = {4: [None, None, None], 6: [None, None, None]}
+        self.size = 0
+
+    def add(self, network, value):
+        network = ipaddress.ip_network(network, strict=False)
+        bits = int(network.network_address)
+        width = network.max_prefixlen
+
+        node = self.roots[network.version]
+        for position in range(network.prefixlen):
+            bit = (bits >> (width - 1 - position)) & 1
+            if node[bit] is None:
+                node[bit] = [None, None, None]
+            node = node[bit]
+        node[2] = value
+        self.size += 1
+
+    def lookup(self, ip_address):
+        ip = parse_ip(ip_address)
+        if ip is None:
+            return None
+        bits = int(ip)
+        width = ip.max_prefixlen
+
+        node = self.roots[ip.version]
+        match = node[2]
+        for position in range(width):
+            node = node[(bits >> (width - 1 - position)) & 1]
+            if node is None:
+                break
+            if node[2] is not None:
+                match = node[2]
+        return match
+
+
+class IPAccessList:
+    """
+    Allow and deny lists of networks (RATE_LIMIT_ALLOWLIST / RATE_LIMIT_DENYLIST), compiled
+    into a PrefixTable when the process starts so checks never touch Redis. The most specific
+    entry wins, so a single address can be allowed inside a denied range or the reverse.
+    """
+
+    def __init__(self, allow=None, deny=None):
+        allow = getattr(settings, 'RATE_LIMIT_ALLOWLIST', []) if allow is None else allow
+        deny = getattr(settings, 'RATE_LIMIT_DENYLIST', []) if deny is None else deny
+        self.table = PrefixTable()
+        for value, networks in ((ALLOW, allow), (DENY, deny)):
+            for network in networks:
+                try:
+                    self.table.add(network, value)
+                except ValueError:
+                    logger.error(f"Ignoring invalid network in the {value} list: {network}")
+
+    def check(self, ip_address):
+        """ALLOW, DENY, or None when the address isn't on either list"""
+        if not self.table.size:
+            return None
+        return self.table.lookup(ip_address)
+
+    def is_denied(self, ip_address):
+        return self.check(ip_address) == DENY
+
+    def is_allowed(self, ip_address):
+        return self.check(ip_address) == ALLOW
+
+
+# Singleton instance
+ip_access_list = IPAccessList()
@@ -0,0 +1,182 @@
+import os
+import sys
+import time
+import logging
+import threading
+import tracemalloc
+from django.conf import settings
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; RSS is then only read from /proc
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Allocations made by tracemalloc itself and by the import machinery are noise in a report
+NOISE_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+def rss_bytes():
+    """Resident set size of this process, or None where it can't be read"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is None:
+        return None
+    # Outside Linux only the peak is available; ru_maxrss is in bytes on macOS and KiB elsewhere
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def approximate_size(value, depth=3):
+    """Bytes held by a queued item: the object and its contents, a few levels deep"""
+    size = sys.getsizeof(value)
+    if depth > 0:
+        if isinstance(value, dict):
+            size += sum(approximate_size(item, depth - 1) for item in value.values())
+        elif isinstance(value, (list, tuple)):
+            size += sum(approximate_size(item, depth - 1) for item in value)
+    return size
+
+
+def _site(stat, diff=False):
+    # Frames are ordered oldest first; the allocating line is the last one
+    site = {
+        'location': str(stat.traceback[-1]),
+        'size': stat.size,
+        'count': stat.count,
+    }
+    if diff:
+        site['size_diff'] = stat.size_diff
+        site['count_diff'] = stat.count_diff
+    return site
+
+
+def format_sites(sites):
+    """One line per allocation site, for logs and report files"""
+    lines = []
+    for site in sites:
+        line = f"{site['location']}: {site['size'] / 1024:.1f} KiB in {site['count']} blocks"
+        if 'size_diff' in site:
+            line += f" ({site['size_diff'] / 1024:+.1f} KiB, {site['count_diff']:+d} blocks)"
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+class MemoryTracker:
+    """
+    Allocation tracking with tracemalloc. Tracing slows every allocation down, so it is
+    off unless MEMORY_TRACE_FRAMES is set or someone starts it. snapshot() keeps a
+    baseline and diff() lists the allocation sites that changed most since then, which
+    is how a slow leak in a long-running worker shows itself.
+    """
+
+    def __init__(self):
+        self.frames = getattr(settings, 'MEMORY_TRACE_FRAMES', 0)
+        self.baseline = None
+        self.baseline_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def tracing(self):
+        return tracemalloc.is_tracing()
+
+    def start(self, frames=None):
+        """Start tracing allocations, keeping `frames` frames of each allocation's stack"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames or self.frames or 1)
+            logger.info(f"Tracing memory allocations with {tracemalloc.get_traceback_limit()} frames")
+
+    def stop(self):
+        with self._lock:
+            self.baseline = None
+            self.baseline_at = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            logger.info("Stopped tracing memory allocations")
+
+    def _snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces(NOISE_FILTERS)
+
+    def snapshot(self):
+        """Take the baseline for diff(), starting tracing if it is off"""
+        self.start()
+        snapshot = self._snapshot()
+        with self._lock:
+            self.baseline = snapshot
+            self.baseline_at = time.time()
+        return self.baseline_at
+
+    def top(self, limit=10):
+        """The largest allocation sites now, or [] while not tracing"""
+        if not tracemalloc.is_tracing():
+            return []
+        return [_site(stat) for stat in self._snapshot().statistics('lineno')[:limit]]
+
+    def diff(self, limit=10):
+        """The allocation sites that changed most since the baseline, or None without one"""
+        with self._lock:
+            baseline = self.baseline
+        if baseline is None or not tracemalloc.is_tracing():
+            return None
+        return [_site(stat, diff=True) for stat in self._snapshot().compare_to(baseline, 'lineno')[:limit]]
+
+    def stats(self):
+        """Memory gauges of this process"""
+        stats = {'rss_bytes': rss_bytes(), 'tracing': tracemalloc.is_tracing()}
+        if stats['tracing']:
+            stats['traced_bytes'], stats['traced_peak_bytes'] = tracemalloc.get_traced_memory()
+            stats['baseline_at'] = self.baseline_at
+        return stats
+
+    def log_top(self, limit=10):
+        """Log the largest allocation sites, and the biggest changes since the baseline"""
+        if not tracemalloc.is_tracing():
+            return
+        logger.info(f"Largest allocation sites:\n{format_sites(self.top(limit))}")
+        changes = self.diff(limit)
+        if changes:
+            logger.info(f"Allocation changes since the baseline:\n{format_sites(changes)}")
+
+    def report(self, action='diff', limit=25):
+        """
+        Text report for `action`: 'snapshot' takes a new baseline, 'diff' compares with
+        the baseline (taking one first if there is none), 'top' lists the largest sites.
+        Tracing is started if it is off.
+        """
+        self.start()
+        if action == 'snapshot' or (action == 'diff' and self.baseline is None):
+            self.snapshot()
+        stats = self.stats()
+        lines = [
+            f"pid {os.getpid()} at {time.strftime('%Y-%m-%dT%H:%M:%S')}",
+            f"rss: {stats['rss_bytes']} bytes",
+            f"traced: {stats['traced_bytes']} bytes (peak {stats['traced_peak_bytes']})",
+            '',
+        ]
+        if action == 'diff':
+            lines.append(f"Changes since the baseline of {time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.baseline_at))}:")
+            lines.append(format_sites(self.diff(limit)))
+        else:
+            lines.append("Largest allocation sites:")
+            lines.append(format_sites(self.top(limit)))
+        return '\n'.join(lines) + '\n'
+
+    def write_report(self, path, action='diff', limit=25):
+        # Renamed into place so the file never appears half written
+        partial = f"{path}.partial"
+        with open(partial, 'w') as f:
+            f.write(self.report(action, limit))
+        os.replace(partial, path)
+
+
+# Singleton instance
+memory_tracker = MemoryTracker()
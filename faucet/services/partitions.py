@@ -0,0 +1,254 @@
+import os
+import re
+import gzip
+import json
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+TABLE = 'faucet_transaction'
+DEFAULT_PARTITION = f'{TABLE}_default'
+PARTITION_PREFIX = f'{TABLE}_p'
+
+# pg_get_expr() output for a range partition bound
+BOUND_PATTERN = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def period_start(moment, interval):
+    """Start (UTC midnight, Monday for weeks) of the partition period containing `moment`"""
+    start = moment.astimezone(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == 'week':
+        start -= timedelta(days=start.weekday())
+    return start
+
+
+def next_period(start, interval):
+    return start + timedelta(days=7 if interval == 'week' else 1)
+
+
+def partition_name(start):
+    return f"{PARTITION_PREFIX}{start:%Y%m%d}"
+
+
+def parse_bound(expression):
+    """(start, end) datetimes from a partition bound expression, or None for the default partition"""
+    match = BOUND_PATTERN.search(expression)
+    if match is None:
+        return None
+    return tuple(datetime.fromisoformat(value).astimezone(dt_timezone.utc) for value in match.groups())
+
+
+class PartitionManager:
+    """
+    Maintains the day/week range partitions of the Transaction table on PostgreSQL:
+    creates them ahead of time, and archives expired ones (detach, export to a
+    compressed file, drop) so the live table only ever holds the retention window.
+    """
+
+    def __init__(self, interval=None, using='default'):
+        self.interval = interval or getattr(settings, 'TRANSACTION_PARTITION_INTERVAL', 'week')
+        self.connection = connections[using]
+
+    def is_partitioned(self):
+        if self.connection.vendor != 'postgresql':
+            return False
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = %s",
+                [TABLE]
+            )
+            return cursor.fetchone() is not None
+
+    def partitions(self):
+        """Attached range partitions as (name, start, end), oldest first"""
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+                FROM pg_inherits
+                JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+                JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                WHERE parent.relname = %s
+                """,
+                [TABLE]
+            )
+            rows = cursor.fetchall()
+
+        partitions = []
+        for name, expression in rows:
+            bounds = parse_bound(expression)
+            if bounds is not None:
+                partitions.append((name, *bounds))
+        return sorted(partitions, key=lambda partition: partition[1])
+
+    def detached_partitions(self):
+        """Partitions detached by an archive run that did not finish exporting and dropping them"""
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT relname FROM pg_class WHERE relkind = 'r' AND NOT relispartition AND relname LIKE %s",
+                [PARTITION_PREFIX.replace('_', r'\_') + '%']
+            )
+            return sorted(row[0] for row in cursor.fetchall())
+
+    def default_partition_rows(self):
+        """Rows that landed in the default partition because no range partition covered them"""
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {DEFAULT_PARTITION}")
+            return cursor.fetchone()[0]
+
+    def create_ahead(self, periods, now=None):
+        """
+        Ensure partitions exist from the current period through `periods` periods ahead,
+        and for every earlier period that has rows waiting in the default partition
+        """
+        current = period_start(now or datetime.now(dt_timezone.utc), self.interval)
+        start = current
+        oldest_default = self._oldest_default_row()
+        if oldest_default is not None:
+            start = min(start, period_start(oldest_default, self.interval))
+        last = current
+        for _ in range(periods):
+            last = next_period(last, self.interval)
+
+        existing = {name for name, _, _ in self.partitions()}
+        created = []
+        while start <= last:
+            end = next_period(start, self.interval)
+            name = partition_name(start)
+            if name not in existing:
+                self.create_partition(name, start, end)
+                created.append(name)
+            start = end
+
+        return created
+
+    def _oldest_default_row(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"SELECT min(created_at) FROM {DEFAULT_PARTITION}")
+            return cursor.fetchone()[0]
+
+    def create_partition(self, name, start, end):
+        """
+        Create the range partition [start, end). PostgreSQL refuses a new partition while
+        the default partition holds rows in its range, so when it does the default
+        partition is detached, the partition created, those rows moved into it and the
+        default partition attached again, all in one transaction.
+        """
+        bounds = [start.isoformat(), end.isoformat()]
+        create = (
+            f"CREATE TABLE {name} PARTITION OF {TABLE} "
+            f"FOR VALUES FROM ('{bounds[0]}') TO ('{bounds[1]}')"
+        )
+        with transaction.atomic(using=self.connection.alias), self.connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE created_at >= %s AND created_at < %s)",
+                bounds
+            )
+            if not cursor.fetchone()[0]:
+                cursor.execute(create)
+                return
+
+            cursor.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {DEFAULT_PARTITION}")
+            cursor.execute(create)
+            cursor.execute(
+                f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= %s AND created_at < %s RETURNING *) "
+                f"INSERT INTO {TABLE} SELECT * FROM moved",
+                bounds
+            )
+            moved = cursor.rowcount
+            cursor.execute(f"ALTER TABLE {TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT")
+        logger.info(f"Created partition {name} and moved {moved} rows into it from {DEFAULT_PARTITION}")
+
+    def expired(self, retention_days, now=None):
+        """Attached partitions whose whole range is older than the retention window"""
+        cutoff = (now or datetime.now(dt_timezone.utc)) - timedelta(days=retention_days)
+        return [name for name, _, end in self.partitions() if end <= cutoff]
+
+    def detach(self, name):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {name}")
+
+    def drop(self, name):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE {name}")
+
+    def export(self, name, directory, file_format='jsonl', batch_size=5000):
+        """
+        Write a detached partition to `directory` as gzip-compressed JSON lines or Parquet.
+        Rows are streamed with a server-side cursor; the file only appears under its final
+        name once it is complete. Returns the path and the row count.
+        """
+        extension = 'parquet' if file_format == 'parquet' else 'jsonl.gz'
+        path = os.path.join(directory, f"{name}.{extension}")
+        partial_path = f"{path}.partial"
+
+        with self.connection.chunked_cursor() as cursor:
+            cursor.execute(f"SELECT row_to_json(t)::text FROM {name} t ORDER BY created_at, id")
+            if file_format == 'parquet':
+                count = self._write_parquet(cursor, partial_path, batch_size)
+            else:
+                count = self._write_jsonl(cursor, partial_path, batch_size)
+
+        os.replace(partial_path, path)
+        return path, count
+
+    def _write_jsonl(self, cursor, path, batch_size):
+        count = 0
+        with open(path, 'wb') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='wb') as output:
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    output.write(''.join(f"{row[0]}\n" for row in rows).encode('utf-8'))
+                    count += len(rows)
+            # On disk before the partition is dropped
+            raw.flush()
+            os.fsync(raw.fileno())
+        return count
+
+    def _write_parquet(self, cursor, path, batch_size):
+        import pyarrow
+        import pyarrow.parquet
+
+        from faucet.models import Transaction
+        integer_types = ('AutoField', 'BigAutoField', 'IntegerField', 'BigIntegerField')
+        fields = Transaction._meta.concrete_fields
+        integer_columns = {field.column for field in fields if field.get_internal_type() in integer_types}
+        # Integers stay integers; everything else (timestamps, decimals, text) is kept as its JSON text
+        schema = pyarrow.schema([
+            (field.column, pyarrow.int64() if field.column in integer_columns else pyarrow.string())
+            for field in fields
+        ])
+
+        def cell(record, column):
+            value = record.get(column)
+            return value if value is None or column in integer_columns else str(value)
+
+        count = 0
+        with pyarrow.parquet.ParquetWriter(path, schema, compression='zstd') as writer:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                records = [json.loads(row[0]) for row in rows]
+                columns = {column: [cell(record, column) for record in records] for column in schema.names}
+                writer.write_table(pyarrow.Table.from_pydict(columns, schema=schema))
+                count += len(rows)
+
+        # On disk before the partition is dropped
+        with open(path, 'rb') as written:
+            os.fsync(written.fileno())
+        return count
+
+    def archive(self, name, directory, file_format='jsonl', detach=True):
+        """Detach (unless already detached), export and drop one partition"""
+        if detach:
+            self.detach(name)
+        path, count = self.export(name, directory, file_format)
+        self.drop(name)
+        logger.info(f"Archived partition {name} ({count} rows) to {path}")
+        return path, count
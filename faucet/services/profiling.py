@@ -0,0 +1,248 @@
+import io
+import os
+import sys
+import json
+import time
+import pstats
+import signal
+import cProfile
+import logging
+import functools
+import threading
+from collections import Counter
+from django.conf import settings
+from .memory import memory_tracker
+
+logger = logging.getLogger(__name__)
+
+# Staff requests carrying this header are profiled whether or not profiling is armed
+PROFILE_HEADER = 'HTTP_X_FAUCET_PROFILE'
+
+
+def profile_dir():
+    path = getattr(settings, 'PROFILE_DIR', 'profiles')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def list_profiles(limit=50):
+    """Saved profiles, stack samples and memory reports, newest first"""
+    path = profile_dir()
+    names = [name for name in os.listdir(path) if name.endswith(('.prof', '.folded', '.txt'))]
+    names.sort(key=lambda name: os.path.getmtime(os.path.join(path, name)), reverse=True)
+    return names[:limit]
+
+
+def profile_path(name):
+    """Path of a saved profile by name, or None if there is no such file"""
+    if name not in list_profiles(limit=None):
+        return None
+    return os.path.join(profile_dir(), name)
+
+
+def summarize_profile(path, limit=40):
+    """Text report of the functions with the most cumulative time in a saved cProfile dump"""
+    output = io.StringIO()
+    stats = pstats.Stats(path, stream=output)
+    stats.sort_stats('cumulative').print_stats(limit)
+    return output.getvalue()
+
+
+class RequestProfiler:
+    """
+    Runs requests under cProfile and saves each profile to PROFILE_DIR as a .prof file
+    (pstats format; readable with snakeviz or `python -m pstats`). Profiling is armed
+    per process for the next N requests, or asked for by a staff user on a single request
+    with the X-Faucet-Profile header. Only staff responses name the saved file. When neither applies the only cost is one
+    integer and one header check.
+    """
+
+    def __init__(self):
+        self.remaining = 0
+        self._lock = threading.Lock()
+        # One profile at a time: the interpreter allows a single active profiler
+        self._running = threading.Lock()
+        self._sequence = 0
+
+    def arm(self, count):
+        with self._lock:
+            self.remaining = count
+
+    def wants(self, request):
+        """Whether to profile this request; an armed slot is used up by the caller"""
+        if self.remaining <= 0 and PROFILE_HEADER not in request.META:
+            return False
+        if PROFILE_HEADER in request.META and request.user.is_staff:
+            return True
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+    def run(self, name, func, *args, **kwargs):
+        """Call func under the profiler; returns (result, saved file name or None)"""
+        if not self._running.acquire(blocking=False):
+            return func(*args, **kwargs), None
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                profiler.disable()
+            return result, self.save(profiler, name)
+        finally:
+            self._running.release()
+
+    def save(self, profiler, name):
+        with self._lock:
+            self._sequence += 1
+            sequence = self._sequence
+        filename = f"{name}-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{sequence}.prof"
+        try:
+            profiler.dump_stats(os.path.join(profile_dir(), filename))
+        except OSError as e:
+            logger.error(f"Failed to save profile {filename}: {str(e)}")
+            return None
+        logger.info(f"Saved profile {filename}")
+        return filename
+
+
+def profiled(name):
+    """Decorate a view method so armed or staff-requested calls are profiled, see RequestProfiler"""
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(view, request, *args, **kwargs):
+            if not request_profiler.wants(request):
+                return view_method(view, request, *args, **kwargs)
+            response, filename = request_profiler.run(name, view_method, view, request, *args, **kwargs)
+            # Armed slots profile anyone's request, but only staff learn where profiles are saved
+            if filename is not None and request.user.is_staff:
+                response['X-Faucet-Profile'] = filename
+            return response
+        return wrapper
+    return decorator
+
+
+class StackSampler:
+    """
+    Sampling profiler for the threads of this process. Every `interval` seconds it records
+    the stack of each matching thread, then writes the counts in the folded format that
+    flamegraph.pl, speedscope and inferno read ("thread;outer;...;inner count" per line).
+    Nothing runs between samples, so the threads being profiled are barely slowed down.
+    """
+
+    def __init__(self):
+        self.interval = getattr(settings, 'PROFILE_STACK_INTERVAL', 0.01)
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def sample(self, seconds, thread_prefix=''):
+        """Counter of folded stacks sampled over `seconds`"""
+        stacks = Counter()
+        own_id = threading.get_ident()
+        stop_at = time.monotonic() + seconds
+        while time.monotonic() < stop_at:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                name = names.get(thread_id, str(thread_id))
+                if thread_id == own_id or not name.startswith(thread_prefix):
+                    continue
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    # Per function rather than per line, so each function is one box in the flame graph
+                    frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stacks[';'.join([name] + frames[::-1])] += 1
+            time.sleep(self.interval)
+        return stacks
+
+    def write(self, stacks, path):
+        # Renamed into place so the file never appears half written
+        partial = f"{path}.partial"
+        with open(partial, 'w') as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        os.replace(partial, path)
+
+    def start(self, seconds, thread_prefix='', path=None):
+        """Sample in a background thread and write the result to `path`; returns it, or None if already running"""
+        if self.running:
+            return None
+        path = path or os.path.join(profile_dir(), f"stacks-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}.folded")
+
+        def run():
+            try:
+                self.write(self.sample(seconds, thread_prefix), path)
+                logger.info(f"Saved stack samples to {path}")
+            except Exception as e:
+                logger.error(f"Stack sampling failed: {str(e)}")
+
+        self._thread = threading.Thread(target=run, name="faucet-stack-sampler")
+        self._thread.daemon = True
+        self._thread.start()
+        return path
+
+
+def memory_report_path():
+    return os.path.join(profile_dir(), f"memory-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}.txt")
+
+
+def start_memory_report(action, path=None, limit=25):
+    """Write a memory report (see MemoryTracker.report) from a background thread; returns its path"""
+    path = path or memory_report_path()
+
+    def run():
+        try:
+            memory_tracker.write_report(path, action, limit)
+            logger.info(f"Saved memory report to {path}")
+        except Exception as e:
+            logger.error(f"Memory report failed: {str(e)}")
+
+    thread = threading.Thread(target=run, name="faucet-memory-report")
+    thread.daemon = True
+    thread.start()
+    return path
+
+
+def stack_request_path(pid):
+    """Where profile_worker leaves the options for the next SIGUSR2 of process `pid`"""
+    return os.path.join(profile_dir(), f"stacks-request-{pid}.json")
+
+
+def handle_sample_signal(signum, frame):
+    """SIGUSR2: sample this process's stacks, or report its memory, with options left by profile_worker if any"""
+    options = {}
+    request_path = stack_request_path(os.getpid())
+    try:
+        with open(request_path) as f:
+            options = json.load(f)
+        os.remove(request_path)
+    except (OSError, ValueError):
+        pass
+    if options.get('memory'):
+        # Taking a tracemalloc snapshot is slow; don't do it inside the signal handler
+        start_memory_report(options['memory'], path=options.get('output'), limit=options.get('limit', 25))
+        return
+    stack_sampler.start(
+        options.get('seconds', getattr(settings, 'PROFILE_STACK_SECONDS', 30)),
+        thread_prefix=options.get('threads', ''),
+        path=options.get('output')
+    )
+
+
+def install_signal_handler():
+    """Sample stacks on SIGUSR2; nothing runs until the signal arrives"""
+    if hasattr(signal, 'SIGUSR2'):
+        signal.signal(signal.SIGUSR2, handle_sample_signal)
+
+
+# Singleton instance
+request_profiler = RequestProfiler()
+stack_sampler = StackSampler()
@@ -0,0 +1,100 @@
+import json
+import logging
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.dateparse import parse_datetime
+from .transaction_events import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+
+class RedisQueueBackend:
+    """
+    Redis list that hands queued transactions from web processes to the
+    standalone `run_faucet_worker` process. Items are pushed on the left and
+    popped from the right; items returned by a draining worker go back on the
+    right so they are picked up first. Delayed retries wait in a sorted set
+    scored by the time they become due.
+    """
+    INCOMING_KEY = 'faucet:queue:incoming'
+    DELAYED_KEY = 'faucet:queue:delayed'
+    HEALTH_KEY = 'faucet:queue:workers'
+
+    def __init__(self, redis=None):
+        self._redis = redis
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            self._redis = get_redis_connection()
+            if self._redis is None:
+                raise RuntimeError("TRANSACTION_QUEUE_WORKER='external' requires the Redis cache backend")
+        return self._redis
+
+    def _encode(self, priority, tx_data):
+        return json.dumps({'priority': priority, 'tx_data': tx_data}, cls=DjangoJSONEncoder)
+
+    def _decode(self, raw):
+        item = json.loads(raw)
+        tx_data = item['tx_data']
+        if tx_data.get('enqueued_at'):
+            tx_data['enqueued_at'] = parse_datetime(tx_data['enqueued_at'])
+        return item['priority'], tx_data
+
+    def push(self, priority, tx_data):
+        """Add a transaction for the workers to pick up"""
+        self.redis.lpush(self.INCOMING_KEY, self._encode(priority, tx_data))
+
+    def push_front(self, items):
+        """Return (priority, tx_data) items to the head of the list (e.g. when a worker drains)"""
+        if items:
+            self.redis.rpush(self.INCOMING_KEY, *[self._encode(priority, tx_data) for priority, tx_data in items])
+
+    def pop(self, timeout=1):
+        """Block up to `timeout` seconds for the next item; returns None if there is none"""
+        result = self.redis.brpop(self.INCOMING_KEY, timeout=timeout)
+        if result is None:
+            return None
+        return self._decode(result[1])
+
+    def size(self):
+        """Number of items waiting to be picked up by a worker"""
+        return self.redis.llen(self.INCOMING_KEY)
+
+    def schedule(self, priority, tx_data, due_at):
+        """Add an item to the delayed-retry sorted set, scored by when it becomes due"""
+        member = json.dumps({'priority': priority, 'tx_data': tx_data, 'due_at': due_at}, cls=DjangoJSONEncoder)
+        self.redis.zadd(self.DELAYED_KEY, {member: due_at})
+
+    def pop_due(self, now, limit=100):
+        """Remove and return delayed items that are due; ZREM decides the winner between workers"""
+        due = []
+        for member in self.redis.zrangebyscore(self.DELAYED_KEY, '-inf', now, start=0, num=limit):
+            if self.redis.zrem(self.DELAYED_KEY, member):
+                due.append(self._decode(member))
+        return due
+
+    def scheduled_count(self):
+        """Number of delayed retries waiting to become due"""
+        return self.redis.zcard(self.DELAYED_KEY)
+
+    def report_health(self, worker_id, report):
+        """Publish a worker's health report"""
+        self.redis.hset(self.HEALTH_KEY, worker_id, json.dumps(report, cls=DjangoJSONEncoder))
+
+    def remove_health(self, worker_id):
+        """Remove a worker's health report on shutdown"""
+        self.redis.hdel(self.HEALTH_KEY, worker_id)
+
+    def worker_health(self, max_age, now):
+        """Return fresh health reports from all workers, pruning stale ones"""
+        reports = []
+        for worker_id, raw in self.redis.hgetall(self.HEALTH_KEY).items():
+            try:
+                report = json.loads(raw)
+            except ValueError:
+                continue
+            if now - report.get('timestamp', 0) > max_age:
+                self.redis.hdel(self.HEALTH_KEY, worker_id)
+                continue
+            reports.append(report)
+        return reports
@@ -1,51 +1,127 @@
+import math
+import ipaddress
 import time
 from django.core.cache import cache
 from django.conf import settings
 from faucet.models import Transaction
+from .addresses import normalize_address, InvalidAddressError
+from .ip_prefixes import ip_access_list, parse_ip
 
 
 class RateLimiter:
-    """Service for rate limiting faucet requests based on IP and wallet address"""
+    """
+    Service for rate limiting faucet requests based on IP and wallet address.
+    IP limits apply to the networks around the address at several prefix lengths at once,
+    each with its own budget (e.g. one request per /32 and sixteen per /24 per window), so
+    rotating through the addresses of an IPv6 /64 or a hosting /24 doesn't buy fresh limits
+    and the number of keys grows with networks rather than addresses.
+    """
 
     def __init__(self):
         # Get rate limit timeout from settings (default 1 minute / 60 seconds)
         self.timeout = getattr(settings, 'RATE_LIMIT_TIMEOUT', 60)
+        # Prefix length -> requests allowed per timeout window from one network of that size
+        self.ipv4_budgets = getattr(settings, 'RATE_LIMIT_IPV4_PREFIXES', {32: 1})
+        self.ipv6_budgets = getattr(settings, 'RATE_LIMIT_IPV6_PREFIXES', {64: 1})
+
+    def ip_buckets(self, ip_address):
+        """(cache key, budget) of every network the IP address is limited in"""
+        if ip_access_list.is_allowed(ip_address):
+            return []
+
+        ip = parse_ip(ip_address)
+        if ip is None:
+            return [(f"faucet_ratelimit_ip_{ip_address}", 1)]
+
+        budgets = self.ipv4_budgets if ip.version == 4 else self.ipv6_budgets
+        return [
+            (f"faucet_ratelimit_net_{ipaddress.ip_network(f'{ip}/{prefix}', strict=False)}", budget)
+            for prefix, budget in budgets.items()
+        ]
+
+    def bucket_wait(self, arrival_time, budget, now):
+        """
+        Seconds until a network may make another request (GCRA). Each request pushes the
+        network's theoretical arrival time on by timeout / budget; up to `budget` requests
+        fit in one window. A budget of 1 means one request per timeout.
+        """
+        if arrival_time is None:
+            return 0
+        tolerance = self.timeout - self.timeout / budget
+        return max(0, arrival_time - tolerance - now)
 
     def is_rate_limited(self, ip_address, wallet_address):
         """
         Check if the request is rate limited
         Returns (is_limited, remaining_time) tuple
         """
-        current_time = int(time.time())
+        current_time = time.time()
 
-        # Create cache keys for IP and wallet address
-        ip_cache_key = f"faucet_ratelimit_ip_{ip_address}"
-        wallet_cache_key = f"faucet_ratelimit_wallet_{wallet_address}"
+        ip_buckets = self.ip_buckets(ip_address)
+        wallet_cache_key = f"faucet_ratelimit_wallet_{self.wallet_key(wallet_address)}"
+        # One cache round trip for every key
+        stored = cache.get_many([key for key, _ in ip_buckets] + [wallet_cache_key])
 
-        # Check if IP is rate limited
-        ip_last_request = cache.get(ip_cache_key)
-        if ip_last_request:
-            time_elapsed = current_time - ip_last_request
-            if time_elapsed < self.timeout:
-                return True, self.timeout - time_elapsed
+        # Check if any network around the IP is out of budget
+        for key, budget in ip_buckets:
+            wait = self.bucket_wait(stored.get(key), budget, current_time)
+            if wait > 0:
+                return True, math.ceil(wait)
 
         # Check if wallet is rate limited
-        wallet_last_request = cache.get(wallet_cache_key)
+        wallet_last_request = stored.get(wallet_cache_key)
         if wallet_last_request:
-            time_elapsed = current_time - wallet_last_request
+            time_elapsed = int(current_time) - wallet_last_request
             if time_elapsed < self.timeout:
                 return True, self.timeout - time_elapsed
 
         return False, 0
 
+    def wallet_key(self, wallet_address):
+        """Canonical form of the wallet, so case variants of one address share a limit"""
+        try:
+            return normalize_address(wallet_address)
+        except InvalidAddressError:
+            # Callers pass validated addresses; anything else still gets a case-insensitive key
+            return str(wallet_address).lower()
+
     def record_request(self, ip_address, wallet_address):
         """Record a request to update rate limiting"""
-        current_time = int(time.time())
+        current_time = time.time()
 
-        # Create cache keys for IP and wallet address
-        ip_cache_key = f"faucet_ratelimit_ip_{ip_address}"
-        wallet_cache_key = f"faucet_ratelimit_wallet_{wallet_address}"
+        ip_buckets = self.ip_buckets(ip_address)
+        stored = cache.get_many([key for key, _ in ip_buckets])
+        updates = {}
+        for key, budget in ip_buckets:
+            updates[key] = max(stored.get(key) or current_time, current_time) + self.timeout / budget
 
         # Set the cache with expiration = timeout
-        cache.set(ip_cache_key, current_time, self.timeout)
-        cache.set(wallet_cache_key, current_time, self.timeout)
\ No newline at end of file
+        for key, arrival_time in updates.items():
+            cache.set(key, arrival_time, math.ceil(arrival_time - current_time))
+        cache.set(f"faucet_ratelimit_wallet_{self.wallet_key(wallet_address)}", int(current_time), self.timeout)
+
+
+class PartnerQuota:
+    """Daily per-partner quota on the number of addresses funded through bulk requests"""
+
+    def _cache_key(self, partner):
+        return f"faucet_partner_quota_{partner.id}_{time.strftime('%Y%m%d', time.gmtime())}"
+
+    def reserve(self, partner, count):
+        """
+        Reserve `count` addresses from today's quota.
+        Returns (allowed, remaining) where remaining is what's left after the reservation.
+        """
+        cache_key = self._cache_key(partner)
+        cache.add(cache_key, 0, 86400)
+        used = cache.incr(cache_key, count)
+        if used > partner.daily_quota:
+            # All or nothing: give the reservation back
+            used = cache.decr(cache_key, count)
+            return False, max(0, partner.daily_quota - used)
+        return True, partner.daily_quota - used
+
+    def refund(self, partner, count):
+        """Return reserved addresses that were not funded after all"""
+        if count:
+            cache.decr(self._cache_key(partner), count)
@@ -0,0 +1,124 @@
+import time
+import logging
+import threading
+from contextlib import ContextDecorator
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+_state = threading.local()
+
+
+class reads_from_replica(ContextDecorator):
+    """
+    Send the ORM reads made inside this block (or decorated function) to the read replica,
+    if one is configured and not lagging. Reads elsewhere stay on the primary, so code that
+    needs to see its own writes keeps doing so without having to opt out.
+    """
+
+    def __enter__(self):
+        _state.depth = getattr(_state, 'depth', 0) + 1
+        return self
+
+    def __exit__(self, *exc_info):
+        _state.depth -= 1
+        return False
+
+
+def replica_reads_enabled():
+    return getattr(_state, 'depth', 0) > 0
+
+
+class ReplicaLagMonitor:
+    """
+    Tracks how far the read replica is behind the primary. The lag is measured on the
+    replica at most once per check interval per process; a replica that is too far behind,
+    or that can't be queried, is skipped until a later check finds it caught up.
+    """
+
+    def __init__(self):
+        self.alias = getattr(settings, 'DATABASE_REPLICA_ALIAS', 'replica')
+        self.max_lag = getattr(settings, 'DATABASE_REPLICA_MAX_LAG', 5.0)  # Seconds behind before falling back
+        self.check_interval = getattr(settings, 'DATABASE_REPLICA_LAG_CHECK_INTERVAL', 5.0)
+        self.lag = None  # Seconds behind at the last check; None if unknown
+        self.checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def configured(self):
+        return self.alias in connections.databases
+
+    def measure(self):
+        """
+        Replay lag of the replica in seconds: 0 once it has replayed everything the primary
+        has written, None if it is behind and has replayed nothing to date the lag by. The
+        replica's own received LSN can't tell: it stops moving when the WAL receiver
+        disconnects, and the replica would look caught up while it falls behind.
+        """
+        with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+            cursor.execute("SELECT pg_current_wal_lsn()::text")
+            primary_lsn = cursor.fetchone()[0]
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT CASE
+                    WHEN NOT pg_is_in_recovery() THEN 0
+                    WHEN pg_last_wal_replay_lsn() >= %s::pg_lsn THEN 0
+                    ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp())
+                END
+                """,
+                [primary_lsn]
+            )
+            lag = cursor.fetchone()[0]
+        return None if lag is None else float(lag)
+
+    def is_healthy(self):
+        now = time.monotonic()
+        # One thread re-measures; the others use the last result meanwhile
+        if now - self.checked_at >= self.check_interval and self._lock.acquire(blocking=False):
+            try:
+                self.lag = self.measure()
+                if self.lag is None:
+                    logger.warning("Replica is behind by an unknown time, reading from the primary")
+            except Exception as e:
+                logger.warning(f"Replica lag check failed, reading from the primary: {str(e)}")
+                self.lag = None
+            finally:
+                self.checked_at = now
+                self._lock.release()
+
+            if self.lag is not None and self.lag > self.max_lag:
+                logger.warning(f"Replica is {self.lag:.1f}s behind, reading from the primary")
+
+        return self.lag is not None and self.lag <= self.max_lag
+
+
+class ReplicaRouter:
+    """
+    Database router that sends reads opted in with reads_from_replica() to the replica and
+    everything else, including all writes and migrations, to the primary
+    """
+
+    def db_for_read(self, model, **hints):
+        if not replica_reads_enabled() or not replica_monitor.configured():
+            return None
+        # Inside a transaction on the primary, reads must see its uncommitted writes
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        if not replica_monitor.is_healthy():
+            return None
+        return replica_monitor.alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+# Singleton instance
+replica_monitor = ReplicaLagMonitor()
@@ -0,0 +1,98 @@
+import time
+import heapq
+import itertools
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RetryScheduler:
+    """
+    Timer heap for delayed retries. Failed transactions wait here, off the worker
+    threads, until their backoff expires and are then handed to `enqueue`.
+    When `persistent` is set the heap lives in the queue backend (a Redis sorted set),
+    so scheduled retries survive restarts and are shared by all worker processes.
+    """
+
+    def __init__(self, enqueue, backend=None, persistent=False):
+        self.enqueue = enqueue  # Callable taking (priority, tx_data)
+        self.backend = backend
+        self.persistent = persistent
+        self.poll_interval = 1.0  # Upper bound on how long a due item can wait in persistent mode
+        self.heap = []
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.thread = None
+        self.is_running = False
+
+    def schedule(self, priority, tx_data, delay):
+        """Run `tx_data` again after `delay` seconds"""
+        due_at = time.time() + delay
+        if self.persistent:
+            self.backend.schedule(priority, tx_data, due_at)
+            return
+
+        with self.condition:
+            heapq.heappush(self.heap, (due_at, next(self.counter), priority, tx_data))
+            self.condition.notify()
+        self.start()
+
+    def pop_due(self, now=None):
+        """Remove and return all (priority, tx_data) items whose time has come"""
+        now = now or time.time()
+        if self.persistent:
+            return self.backend.pop_due(now)
+
+        due = []
+        with self.condition:
+            while self.heap and self.heap[0][0] <= now:
+                due_at, _, priority, tx_data = heapq.heappop(self.heap)
+                due.append((priority, tx_data))
+        return due
+
+    def next_due_in(self):
+        """Seconds until the next scheduled item (poll interval if unknown or empty)"""
+        if self.persistent or not self.heap:
+            return self.poll_interval
+        return max(0.0, self.heap[0][0] - time.time())
+
+    def __len__(self):
+        if self.persistent:
+            return self.backend.scheduled_count()
+        return len(self.heap)
+
+    def start(self):
+        """Start the scheduler thread if not already running"""
+        if self.thread is None or not self.thread.is_alive():
+            self.is_running = True
+            self.thread = threading.Thread(target=self._run, name="faucet-retry-scheduler")
+            self.thread.daemon = True
+            self.thread.start()
+
+    def stop(self):
+        """Stop the scheduler thread; pending retries stay scheduled"""
+        self.is_running = False
+        with self.condition:
+            self.condition.notify()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=5.0)
+
+    def _run(self):
+        """Scheduler thread function: release due items to the queue"""
+        while self.is_running:
+            try:
+                for priority, tx_data in self.pop_due():
+                    try:
+                        self.enqueue(priority, tx_data)
+                    except Exception as e:
+                        # Queue full or similar: try again shortly rather than dropping the retry
+                        logger.warning("Could not release retry for transaction %s: %s", tx_data.get('id'), e)
+                        self.schedule(priority, tx_data, self.poll_interval)
+
+                with self.condition:
+                    if self.is_running:
+                        self.condition.wait(min(self.next_due_in(), self.poll_interval))
+            except Exception as e:
+                logger.error("Error in retry scheduler: %s", e)
+                time.sleep(1.0)
@@ -0,0 +1,63 @@
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from eth_account import Account
+
+# Signing key of a pool process, loaded once by the pool initializer
+_account = None
+
+
+def _load_key(private_key):
+    global _account
+    _account = Account.from_key(private_key)
+
+
+def _sign_chunk(transactions):
+    """Runs in a pool process: sign a slice of the batch with the preloaded key"""
+    return [bytes(_account.sign_transaction(tx).rawTransaction) for tx in transactions]
+
+
+class TransactionSigner:
+    """
+    Signing stage for batches of payouts. secp256k1 signing and RLP encoding are CPU
+    bound and hold the GIL, so with `processes` > 1 large batches are split across a
+    process pool, each process loading the key once at startup. Small batches, or
+    `processes` <= 1, are signed in the calling thread where IPC would cost more than
+    it saves. If the coincurve package is installed eth-keys uses it as its backend,
+    which makes each signature considerably cheaper either way.
+    """
+
+    def __init__(self, private_key, processes=0, min_batch=32):
+        self.private_key = private_key
+        self.processes = processes
+        self.min_batch = min_batch  # Smallest batch worth sending to the pool
+        self.account = Account.from_key(private_key)
+        self.executor = None
+
+    def _pool(self):
+        if self.executor is None:
+            # Spawned rather than forked: the parent runs threads (queue workers, listeners)
+            # whose locks must not be copied into the children mid-use
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_load_key,
+                initargs=(self.private_key,)
+            )
+        return self.executor
+
+    def sign_batch(self, transactions):
+        """Sign unsigned transaction dicts; returns raw signed bytes in the same order"""
+        if self.processes <= 1 or len(transactions) < self.min_batch:
+            return [bytes(self.account.sign_transaction(tx).rawTransaction) for tx in transactions]
+
+        # One contiguous chunk per process; map() returns results in submission order
+        chunk_size = math.ceil(len(transactions) / self.processes)
+        chunks = [transactions[i:i + chunk_size] for i in range(0, len(transactions), chunk_size)]
+        return [raw for chunk in self._pool().map(_sign_chunk, chunks) for raw in chunk]
+
+    def shutdown(self):
+        """Stop the pool processes, if any were started"""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
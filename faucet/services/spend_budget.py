@@ -0,0 +1,125 @@
+import math
+import time
+import logging
+import threading
+from decimal import Decimal
+from django.conf import settings
+from .transaction_events import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+GWEI_PER_ETH = Decimal(10) ** 9
+
+# Token bucket in gwei, refilled continuously from Redis server time so every node sees
+# the same clock. A negative amount is a refund. Returns {reserved, tokens left, wait seconds}.
+RESERVE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local amount = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+
+local reserved = 1
+local wait = 0
+if amount > tokens then
+    reserved = 0
+    wait = (amount - tokens) / rate
+else
+    tokens = math.min(capacity, tokens - amount)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+return {reserved, tostring(tokens), tostring(wait)}
+"""
+
+
+def to_gwei(amount_eth):
+    return int(Decimal(str(amount_eth)) * GWEI_PER_ETH)
+
+
+class SpendBudget:
+    """
+    Cap on the total ETH dispensed across all nodes: FAUCET_SPEND_BUDGET_ETH per
+    FAUCET_SPEND_BUDGET_PERIOD, refilled continuously. Each payout reserves its amount
+    before it is signed, with one atomic script call on Redis, and gets it back if it
+    ends up not being sent. Without Redis the bucket is kept per process.
+    """
+    KEY = 'faucet:spend_budget'
+
+    def __init__(self):
+        budget_eth = getattr(settings, 'FAUCET_SPEND_BUDGET_ETH', 0)
+        period = getattr(settings, 'FAUCET_SPEND_BUDGET_PERIOD', 3600)
+        self.capacity = to_gwei(budget_eth)
+        self.rate = self.capacity / period if period else 0  # Gwei refilled per second
+        self._script = None
+        self._lock = threading.Lock()
+        self._local = [float(self.capacity), time.monotonic()]  # Tokens and refill time without Redis
+
+    @property
+    def enabled(self):
+        return self.capacity > 0 and self.rate > 0
+
+    def _run(self, amount_gwei):
+        """(reserved, tokens left, seconds to wait) after applying `amount_gwei` to the bucket"""
+        redis = get_redis_connection()
+        if redis is not None:
+            try:
+                if self._script is None:
+                    self._script = redis.register_script(RESERVE_SCRIPT)
+                reserved, tokens, wait = self._script(keys=[self.KEY], args=[self.capacity, self.rate, amount_gwei])
+                return bool(int(reserved)), float(tokens), float(wait)
+            except Exception as e:
+                # Still capped while Redis is down, though per process rather than overall
+                logger.error("Spend budget unavailable in Redis, using this process's budget: %s", e)
+
+        with self._lock:
+            tokens, updated_at = self._local
+            now = time.monotonic()
+            tokens = min(self.capacity, tokens + (now - updated_at) * self.rate)
+            if amount_gwei > tokens:
+                self._local = [tokens, now]
+                return False, tokens, (amount_gwei - tokens) / self.rate
+            tokens = min(self.capacity, tokens - amount_gwei)
+            self._local = [tokens, now]
+            return True, tokens, 0.0
+
+    def reserve(self, amount_eth):
+        """
+        Take `amount_eth` from the budget. Returns (reserved, retry_after) where retry_after is
+        the whole seconds until enough has refilled.
+        """
+        if not self.enabled:
+            return True, 0
+
+        amount = to_gwei(amount_eth)
+        if amount > self.capacity:
+            # Could never fit, however long the client waits
+            return False, math.ceil(self.capacity / self.rate)
+
+        reserved, _, wait = self._run(amount)
+        if not reserved:
+            return False, max(1, math.ceil(wait))
+        return True, 0
+
+    def refund(self, amount_eth):
+        """Give back a reservation whose payout was never sent"""
+        if not self.enabled or not amount_eth:
+            return
+        self._run(-to_gwei(amount_eth))
+
+    def remaining(self):
+        """ETH currently available in the budget, or None if there is no budget"""
+        if not self.enabled:
+            return None
+        _, tokens, _ = self._run(0)
+        return Decimal(int(tokens)) / GWEI_PER_ETH
+
+
+# Singleton instance
+spend_budget = SpendBudget()
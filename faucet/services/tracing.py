@@ -0,0 +1,337 @@
+import os
+import re
+import json
+import time
+import queue
+import logging
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+from urllib.parse import urlparse
+import requests
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# OTLP span kinds
+INTERNAL, SERVER, CLIENT, PRODUCER, CONSUMER = 1, 2, 3, 4, 5
+
+STATUS_ERROR = 2
+
+TRACEPARENT_PATTERN = re.compile(r'([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})')
+
+SpanContext = namedtuple('SpanContext', ['trace_id', 'span_id', 'sampled'])
+
+_current_span = ContextVar('faucet_current_span', default=None)
+_inherited_attributes = ContextVar('faucet_span_attributes', default={})
+
+
+def format_traceparent(context):
+    """W3C traceparent header value for a span context"""
+    return f"00-{context.trace_id}-{context.span_id}-{'01' if context.sampled else '00'}"
+
+
+def parse_traceparent(value):
+    """SpanContext from a W3C traceparent header value, or None if it isn't a valid one"""
+    match = TRACEPARENT_PATTERN.fullmatch((value or '').strip().lower())
+    if match is None:
+        return None
+    version, trace_id, span_id, flags = match.groups()
+    if version == 'ff' or trace_id == '0' * 32 or span_id == '0' * 16:
+        return None
+    return SpanContext(trace_id, span_id, bool(int(flags, 16) & 1))
+
+
+def server_address(url):
+    """Host of an endpoint URL; the path is left out because providers put API keys in it"""
+    return urlparse(url).hostname or ''
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _otlp_attributes(attributes):
+    return [{'key': key, 'value': _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+@contextmanager
+def span_attributes(attributes):
+    """Add `attributes` to every span started inside this block, e.g. the attempt number of a retry"""
+    token = _inherited_attributes.set({**_inherited_attributes.get(), **attributes})
+    try:
+        yield
+    finally:
+        _inherited_attributes.reset(token)
+
+
+class Span:
+    """One timed operation in a trace. Only sampled spans are recorded and exported."""
+
+    def __init__(self, name, context, parent_id=None, kind=INTERNAL, attributes=None):
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.events = []
+        self.status = None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+
+    @property
+    def recording(self):
+        return self.context.sampled
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def add_event(self, name, attributes=None):
+        self.events.append((name, time.time_ns(), attributes or {}))
+
+    def record_exception(self, error):
+        self.status = (STATUS_ERROR, str(error))
+        self.add_event('exception', {'exception.type': type(error).__name__, 'exception.message': str(error)})
+
+    def end(self):
+        self.end_ns = time.time_ns()
+
+    def to_otlp(self):
+        """The span in OTLP/JSON form"""
+        span = {
+            'traceId': self.context.trace_id,
+            'spanId': self.context.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns or time.time_ns()),
+            'attributes': _otlp_attributes(self.attributes),
+            'events': [
+                {'name': name, 'timeUnixNano': str(at), 'attributes': _otlp_attributes(attributes)}
+                for name, at, attributes in self.events
+            ],
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        if self.status is not None:
+            span['status'] = {'code': self.status[0], 'message': self.status[1]}
+        return span
+
+
+class NoopSpan:
+    """Stands in for a span while tracing is off, so call sites needn't check"""
+    recording = False
+
+    def set_attribute(self, key, value):
+        pass
+
+    def add_event(self, name, attributes=None):
+        pass
+
+    def record_exception(self, error):
+        pass
+
+
+NOOP_SPAN = NoopSpan()
+
+
+class BatchExporter:
+    """
+    Exports finished spans from a background thread, in batches of OTLP/JSON
+    ExportTraceServiceRequest payloads. Spans are dropped rather than block the
+    request or worker when the buffer is full.
+    """
+
+    def __init__(self, service_name, interval=5.0, batch_size=512, max_buffered=8192):
+        self.service_name = service_name
+        self.interval = interval
+        self.batch_size = batch_size
+        self.buffer = queue.Queue(maxsize=max_buffered)
+        self.dropped = 0
+        self._thread = None
+        self._pid = None
+
+    def export(self, span):
+        # Threads don't survive a fork (gunicorn workers), so each process starts its own
+        if self._pid != os.getpid() or self._thread is None or not self._thread.is_alive():
+            self._start()
+        try:
+            self.buffer.put_nowait(span.to_otlp())
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name="faucet-trace-exporter")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+    def flush(self):
+        """Export everything buffered so far"""
+        while True:
+            spans = []
+            while len(spans) < self.batch_size:
+                try:
+                    spans.append(self.buffer.get_nowait())
+                except queue.Empty:
+                    break
+            if not spans:
+                return
+            try:
+                self.write(self.payload(spans))
+            except Exception as e:
+                logger.warning(f"Failed to export {len(spans)} spans: {str(e)}")
+
+    def payload(self, spans):
+        return {
+            'resourceSpans': [{
+                'resource': {'attributes': _otlp_attributes({'service.name': self.service_name})},
+                'scopeSpans': [{'scope': {'name': 'faucet'}, 'spans': spans}],
+            }]
+        }
+
+    def write(self, payload):
+        raise NotImplementedError
+
+
+class FileExporter(BatchExporter):
+    """One OTLP/JSON request per line, the format the OpenTelemetry Collector's otlpjsonfile receiver reads"""
+
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write(self, payload):
+        line = json.dumps(payload, separators=(',', ':'))
+        with self._lock, open(self.path, 'a') as f:
+            f.write(line + '\n')
+
+
+class OTLPExporter(BatchExporter):
+    """Posts OTLP/JSON to a collector's /v1/traces endpoint"""
+
+    def __init__(self, endpoint, **kwargs):
+        super().__init__(**kwargs)
+        self.endpoint = endpoint
+        self.session = requests.Session()
+
+    def write(self, payload):
+        response = self.session.post(self.endpoint, json=payload, timeout=10)
+        response.raise_for_status()
+
+
+def build_exporter():
+    """The exporter selected by TRACING_EXPORTER, or None when tracing is off"""
+    name = getattr(settings, 'TRACING_EXPORTER', 'none').lower()
+    options = {
+        'service_name': getattr(settings, 'TRACING_SERVICE_NAME', 'eth-faucet'),
+        'interval': getattr(settings, 'TRACING_EXPORT_INTERVAL', 5.0),
+    }
+    if name == 'file':
+        return FileExporter(getattr(settings, 'TRACING_FILE', 'traces.jsonl'), **options)
+    if name == 'otlp':
+        return OTLPExporter(getattr(settings, 'TRACING_OTLP_ENDPOINT', 'http://localhost:4318/v1/traces'), **options)
+    if name != 'none':
+        logger.error(f"Unknown TRACING_EXPORTER {name!r}, tracing is off")
+    return None
+
+
+class Tracer:
+    """
+    Minimal tracer compatible with OpenTelemetry: W3C traceparent propagation, spans
+    exported as OTLP/JSON to a file or a collector, and parent-based sampling of
+    TRACING_SAMPLE_RATE of new traces, decided from the trace id like OpenTelemetry's
+    TraceIdRatioBased sampler. With TRACING_EXPORTER=none every span is a no-op.
+    """
+
+    def __init__(self, exporter=None, sample_rate=None):
+        self.exporter = build_exporter() if exporter is None else exporter
+        self.sample_rate = getattr(settings, 'TRACING_SAMPLE_RATE', 0.1) if sample_rate is None else sample_rate
+
+    @property
+    def enabled(self):
+        return self.exporter is not None
+
+    def should_sample(self, trace_id):
+        return int(trace_id[16:], 16) < self.sample_rate * 2 ** 64
+
+    @contextmanager
+    def span(self, name, attributes=None, kind=INTERNAL, parent=None):
+        """
+        Time the block as a span, a child of the current span or of `parent` (a traceparent
+        string or SpanContext, e.g. carried in a queued item). Exceptions are recorded on it.
+        """
+        if not self.enabled:
+            yield NOOP_SPAN
+            return
+
+        if isinstance(parent, str):
+            parent = parse_traceparent(parent)
+        if parent is None:
+            current = _current_span.get()
+            parent = current.context if current is not None else None
+
+        if parent is not None:
+            context = SpanContext(parent.trace_id, os.urandom(8).hex(), parent.sampled)
+        else:
+            trace_id = os.urandom(16).hex()
+            context = SpanContext(trace_id, os.urandom(8).hex(), self.should_sample(trace_id))
+
+        span = Span(
+            name,
+            context,
+            parent_id=parent.span_id if parent is not None else None,
+            kind=kind,
+            attributes={**_inherited_attributes.get(), **(attributes or {})}
+        )
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+            if span.recording:
+                self.exporter.export(span)
+
+    def current_span(self):
+        return _current_span.get() or NOOP_SPAN
+
+    def traceparent(self):
+        """traceparent of the current span to pass on to other processes, or None outside a trace"""
+        span = _current_span.get()
+        return format_traceparent(span.context) if span is not None else None
+
+
+def trace_query(execute, sql, params, many, context):
+    """Database execute wrapper: a span per statement run inside a sampled trace"""
+    if not tracer.current_span().recording:
+        return execute(sql, params, many, context)
+
+    operation = sql.lstrip().split(' ', 1)[0].upper()
+    attributes = {
+        'db.system': context['connection'].vendor,
+        'db.operation': operation,
+        'db.statement': sql[:1000],
+    }
+    with tracer.span(f"db {operation}", attributes, kind=CLIENT):
+        return execute(sql, params, many, context)
+
+
+# Singleton instance
+tracer = Tracer()
@@ -0,0 +1,190 @@
+import json
+import time
+import hashlib
+import logging
+import threading
+from django.core.cache import cache
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ('success', 'failed')
+
+
+def get_redis_connection():
+    """Return the raw Redis client behind the default cache, or None if the cache isn't Redis"""
+    try:
+        from django_redis import get_redis_connection as _get_redis_connection
+        return _get_redis_connection('default')
+    except Exception:
+        return None
+
+
+def snapshot_transaction(transaction):
+    """Build the public status snapshot for a transaction, including its ETag"""
+    snapshot = {
+        'transaction_id': transaction.id,
+        'wallet_address': transaction.wallet_address,
+        'transaction_hash': transaction.transaction_hash,
+        'status': transaction.status,
+        'amount': str(transaction.amount),
+        'error_message': transaction.error_message,
+        'updated_at': transaction.updated_at.isoformat() if transaction.updated_at else None,
+    }
+    digest = hashlib.sha1(json.dumps(snapshot, sort_keys=True).encode()).hexdigest()[:16]
+    snapshot['etag'] = f'"{transaction.id}-{digest}"'
+    return snapshot
+
+
+class TransactionEventBus:
+    """
+    Publishes transaction status changes and lets request threads wait for them.
+    Snapshots are cached so status reads don't hit the database, and a single
+    Redis pub/sub listener per process wakes every local waiter, so thousands
+    of long-polling clients cost no extra queries.
+    """
+    CHANNEL = 'faucet:transactions'
+
+    def __init__(self):
+        self.cache_ttl = getattr(settings, 'TRANSACTION_STATUS_CACHE_TTL', 3600)
+        self._lock = threading.Lock()
+        self._watches = {}  # transaction_id -> [condition, waiter_count, latest_snapshot]
+        self._listener_thread = None
+        # Each waiting request holds a server thread, so only this many may wait at once
+        self.max_waiters = getattr(settings, 'TRANSACTION_STATUS_MAX_WAITERS', 40)
+        self._waiters = 0
+
+    def _cache_key(self, transaction_id):
+        return f"faucet_tx_status_{transaction_id}"
+
+    def publish(self, transaction):
+        """Store the new snapshot and notify waiters in this and other processes"""
+        snapshot = snapshot_transaction(transaction)
+        cache.set(self._cache_key(transaction.id), snapshot, self.cache_ttl)
+        self._deliver(snapshot)
+
+        redis = get_redis_connection()
+        if redis is not None:
+            try:
+                redis.publish(self.CHANNEL, json.dumps(snapshot))
+            except Exception as e:
+                logger.warning("Failed to publish transaction event: %s", e)
+
+        return snapshot
+
+    def get_snapshot(self, transaction_id):
+        """Return the cached snapshot, falling back to a single database read"""
+        snapshot = cache.get(self._cache_key(transaction_id))
+        if snapshot is not None:
+            return snapshot
+
+        from faucet.models import Transaction
+        try:
+            transaction = Transaction.objects.get(id=transaction_id)
+        except Transaction.DoesNotExist:
+            return None
+
+        snapshot = snapshot_transaction(transaction)
+        cache.set(self._cache_key(transaction_id), snapshot, self.cache_ttl)
+        return snapshot
+
+    def reserve_waiter(self):
+        """Take one of this process's waiter slots; False if they are all in use"""
+        with self._lock:
+            if self._waiters >= self.max_waiters:
+                return False
+            self._waiters += 1
+            return True
+
+    def release_waiter(self):
+        with self._lock:
+            self._waiters -= 1
+
+    def wait_for_change(self, transaction_id, etag, timeout):
+        """
+        Block until the transaction's ETag differs from the given one or timeout expires.
+        Returns the latest snapshot (which may be unchanged on timeout).
+        """
+        self._ensure_listener()
+        deadline = time.monotonic() + timeout
+
+        with self._lock:
+            watch = self._watches.setdefault(transaction_id, [threading.Condition(self._lock), 0, None])
+            watch[1] += 1
+
+        try:
+            snapshot = self.get_snapshot(transaction_id)
+            if snapshot is None or snapshot['etag'] != etag:
+                return snapshot
+
+            with self._lock:
+                while True:
+                    latest = watch[2]
+                    if latest is not None and latest['etag'] != etag:
+                        return latest
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return latest or snapshot
+                    watch[0].wait(remaining)
+        finally:
+            with self._lock:
+                watch[1] -= 1
+                if watch[1] <= 0:
+                    self._watches.pop(transaction_id, None)
+
+    def wait_until_settled(self, transaction_id, timeout):
+        """
+        Block until the transaction reaches a terminal status or timeout expires.
+        Returns the latest snapshot, or None if the transaction doesn't exist.
+        """
+        deadline = time.monotonic() + timeout
+        snapshot = self.get_snapshot(transaction_id)
+
+        while snapshot is not None and snapshot['status'] not in TERMINAL_STATUSES:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            snapshot = self.wait_for_change(transaction_id, snapshot['etag'], remaining)
+
+        return snapshot
+
+    def _deliver(self, snapshot):
+        """Wake local waiters for the snapshot's transaction"""
+        with self._lock:
+            watch = self._watches.get(snapshot['transaction_id'])
+            if watch is not None:
+                watch[2] = snapshot
+                watch[0].notify_all()
+
+    def _ensure_listener(self):
+        """Start the Redis pub/sub listener thread if Redis is available"""
+        if self._listener_thread is not None and self._listener_thread.is_alive():
+            return
+        if get_redis_connection() is None:
+            return
+
+        with self._lock:
+            if self._listener_thread is None or not self._listener_thread.is_alive():
+                self._listener_thread = threading.Thread(target=self._listen)
+                self._listener_thread.daemon = True
+                self._listener_thread.start()
+
+    def _listen(self):
+        """Listener thread function relaying Redis notifications to local waiters"""
+        while True:
+            try:
+                pubsub = get_redis_connection().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.CHANNEL)
+                for message in pubsub.listen():
+                    try:
+                        self._deliver(json.loads(message['data']))
+                    except (ValueError, KeyError, TypeError):
+                        continue
+            except Exception as e:
+                logger.warning("Transaction event listener error: %s", e)
+                # Sleep briefly before reconnecting
+                time.sleep(1.0)
+
+
+# Singleton instance
+transaction_events = TransactionEventBus()
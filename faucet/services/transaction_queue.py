@@ -1,66 +1,391 @@
+import os
+import math
 import time
+import socket
 import threading
 import logging
 import queue
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.db.models import F
 from django.utils import timezone
 from faucet.models import Transaction
 from .ethereum import EthereumService
+from .deadline import Deadline
+from .fair_queue import FairQueue, client_key as default_client_key
+from .queue_backend import RedisQueueBackend
+from .retry_scheduler import RetryScheduler
+from .errors import classify_error, retry_delay, TransactionReplacedError
+from .spend_budget import spend_budget
+from .wallet_caps import wallet_caps
+from .tracing import tracer, span_attributes, PRODUCER, CONSUMER
+from .memory import rss_bytes
 
 logger = logging.getLogger(__name__)
 
+
+class TransactionQueueFull(Exception):
+    """Raised when the queue is at capacity and cannot accept more transactions"""
+
+
 class TransactionQueue:
     """
     Queue system for processing Ethereum transactions asynchronously
     Helps with scalability under high demand by processing transactions in the background
+
+    With TRANSACTION_QUEUE_WORKER='thread' (default) each web process runs its own worker
+    thread. With 'external', web processes only hand transactions off through Redis and
+    the `run_faucet_worker` management command does all sending.
     """
     def __init__(self):
-        self.queue = queue.PriorityQueue()
+        self.max_size = getattr(settings, 'TRANSACTION_QUEUE_MAX_SIZE', 10000)
+        self.wait_slo = getattr(settings, 'TRANSACTION_QUEUE_WAIT_SLO', 300)  # Max acceptable queue wait in seconds
+        self.queue = FairQueue(
+            maxsize=self.max_size,
+            weights=getattr(settings, 'TRANSACTION_QUEUE_FAIR_WEIGHTS', {})
+        )
+        self.ipv4_prefix = getattr(settings, 'TRANSACTION_QUEUE_FAIR_IPV4_PREFIX', 24)
+        self.ipv6_prefix = getattr(settings, 'TRANSACTION_QUEUE_FAIR_IPV6_PREFIX', 48)
         self.worker_thread = None
+        self.worker_threads = []
         self.is_running = False
-        self.eth_service = None  # Will be initialized when processing starts
+
+        # External worker mode: web processes push to Redis, run_faucet_worker consumes
+        self.external = getattr(settings, 'TRANSACTION_QUEUE_WORKER', 'thread') == 'external'
+        self.is_worker_process = False
+        self.backend = RedisQueueBackend()
+        self.consumer_thread = None
+        self.is_consuming = False
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.health_interval = getattr(settings, 'TRANSACTION_QUEUE_HEALTH_INTERVAL', 10)
+        self._health_cache = (0, [])
+
+        self.batch_size = getattr(settings, 'TRANSACTION_QUEUE_BATCH_SIZE', 50)  # Max transactions per batch item
+
+        # Failed sends wait out their backoff in the retry scheduler, not in a worker thread
+        self.retry_policies = getattr(settings, 'TRANSACTION_RETRY_POLICIES', {})
+        self.retry_scheduler = RetryScheduler(self._put_item, backend=self.backend)
+
+        # Drain rate tracking: exponentially weighted average of per-item service time
+        self.service_time = getattr(settings, 'TRANSACTION_QUEUE_INITIAL_SERVICE_TIME', 1.0)
+        self.service_time_alpha = 0.2
+        self.in_flight = 0
+        self.worker_count = 1
+        self.processed_count = 0
+        self._stats_lock = threading.Lock()
+
+    @property
+    def hands_off(self):
+        """True in web processes that hand work to an external worker instead of processing it"""
+        return self.external and not self.is_worker_process
 
     def start_worker(self):
-        """Start the background worker thread if not already running"""
-        if self.worker_thread is None or not self.worker_thread.is_alive():
-            self.is_running = True
-            self.worker_thread = threading.Thread(target=self._process_queue)
-            self.worker_thread.daemon = True  # Thread will exit when main program exits
-            self.worker_thread.start()
+        """Start the background worker thread(s) if not already running"""
+        if self.hands_off:
+            return
+
+        self.is_running = True
+        alive = [thread for thread in self.worker_threads if thread.is_alive()]
+        for index in range(len(alive), self.worker_count):
+            thread = threading.Thread(target=self._process_queue, name=f"faucet-worker-{index}")
+            thread.daemon = True  # Thread will exit when main program exits
+            thread.start()
+            alive.append(thread)
             logger.info("Transaction queue worker started")
 
+        self.worker_threads = alive
+        self.worker_thread = alive[0] if alive else None
+
     def stop_worker(self):
-        """Signal the worker thread to stop"""
+        """Signal the worker thread(s) to stop"""
         self.is_running = False
-        if self.worker_thread and self.worker_thread.is_alive():
-            self.worker_thread.join(timeout=5.0)
-            logger.info("Transaction queue worker stopped")
+        self.retry_scheduler.stop()
+        threads = set(self.worker_threads)
+        if self.worker_thread is not None:
+            threads.add(self.worker_thread)
+
+        for thread in threads:
+            if thread.is_alive():
+                thread.join(timeout=5.0)
+                logger.info("Transaction queue worker stopped")
+        self.worker_threads = []
+
+    def start_consumer(self):
+        """Start pulling handed-off transactions from Redis into the local fair queue"""
+        if self.consumer_thread is None or not self.consumer_thread.is_alive():
+            self.is_consuming = True
+            self.consumer_thread = threading.Thread(target=self._consume_backend, name="faucet-consumer")
+            self.consumer_thread.daemon = True
+            self.consumer_thread.start()
+            logger.info("Transaction queue consumer started")
+
+        # Retries scheduled by any worker process (including earlier runs) live in Redis
+        self.retry_scheduler.persistent = True
+        self.retry_scheduler.start()
+
+    def stop_consumer(self):
+        """Stop pulling new work from Redis"""
+        self.is_consuming = False
+        if self.consumer_thread and self.consumer_thread.is_alive():
+            self.consumer_thread.join(timeout=5.0)
+            logger.info("Transaction queue consumer stopped")
+
+    def _consume_backend(self):
+        """Consumer thread function: move items from Redis into the local queue while there is room"""
+        while self.is_consuming:
+            try:
+                if self.queue.qsize() >= self.max_size:
+                    # Leave the backlog in Redis until local workers catch up
+                    time.sleep(0.1)
+                    continue
+
+                item = self.backend.pop(timeout=1)
+                if item is not None:
+                    self.queue.put_nowait(item)
+            except Exception as e:
+                logger.error("Error consuming from queue backend: %s", e)
+                time.sleep(1.0)
+
+    def return_local_items(self):
+        """Hand locally queued (not yet started) items back to Redis so other workers can take them"""
+        items = []
+        while True:
+            try:
+                items.append(self.queue.get_nowait())
+                self.queue.task_done()
+            except queue.Empty:
+                break
+
+        if items:
+            # The head of the local queue should be the first item taken back out
+            self.backend.push_front(list(reversed(items)))
+            logger.info("Returned %s queued transactions to the queue backend", len(items))
+        return len(items)
+
+    def recover_pending(self, limit=None):
+        """
+        Enqueue pending transactions left behind by crashed or stopped workers.
+        Duplicates of items still waiting in Redis are harmless: each item is claimed
+        before processing and skipped if it is no longer pending.
+        Transactions that were already signed go first, in nonce order, so their saved
+        bytes are rebroadcast before new transfers take the next nonces.
+        """
+        limit = limit or self.max_size
+        pending = Transaction.objects.filter(status='pending').order_by(
+            F('nonce').asc(nulls_last=True), 'created_at'
+        ).values_list('id', 'wallet_address', 'ip_address', 'priority', 'nonce')[:limit]
 
-    def enqueue_transaction(self, transaction_id, wallet_address, ip_address, priority=0):
+        count = 0
+        for transaction_id, wallet_address, ip_address, priority, nonce in pending:
+            if nonce is not None:
+                priority = -1  # Same precedence as scheduled retries
+            try:
+                self._put_local(transaction_id, wallet_address, ip_address, priority, None)
+            except TransactionQueueFull:
+                break
+            count += 1
+
+        if count:
+            logger.info("Recovered %s pending transactions", count)
+        return count
+
+    def health_report(self):
+        """Snapshot of this worker process's state"""
+        return {
+            'worker_id': self.worker_id,
+            'pid': os.getpid(),
+            'timestamp': time.time(),
+            'concurrency': self.worker_count,
+            'alive_threads': sum(1 for thread in self.worker_threads if thread.is_alive()),
+            'queued': self.queue.qsize(),
+            'queued_bytes': self.queue.bytes,
+            'rss_bytes': rss_bytes(),
+            'in_flight': self.in_flight,
+            'processed': self.processed_count,
+            'service_time': self.service_time,
+        }
+
+    def report_health(self):
+        """Publish this worker's health report for web processes and monitoring"""
+        report = self.health_report()
+        if self.external:
+            self.backend.report_health(self.worker_id, report)
+        return report
+
+    def _worker_reports(self):
+        """Fresh health reports of external workers, cached for a second"""
+        expires_at, reports = self._health_cache
+        now = time.time()
+        if now >= expires_at:
+            reports = self.backend.worker_health(max_age=3 * self.health_interval, now=now)
+            self._health_cache = (now + 1.0, reports)
+        return reports
+
+    def _load(self):
+        """Return (depth, in_flight, drain_rate) for the workers serving this queue"""
+        if self.hands_off:
+            reports = self._worker_reports()
+            depth = self.backend.size() + sum(report['queued'] for report in reports)
+            in_flight = sum(report['in_flight'] for report in reports)
+            rate = sum(report['concurrency'] / report['service_time'] for report in reports)
+            return depth, in_flight, rate
+
+        return self.queue.qsize(), self.in_flight, self.worker_count / self.service_time
+
+    def queue_depth(self):
+        """Number of transactions waiting to be processed"""
+        return self._load()[0]
+
+    def drain_rate(self):
+        """Measured throughput of the workers in transactions per second"""
+        return self._load()[2]
+
+    def estimated_wait(self, extra=1):
+        """Estimated seconds until `extra` newly enqueued transactions would finish processing"""
+        depth, in_flight, rate = self._load()
+        if rate <= 0:
+            return math.inf
+        return (depth + in_flight + extra) / rate
+
+    def admission_check(self):
+        """
+        Decide whether a new transaction can be accepted.
+        Returns (accepted, retry_after) where retry_after is the number of seconds until
+        the backlog is expected to drain enough to accept it.
+        """
+        depth, in_flight, rate = self._load()
+        if rate <= 0:
+            # No live workers: nothing will drain until one reports in
+            return False, max(1, math.ceil(self.health_interval))
+
+        retry_after = 0.0
+
+        # Hard capacity bound keeps memory use bounded
+        if depth >= self.max_size:
+            retry_after = (depth - self.max_size + 1) / rate
+
+        # Wait SLO: reject instead of accepting work that would wait too long
+        wait = (depth + in_flight + 1) / rate
+        if wait > self.wait_slo:
+            retry_after = max(retry_after, wait - self.wait_slo)
+
+        if retry_after > 0:
+            return False, max(1, math.ceil(retry_after))
+        return True, 0
+
+    def _record_service_time(self, seconds):
+        """Fold a processed item's service time into the drain rate estimate"""
+        with self._stats_lock:
+            self.service_time += self.service_time_alpha * (seconds - self.service_time)
+            self.processed_count += 1
+
+    def enqueue_transaction(self, transaction_id, wallet_address, ip_address, priority=0, client_key=None):
         """
         Add a transaction to the processing queue
         Lower priority values are processed first (0 is default priority)
+        Within a priority, clients (by subnet, or an explicit client_key such as an
+        API key) are served in turn according to their configured weights.
+        Raises TransactionQueueFull if the queue is at capacity.
+        """
+        attributes = {'faucet.transaction_id': transaction_id, 'faucet.priority': priority}
+        with tracer.span('queue.enqueue', attributes, kind=PRODUCER):
+            if self.hands_off:
+                self.backend.push(priority, self._build_item(transaction_id, wallet_address, ip_address, client_key))
+                logger.info("Transaction %s handed off with priority %s", transaction_id, priority, extra={'transaction_id': transaction_id})
+                return True
+
+            self._put_local(transaction_id, wallet_address, ip_address, priority, client_key)
+        logger.info("Transaction %s enqueued with priority %s", transaction_id, priority, extra={'transaction_id': transaction_id})
+
+        # Ensure worker is running
+        self.start_worker()
+
+        return True
+
+    def enqueue_batch(self, batch_id, transactions, ip_address, priority=0, client_key=None):
+        """
+        Add a partner batch, a list of (transaction_id, wallet_address) pairs, as queue items
+        of up to TRANSACTION_QUEUE_BATCH_SIZE transactions. Each item is signed and broadcast
+        together by one worker. All items are accepted or, if there is no room, none are.
         """
-        # Priority queue sorts by first item in tuple
-        self.queue.put((priority, {
+        if client_key is None:
+            client_key = default_client_key(ip_address, self.ipv4_prefix, self.ipv6_prefix)
+
+        attributes = {'faucet.batch_id': str(batch_id), 'faucet.priority': priority, 'faucet.batch_size': len(transactions)}
+        with tracer.span('queue.enqueue', attributes, kind=PRODUCER):
+            items = [
+                {
+                    'batch_id': str(batch_id),
+                    'transactions': [list(pair) for pair in transactions[start:start + self.batch_size]],
+                    'ip_address': ip_address,
+                    'client_key': client_key,
+                    'enqueued_at': timezone.now(),
+                    'traceparent': tracer.traceparent(),
+                }
+                for start in range(0, len(transactions), self.batch_size)
+            ]
+
+            if self.hands_off:
+                for item in items:
+                    self.backend.push(priority, item)
+            else:
+                if self.queue.qsize() + len(items) > self.max_size:
+                    raise TransactionQueueFull(f"Transaction queue is full ({self.max_size} items)")
+                for item in items:
+                    self._put_item(priority, item)
+                self.start_worker()
+
+        logger.info(
+            "Batch %s of %s transactions enqueued as %s items", batch_id, len(transactions), len(items),
+            extra={'batch_id': str(batch_id)}
+        )
+        return True
+
+    def _build_item(self, transaction_id, wallet_address, ip_address, client_key):
+        """Build the queued tx_data for a transaction"""
+        if client_key is None:
+            client_key = default_client_key(ip_address, self.ipv4_prefix, self.ipv6_prefix)
+
+        return {
             'id': transaction_id,
             'wallet_address': wallet_address,
             'ip_address': ip_address,
+            'client_key': client_key,
             'enqueued_at': timezone.now(),
-        }))
-        logger.info(f"Transaction {transaction_id} enqueued with priority {priority}")
+            # Continues the request's trace in whichever worker sends it
+            'traceparent': tracer.traceparent(),
+        }
 
-        # Ensure worker is running
-        self.start_worker()
+    def _put_local(self, transaction_id, wallet_address, ip_address, priority, client_key):
+        """Put a transaction on this process's fair queue"""
+        self._put_item(priority, self._build_item(transaction_id, wallet_address, ip_address, client_key))
 
-        return True
+    def _put_item(self, priority, tx_data):
+        """Put an already built item on this process's fair queue"""
+        try:
+            self.queue.put_nowait((priority, tx_data))
+        except queue.Full:
+            raise TransactionQueueFull(f"Transaction queue is full ({self.max_size} items)")
+
+    def _claim(self, transaction_id):
+        """
+        Claim a transaction so no other worker process sends it concurrently.
+        Held until the outcome is saved; expires on its own if the worker dies.
+        """
+        timeout = int(getattr(settings, 'FAUCET_WORKER_DEADLINE', 60.0)) + 30
+        return cache.add(f"faucet_tx_claim_{transaction_id}", self.worker_id, timeout)
+
+    def _release(self, transaction_id):
+        cache.delete(f"faucet_tx_claim_{transaction_id}")
 
     def _process_queue(self):
         """Worker thread function to process queued transactions"""
         # Initialize Ethereum service for this thread
         try:
-            self.eth_service = EthereumService()
+            eth_service = EthereumService()
         except Exception as e:
-            logger.error(f"Failed to initialize Ethereum service in queue worker: {str(e)}")
+            logger.error("Failed to initialize Ethereum service in queue worker: %s", e)
             self.is_running = False
             return
 
@@ -73,76 +398,228 @@ class TransactionQueue:
                 except queue.Empty:
                     continue
 
-                transaction_id = tx_data['id']
-                wallet_address = tx_data['wallet_address']
-
-                logger.info(f"Processing queued transaction {transaction_id} to {wallet_address}")
+                with self._stats_lock:
+                    self.in_flight += 1
+                started_at = time.monotonic()
 
                 try:
-                    # Get the transaction from the database
-                    transaction = Transaction.objects.get(id=transaction_id)
+                    # Long-lived thread: drop connections that have gone stale between items
+                    close_old_connections()
+                    with tracer.span('queue.process', self._span_attributes(tx_data), kind=CONSUMER, parent=tx_data.get('traceparent')):
+                        self._process_item(eth_service, tx_data)
+                finally:
+                    # Mark the task as done and update the drain rate estimate
+                    with self._stats_lock:
+                        self.in_flight -= 1
+                    self._record_service_time(time.monotonic() - started_at)
+                    self.queue.task_done()
+
+            except Exception as e:
+                logger.error("Error in transaction queue worker: %s", e)
+                # Sleep briefly to avoid tight error loops
+                time.sleep(1.0)
+
+        close_old_connections()
+        logger.info("Transaction queue worker exiting")
+
+    def _span_attributes(self, tx_data):
+        """Attributes of the span processing a queued item; the wait includes earlier attempts"""
+        attributes = {'faucet.worker_id': self.worker_id}
+        if 'transactions' in tx_data:
+            attributes['faucet.batch_id'] = tx_data['batch_id']
+        else:
+            attributes['faucet.transaction_id'] = tx_data['id']
+        if tx_data.get('enqueued_at'):
+            attributes['faucet.queue_wait_seconds'] = (timezone.now() - tx_data['enqueued_at']).total_seconds()
+        return attributes
+
+    def _process_item(self, eth_service, tx_data):
+        """Send one queued transaction and record the outcome"""
+        if 'transactions' in tx_data:
+            return self._process_batch(eth_service, tx_data)
+
+        transaction_id = tx_data['id']
+        wallet_address = tx_data['wallet_address']
+        log_context = {'transaction_id': transaction_id}
+
+        if not self._claim(transaction_id):
+            logger.info("Transaction %s is being processed by another worker, skipping", transaction_id, extra=log_context)
+            return
 
-                    # Only process if it's still pending (not already processed by another worker)
-                    if transaction.status == 'pending':
-                        # Send the transaction
-                        tx_hash = self.eth_service.send_transaction(wallet_address)
+        logger.info("Processing queued transaction %s to %s", transaction_id, wallet_address, extra=log_context)
 
-                        # Update the transaction record
-                        transaction.status = 'success'
-                        transaction.transaction_hash = tx_hash
-                        transaction.save()
+        try:
+            # Get the transaction from the database
+            transaction = Transaction.objects.get(id=transaction_id)
 
-                        logger.info(f"Transaction {transaction_id} completed successfully: {tx_hash}")
+            # Only process if it's still pending (not already processed by another worker)
+            if transaction.status == 'pending':
+                # Send the transaction within this item's time budget. A single attempt:
+                # retries are scheduled below rather than slept through on this thread
+                deadline = Deadline(getattr(settings, 'FAUCET_WORKER_DEADLINE', 60.0))
+                with span_attributes({'faucet.attempt': transaction.retry_count + 1}):
+                    if transaction.raw_transaction:
+                        # Signed by an earlier attempt that may or may not have reached the node:
+                        # resend the exact bytes rather than signing a second transfer
+                        tx_hash = eth_service.rebroadcast(
+                            transaction.raw_transaction, transaction.transaction_hash,
+                            nonce=transaction.nonce, deadline=deadline
+                        )
                     else:
-                        logger.info(f"Transaction {transaction_id} already processed, skipping")
+                        tx_hash = eth_service.send_payout(
+                            wallet_address,
+                            write_ahead=lambda payout: self._write_ahead(transaction, payout),
+                            deadline=deadline
+                        )
 
-                except Transaction.DoesNotExist:
-                    logger.error(f"Transaction {transaction_id} not found in database")
+                # Update the transaction record
+                transaction.status = 'success'
+                transaction.transaction_hash = tx_hash
+                transaction.save()
 
-                except Exception as e:
-                    try:
-                        # Get the transaction from the database
-                        transaction = Transaction.objects.get(id=transaction_id)
-
-                        # Mark as failed with error message
-                        transaction.status = 'failed'
-                        transaction.error_message = str(e)
-                        transaction.save()
-
-                        logger.error(f"Failed to process transaction {transaction_id}: {str(e)}")
-
-                        # Re-queue with higher priority if it's a recoverable error (e.g., RPC issues)
-                        if "connection" in str(e).lower() or "timeout" in str(e).lower():
-                            # Wait a bit before retrying
-                            time.sleep(5.0)
-                            if transaction.retry_count < 3:  # Limit retries
-                                transaction.retry_count += 1
-                                transaction.status = 'pending'
-                                transaction.save()
-
-                                # Higher priority for retry (negative number = higher priority)
-                                retry_priority = -1
-                                self.enqueue_transaction(
-                                    transaction_id,
-                                    wallet_address,
-                                    tx_data['ip_address'],
-                                    priority=retry_priority
-                                )
-                                logger.info(f"Re-queued transaction {transaction_id} with priority {retry_priority}")
+                logger.info("Transaction %s completed successfully: %s", transaction_id, tx_hash, extra=log_context)
+            else:
+                logger.info("Transaction %s already processed, skipping", transaction_id, extra=log_context)
 
-                    except Exception as inner_e:
-                        logger.error(f"Error handling transaction failure: {str(inner_e)}")
+        except Transaction.DoesNotExist:
+            logger.error("Transaction %s not found in database", transaction_id, extra=log_context)
 
-                finally:
-                    # Mark the task as done
-                    self.queue.task_done()
+        except Exception as e:
+            try:
+                self._handle_failure(eth_service, transaction_id, tx_data, e)
+            except Exception as inner_e:
+                logger.error("Error handling transaction failure: %s", inner_e)
 
+        finally:
+            self._release(transaction_id)
+
+    def _process_batch(self, eth_service, tx_data):
+        """Send a batch item: one signing pass and write-ahead for all of it, then broadcasts in nonce order"""
+        claimed = [transaction_id for transaction_id, _ in tx_data['transactions'] if self._claim(transaction_id)]
+        try:
+            rows = Transaction.objects.in_bulk(claimed)
+            pending = [rows[transaction_id] for transaction_id in claimed
+                       if transaction_id in rows and rows[transaction_id].status == 'pending']
+
+            # Rows signed by an earlier attempt go through the single path, which rebroadcasts their bytes
+            fresh = [transaction for transaction in pending if not transaction.raw_transaction]
+            for transaction in pending:
+                if transaction.raw_transaction:
+                    self._release(transaction.id)
+                    self._process_item(eth_service, self._batch_member(transaction, tx_data))
+
+            if not fresh:
+                return
+
+            logger.info(
+                "Processing %s transactions of batch %s", len(fresh), tx_data['batch_id'],
+                extra={'batch_id': tx_data['batch_id']}
+            )
+            deadline = Deadline(getattr(settings, 'FAUCET_WORKER_DEADLINE', 60.0))
+            try:
+                results = eth_service.send_payouts(
+                    [transaction.wallet_address for transaction in fresh],
+                    write_ahead=lambda payouts: self._write_ahead_batch(fresh, payouts),
+                    deadline=deadline
+                )
             except Exception as e:
-                logger.error(f"Error in transaction queue worker: {str(e)}")
-                # Sleep briefly to avoid tight error loops
-                time.sleep(1.0)
+                # Failed before anything was broadcast (e.g. balance check): each row retries on its own
+                results = [e] * len(fresh)
 
-        logger.info("Transaction queue worker exiting")
+            for transaction, result in zip(fresh, results):
+                if isinstance(result, Exception):
+                    try:
+                        self._handle_failure(eth_service, transaction.id, self._batch_member(transaction, tx_data), result)
+                    except Exception as inner_e:
+                        logger.error("Error handling transaction failure: %s", inner_e)
+                else:
+                    # Saved one by one so each row's status change is published
+                    transaction.status = 'success'
+                    transaction.transaction_hash = result
+                    transaction.save()
+
+        finally:
+            for transaction_id in claimed:
+                self._release(transaction_id)
+
+    def _batch_member(self, transaction, tx_data):
+        """Single-transaction tx_data for one row of a batch item, used for its retries"""
+        return {
+            'id': transaction.id,
+            'wallet_address': transaction.wallet_address,
+            'ip_address': tx_data['ip_address'],
+            'client_key': tx_data['client_key'],
+            'enqueued_at': tx_data['enqueued_at'],
+            'traceparent': tx_data.get('traceparent'),
+        }
+
+    def _write_ahead_batch(self, transactions, payouts):
+        """Persist a batch of signed transfers with one query before any is broadcast"""
+        now = timezone.now()
+        for transaction, payout in zip(transactions, payouts):
+            transaction.raw_transaction = payout.raw_transaction
+            transaction.transaction_hash = payout.transaction_hash
+            transaction.nonce = payout.nonce
+            transaction.gas_price = payout.gas_price
+            transaction.updated_at = now
+        Transaction.objects.bulk_update(
+            transactions, ['raw_transaction', 'transaction_hash', 'nonce', 'gas_price', 'updated_at']
+        )
+
+    def _write_ahead(self, transaction, payout):
+        """Persist the signed transfer before it is broadcast"""
+        transaction.raw_transaction = payout.raw_transaction
+        transaction.transaction_hash = payout.transaction_hash
+        transaction.nonce = payout.nonce
+        transaction.gas_price = payout.gas_price
+        transaction.save(update_fields=['raw_transaction', 'transaction_hash', 'nonce', 'gas_price', 'updated_at'])
+
+    def _handle_failure(self, eth_service, transaction_id, tx_data, error):
+        """Schedule a delayed retry according to the error's policy, or mark the transaction failed"""
+        transaction = Transaction.objects.get(id=transaction_id)
+        error_class = classify_error(error)
+        policy = self.retry_policies.get(error_class)
+        transaction.error_message = str(error)
+
+        if policy is None or transaction.retry_count >= policy['max_retries']:
+            transaction.status = 'failed'
+            transaction.save()
+            # Nothing signed means nothing can be mined: return the reservation to the budget,
+            # and the payout to the wallet's caps (partner bulk rows are never counted)
+            if transaction.raw_transaction is None:
+                spend_budget.refund(transaction.amount)
+                if transaction.batch_id is None:
+                    wallet_caps.release(transaction.wallet_address, transaction.created_at)
+            logger.error(
+                "Failed to process transaction %s (%s): %s", transaction_id, error_class, error,
+                extra={'transaction_id': transaction_id}
+            )
+            return
+
+        # Still pending while it waits: clients see one outcome, not failed-then-pending
+        delay = retry_delay(policy, transaction.retry_count)
+        transaction.retry_count += 1
+        if isinstance(error, TransactionReplacedError):
+            # The signed bytes lost their nonce to another mined transaction and can never
+            # be mined, so the retry signs a fresh transfer. Any other nonce error keeps
+            # them: signing again while they might still be mined could pay twice
+            transaction.raw_transaction = None
+            transaction.transaction_hash = None
+            transaction.nonce = None
+            transaction.gas_price = None
+        transaction.save()
+
+        if error_class in ('connection', 'timeout'):
+            # Fail over to a fallback provider before the retry comes due
+            eth_service.reconnect()
+
+        # Higher priority for retry (negative number = higher priority)
+        self.retry_scheduler.schedule(-1, tx_data, delay)
+        logger.warning(
+            "Transaction %s failed (%s), retry %s/%s in %.1fs: %s",
+            transaction_id, error_class, transaction.retry_count, policy['max_retries'], delay, error,
+            extra={'transaction_id': transaction_id}
+        )
 
 # Singleton instance
-transaction_queue = TransactionQueue()
\ No newline at end of file
+transaction_queue = TransactionQueue()
@@ -0,0 +1,281 @@
+import math
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from faucet.models import Transaction, WalletPayoutCount
+from .transaction_events import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+# Counters are 4-bit and saturate, so caps above this can't be told apart
+MAX_COUNT = 15
+
+# Payouts that count against a cap; failed ones never sent anything
+COUNTED_STATUSES = ('pending', 'success')
+
+
+def filter_size(expected_items, false_positive_rate):
+    """(counters, hash functions) for a Bloom filter holding `expected_items` at the given FP rate"""
+    counters = math.ceil(-expected_items * math.log(false_positive_rate) / math.log(2) ** 2)
+    hashes = max(1, round(counters / expected_items * math.log(2)))
+    return counters, hashes
+
+
+class CountingBloomFilter:
+    """
+    Counting Bloom filter stored in one Redis string as 4-bit saturating counters (BITFIELD).
+    The smallest of an item's counters is an upper bound on the times it was added: never
+    lower than the truth, and higher only with about the configured false-positive rate.
+    Its memory is fixed by its size, however many items are added.
+    """
+
+    def __init__(self, key, counters, hashes, ttl=None):
+        self.key = key
+        self.counters = counters
+        self.hashes = hashes
+        self.ttl = ttl
+
+    def positions(self, item):
+        """Counter offsets of an item, by double hashing one digest"""
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.counters for i in range(self.hashes)]
+
+    def queue_count(self, pipe, item):
+        operation = pipe.bitfield(self.key)
+        for position in self.positions(item):
+            operation.get('u4', f'#{position}')
+        operation.execute()
+
+    def queue_add(self, pipe, item, amount=1):
+        operation = pipe.bitfield(self.key)
+        for position in self.positions(item):
+            operation.incrby('u4', f'#{position}', amount, overflow='SAT')
+        operation.execute()
+        if self.ttl:
+            pipe.expire(self.key, self.ttl)
+
+    def queue_remove(self, pipe, item):
+        # Only for items added before. A counter saturated at MAX_COUNT reads one lower after
+        # this than the truth, so with a cap of MAX_COUNT rebuild after many releases
+        operation = pipe.bitfield(self.key)
+        for position in self.positions(item):
+            operation.incrby('u4', f'#{position}', -1, overflow='SAT')
+        operation.execute()
+
+
+class WalletCaps:
+    """
+    Long-horizon payout caps per wallet: at most WALLET_CAP_PER_WINDOW payouts per
+    WALLET_CAP_WINDOW_DAYS days, and at most WALLET_CAP_LIFETIME ever (0 disables a rule).
+
+    Payouts are counted in Redis in counting Bloom filters: one per UTC day, expiring after
+    the window, and one for the lifetime. Those counts are never too low, so a wallet the
+    filters put under its cap is allowed with one pipelined Redis round trip and no query.
+    Only when they say it may be at its cap is the count confirmed in the database, which
+    also corrects the filters' false positives: the window on the wallet_address index, the
+    lifetime in WalletPayoutCount, which unlike the transaction table is never archived.
+    Without Redis every check queries the database.
+    """
+    WINDOW_KEY = 'faucet:walletcap:day:{day}'
+    LIFETIME_KEY = 'faucet:walletcap:lifetime'
+
+    def __init__(self):
+        self.window_days = getattr(settings, 'WALLET_CAP_WINDOW_DAYS', 7)
+        self.per_window = min(getattr(settings, 'WALLET_CAP_PER_WINDOW', 0), MAX_COUNT)
+        self.lifetime = min(getattr(settings, 'WALLET_CAP_LIFETIME', 0), MAX_COUNT)
+        false_positive_rate = getattr(settings, 'WALLET_CAP_FALSE_POSITIVE_RATE', 0.001)
+        # Sized once; the filters never grow past this
+        self.day_size = filter_size(getattr(settings, 'WALLET_CAP_EXPECTED_DAILY', 100000), false_positive_rate)
+        self.lifetime_size = filter_size(getattr(settings, 'WALLET_CAP_EXPECTED_WALLETS', 1000000), false_positive_rate)
+
+    @property
+    def enabled(self):
+        return bool(self.per_window or self.lifetime)
+
+    def day_filter(self, moment):
+        """Filter of the UTC day containing `moment`; it expires once the window has passed it"""
+        counters, hashes = self.day_size
+        return CountingBloomFilter(
+            self.WINDOW_KEY.format(day=f"{moment.astimezone(dt_timezone.utc):%Y%m%d}"),
+            counters,
+            hashes,
+            ttl=(self.window_days + 2) * 86400
+        )
+
+    def day_filters(self, now):
+        """Filters of today and the previous window_days days: a superset of the window"""
+        return [self.day_filter(now - timedelta(days=offset)) for offset in range(self.window_days + 1)]
+
+    def lifetime_filter(self):
+        counters, hashes = self.lifetime_size
+        return CountingBloomFilter(self.LIFETIME_KEY, counters, hashes)
+
+    def sketch_counts(self, redis, wallet_address, now):
+        """(window count, lifetime count) upper bounds from the filters, in one round trip"""
+        day_filters = self.day_filters(now)
+        pipe = redis.pipeline(transaction=False)
+        for day_filter in day_filters:
+            day_filter.queue_count(pipe, wallet_address)
+        self.lifetime_filter().queue_count(pipe, wallet_address)
+        results = pipe.execute()
+
+        window_count = sum(min(counts) for counts in results[:len(day_filters)])
+        return window_count, min(results[-1])
+
+    def database_count(self, wallet_address, since=None):
+        # Partner bulk payouts are never counted against a wallet's caps
+        queryset = Transaction.objects.filter(
+            wallet_address=wallet_address, status__in=COUNTED_STATUSES, batch_id__isnull=True
+        )
+        if since is not None:
+            queryset = queryset.filter(created_at__gte=since)
+        return queryset.count()
+
+    def lifetime_count(self, wallet_address):
+        row = WalletPayoutCount.objects.filter(wallet_address=wallet_address).values_list('count', flat=True).first()
+        return row or 0
+
+    def _count_payout(self, wallet_address, change):
+        """Add `change` to the wallet's durable lifetime count"""
+        payouts = WalletPayoutCount.objects.filter(wallet_address=wallet_address)
+        if change < 0:
+            payouts.filter(count__gt=0).update(count=F('count') + change)
+            return
+        if payouts.update(count=F('count') + change):
+            return
+        try:
+            with transaction.atomic():
+                WalletPayoutCount.objects.create(wallet_address=wallet_address, count=change)
+        except IntegrityError:
+            # Created by a concurrent payout meanwhile
+            payouts.update(count=F('count') + change)
+
+    def check(self, wallet_address):
+        """
+        Whether the wallet may receive another payout. Returns (allowed, rule) where rule is
+        'window' or 'lifetime' for the cap that was reached, or None.
+        """
+        if not self.enabled:
+            return True, None
+
+        now = datetime.now(dt_timezone.utc)
+        redis = get_redis_connection()
+        window_maybe = lifetime_maybe = True
+        if redis is not None:
+            try:
+                window_count, lifetime_count = self.sketch_counts(redis, wallet_address, now)
+                window_maybe = window_count >= self.per_window
+                lifetime_maybe = lifetime_count >= self.lifetime
+            except Exception as e:
+                logger.warning("Wallet cap filters unavailable, checking the database: %s", e)
+
+        # "Maybe at the cap": confirm against the database
+        if self.per_window and window_maybe:
+            since = now - timedelta(days=self.window_days)
+            if self.database_count(wallet_address, since) >= self.per_window:
+                return False, 'window'
+        if self.lifetime and lifetime_maybe:
+            # Not the transaction table: it only covers the retention window
+            if self.lifetime_count(wallet_address) >= self.lifetime:
+                return False, 'lifetime'
+
+        return True, None
+
+    def record(self, wallet_address, at=None):
+        """Count a payout to the wallet in the filters and the lifetime count"""
+        if not self.enabled:
+            return
+        if self.lifetime:
+            self._count_payout(wallet_address, 1)
+        self._update_filters(wallet_address, at, CountingBloomFilter.queue_add)
+
+    def release(self, wallet_address, at):
+        """
+        Uncount a recorded payout that was never sent (it failed before it was signed), so
+        it doesn't use up the wallet's caps; `at` is when it was recorded
+        """
+        if not self.enabled:
+            return
+        if self.lifetime:
+            self._count_payout(wallet_address, -1)
+        self._update_filters(wallet_address, at, CountingBloomFilter.queue_remove)
+
+    def _update_filters(self, wallet_address, at, update):
+        redis = get_redis_connection()
+        if redis is None:
+            return
+
+        at = at or datetime.now(dt_timezone.utc)
+        pipe = redis.pipeline(transaction=False)
+        update(self.day_filter(at), pipe, wallet_address)
+        update(self.lifetime_filter(), pipe, wallet_address)
+        try:
+            pipe.execute()
+        except Exception as e:
+            # Missing counts would let wallets past the cap unchecked; rebuild_wallet_caps restores them
+            logger.error("Failed to update wallet cap filters: %s", e)
+
+    def rebuild(self, batch_size=5000):
+        """
+        Recreate the filters, e.g. after Redis lost them: the day filters from the transaction
+        table and the lifetime filter from the lifetime counts. Lifetime counts lower than the
+        payouts still in the table (e.g. from before the lifetime cap was set) are raised first.
+        Returns the number of payouts counted.
+        """
+        redis = get_redis_connection()
+        if redis is None:
+            raise RuntimeError("Wallet cap filters require the Redis cache backend")
+
+        self._raise_lifetime_counts(batch_size)
+
+        now = datetime.now(dt_timezone.utc)
+        redis.delete(self.LIFETIME_KEY, *[day_filter.key for day_filter in self.day_filters(now)])
+
+        count = 0
+        pipe = redis.pipeline(transaction=False)
+        lifetime_counts = WalletPayoutCount.objects.filter(count__gt=0).values_list('wallet_address', 'count')
+        for index, (wallet_address, payouts) in enumerate(lifetime_counts.iterator(chunk_size=batch_size), 1):
+            self.lifetime_filter().queue_add(pipe, wallet_address, min(payouts, MAX_COUNT))
+            count += payouts
+            if index % batch_size == 0:
+                pipe.execute()
+
+        window_start = (now - timedelta(days=self.window_days)).replace(hour=0, minute=0, second=0, microsecond=0)
+        rows = Transaction.objects.filter(
+            status__in=COUNTED_STATUSES, batch_id__isnull=True, created_at__gte=window_start
+        ).values_list('wallet_address', 'created_at')
+        for index, (wallet_address, created_at) in enumerate(rows.iterator(chunk_size=batch_size), 1):
+            self.day_filter(created_at).queue_add(pipe, wallet_address)
+            if index % batch_size == 0:
+                pipe.execute()
+        pipe.execute()
+        return count
+
+    def _raise_lifetime_counts(self, batch_size):
+        counts = dict(WalletPayoutCount.objects.values_list('wallet_address', 'count'))
+        retained = (
+            Transaction.objects.filter(status__in=COUNTED_STATUSES, batch_id__isnull=True)
+            .values('wallet_address')
+            .annotate(payouts=Count('id'))
+        )
+        raised = [
+            WalletPayoutCount(wallet_address=row['wallet_address'], count=row['payouts'])
+            for row in retained.iterator()
+            if row['payouts'] > counts.get(row['wallet_address'], 0)
+        ]
+        WalletPayoutCount.objects.bulk_create(
+            raised,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['wallet_address'],
+            update_fields=['count']
+        )
+
+
+# Singleton instance
+wallet_caps = WalletCaps()
@@ -0,0 +1,21 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .models import Transaction
+from .services.transaction_events import transaction_events
+from .services.tracing import tracer, trace_query
+
+
+@receiver(post_save, sender=Transaction)
+def publish_transaction_status(sender, instance, created, **kwargs):
+    """Push status changes to waiting clients (rows created already failed have no waiters)"""
+    if created and instance.status != 'pending':
+        return
+    transaction_events.publish(instance)
+
+
+@receiver(connection_created)
+def trace_database_queries(sender, connection, **kwargs):
+    """Time the statements run inside sampled traces, on every connection of every thread"""
+    if tracer.enabled:
+        connection.execute_wrappers.append(trace_query)
@@ -0,0 +1,162 @@
+import os
+import signal
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from faucet.models import Partner
+from faucet.services.profiling import install_signal_handler
+from faucet.services.memory import memory_tracker
+
+
+class RunFaucetWorkerCommandTests(TestCase):
+    """Test cases for the run_faucet_worker management command"""
+
+    @patch('faucet.management.commands.run_faucet_worker.signal.signal')
+    @patch('faucet.management.commands.run_faucet_worker.transaction_queue')
+    def test_worker_lifecycle(self, mock_queue, mock_signal):
+        """Test that the worker starts, reports health and drains on shutdown"""
+        mock_queue.external = True
+        mock_queue.in_flight = 0
+        mock_queue.worker_id = 'test-host:1'
+
+        # Stop as soon as the first health report has been published
+        def stop_after_report():
+            mock_signal.call_args_list[0][0][1](15, None)
+            return {}
+        mock_queue.report_health.side_effect = stop_after_report
+
+        out = StringIO()
+        call_command('run_faucet_worker', '--concurrency', '3', '--health-interval', '0.01', stdout=out)
+
+        self.assertTrue(mock_queue.is_worker_process)
+        self.assertEqual(mock_queue.worker_count, 3)
+        mock_queue.recover_pending.assert_called_once()
+        mock_queue.start_consumer.assert_called_once()
+        mock_queue.start_worker.assert_called_once()
+        mock_queue.report_health.assert_called_once()
+
+        # Graceful drain: stop pulling (retries included), return unstarted work, stop the threads
+        mock_queue.stop_consumer.assert_called_once()
+        mock_queue.return_local_items.assert_called_once()
+        calls = [name for name, _, _ in mock_queue.mock_calls]
+        self.assertLess(calls.index('retry_scheduler.stop'), calls.index('return_local_items'))
+        mock_queue.stop_worker.assert_called_once()
+        mock_queue.backend.remove_health.assert_called_once_with('test-host:1')
+        self.assertIn('stopped', out.getvalue())
+
+    @patch('faucet.management.commands.run_faucet_worker.signal.signal')
+    @patch('faucet.management.commands.run_faucet_worker.transaction_queue')
+    def test_recycles_after_max_items(self, mock_queue, mock_signal):
+        """Test that the worker drains and exits on its own once it has processed enough items"""
+        mock_queue.external = True
+        mock_queue.in_flight = 0
+        mock_queue.worker_id = 'test-host:1'
+        mock_queue.processed_count = 100
+
+        out = StringIO()
+        call_command('run_faucet_worker', '--max-items', '100', '--health-interval', '0.01', stdout=out)
+
+        # Unstarted work goes back to Redis for the next worker
+        mock_queue.return_local_items.assert_called_once()
+        mock_queue.stop_worker.assert_called_once()
+        self.assertIn('recycled after 100 items', out.getvalue())
+
+    @patch('faucet.management.commands.run_faucet_worker.transaction_queue')
+    def test_refuses_thread_mode(self, mock_queue):
+        """Test that the worker won't run beside the worker threads of thread-mode web processes"""
+        mock_queue.external = False
+        with self.assertRaises(CommandError):
+            call_command('run_faucet_worker')
+        mock_queue.start_worker.assert_not_called()
+
+
+class BenchmarkSigningCommandTests(TestCase):
+    """Test cases for the benchmark_signing management command"""
+
+    def test_reports_throughput(self):
+        """Test that the benchmark reports a rate for each process count"""
+        out = StringIO()
+        call_command('benchmark_signing', '--count', '10', '--processes', '0,1', stdout=out)
+
+        self.assertEqual(out.getvalue().count('signatures/sec'), 2)
+
+
+class CreateFaucetPartnerCommandTests(TestCase):
+    """Test cases for the create_faucet_partner management command"""
+
+    def test_creates_partner_with_key(self):
+        """Test that the printed key authenticates the new partner"""
+        out = StringIO()
+        call_command('create_faucet_partner', 'CI Pipeline', '--daily-quota', '50', stdout=out)
+
+        api_key = out.getvalue().split('API key: ')[1].strip()
+        partner = Partner.objects.get(api_key_hash=Partner.hash_key(api_key))
+        self.assertEqual(partner.name, 'CI Pipeline')
+        self.assertEqual(partner.daily_quota, 50)
+
+
+class ManagePartitionsCommandTests(TestCase):
+    """Test cases for the manage_partitions management command"""
+
+    def test_requires_partitioned_table(self):
+        """Test that the command refuses to run without a partitioned table"""
+        with self.assertRaises(CommandError):
+            call_command('manage_partitions', '--dry-run', stdout=StringIO())
+
+    @patch('faucet.management.commands.manage_partitions.time.sleep')
+    def test_every_keeps_running_after_failure(self, mock_sleep):
+        """Test that a scheduled run reports a failure and tries again a minute later"""
+        mock_sleep.side_effect = [None, KeyboardInterrupt]
+        err = StringIO()
+
+        with self.assertRaises(KeyboardInterrupt):
+            call_command('manage_partitions', '--every', '21600', stdout=StringIO(), stderr=err)
+
+        self.assertEqual(mock_sleep.call_count, 2)
+        mock_sleep.assert_called_with(60)
+        self.assertIn('not partitioned', err.getvalue())
+
+
+class ProfileWorkerCommandTests(TestCase):
+    """Test cases for the profile_worker management command"""
+
+    def test_signals_worker_and_waits_for_samples(self):
+        """Test that the target process samples its stacks on SIGUSR2 with the command's options"""
+        with tempfile.TemporaryDirectory() as directory, override_settings(PROFILE_DIR=directory):
+            previous = signal.getsignal(signal.SIGUSR2)
+            install_signal_handler()
+            try:
+                output = os.path.join(directory, 'worker.folded')
+                out = StringIO()
+                call_command('profile_worker', str(os.getpid()), '--seconds', '0.1', '--threads', '', '--output', output, stdout=out)
+            finally:
+                signal.signal(signal.SIGUSR2, previous)
+
+            self.assertIn(output, out.getvalue())
+            with open(output) as f:
+                self.assertTrue(f.read().strip())
+            self.assertFalse(os.path.exists(os.path.join(directory, f"stacks-request-{os.getpid()}.json")))
+
+    def test_memory_report(self):
+        """Test that the target process writes a memory report on SIGUSR2 when asked for one"""
+        with tempfile.TemporaryDirectory() as directory, override_settings(PROFILE_DIR=directory):
+            previous = signal.getsignal(signal.SIGUSR2)
+            install_signal_handler()
+            try:
+                output = os.path.join(directory, 'worker.txt')
+                call_command('profile_worker', str(os.getpid()), '--memory', 'top', '--output', output, stdout=StringIO())
+            finally:
+                signal.signal(signal.SIGUSR2, previous)
+                memory_tracker.stop()
+
+            with open(output) as f:
+                self.assertIn('Largest allocation sites', f.read())
+
+    def test_unknown_process(self):
+        """Test that a missing process is reported"""
+        with tempfile.TemporaryDirectory() as directory, override_settings(PROFILE_DIR=directory):
+            with self.assertRaises(CommandError):
+                call_command('profile_worker', '999999999', stdout=StringIO())
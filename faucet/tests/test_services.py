@@ -1,11 +1,41 @@
+import os
+import json
 import time
+import logging
+import tempfile
+import uuid
+import threading
+from io import StringIO
+from datetime import datetime, timedelta, timezone as dt_timezone
 from unittest.mock import patch, MagicMock
 from django.test import TestCase, override_settings
 from django.core.cache import cache
-from web3.exceptions import Web3Exception
-from faucet.services.ethereum import EthereumService
+from eth_account import Account
+from web3 import Web3
+from web3.exceptions import TransactionNotFound, Web3Exception
+from requests.exceptions import Timeout
+from faucet.services.ethereum import EthereumService, DeadlineHTTPProvider, SignedPayout
+from faucet.services.deadline import Deadline, DeadlineExceeded, deadline_scope
 from faucet.services.rate_limiter import RateLimiter
-from faucet.services.transaction_queue import TransactionQueue
+from faucet.services.ip_prefixes import PrefixTable, IPAccessList
+from faucet.services.spend_budget import SpendBudget
+from faucet.services.chain_heads import ChainHeadSubscriber, BlockCache, parse_head
+from faucet.services.profiling import StackSampler
+from faucet.services.memory import MemoryTracker, approximate_size
+from faucet.log import SamplingFilter, JSONFormatter, BackgroundStreamHandler, TraceContextFilter
+from faucet.services.tracing import Tracer, span_attributes, parse_traceparent, format_traceparent, FileExporter
+from faucet.services.wallet_caps import WalletCaps, CountingBloomFilter, filter_size
+from faucet.services.replica import ReplicaRouter, ReplicaLagMonitor, reads_from_replica, replica_monitor
+from faucet.services.partitions import period_start, next_period, partition_name, parse_bound
+from faucet.services.addresses import normalize_address, is_valid_address, address_bytes, InvalidAddressError
+from faucet.services.rpc_client import JSONRPCClient
+from faucet.services.signing import TransactionSigner
+from faucet.services.transaction_queue import TransactionQueue, TransactionQueueFull
+from faucet.services.transaction_events import TransactionEventBus
+from faucet.services.fair_queue import FairQueue, client_key
+from faucet.services.retry_scheduler import RetryScheduler
+from faucet.services.errors import classify_error, retry_delay, InsufficientFundsError, NonceError, TransactionReplacedError
+from faucet.models import Transaction
 
 
 class EthereumServiceTests(TestCase):
@@ -73,7 +103,93 @@ class EthereumServiceTests(TestCase):
         self.mock_w3_instance.eth.get_transaction_count.assert_called_once()
         self.mock_w3_instance.eth.account.sign_transaction.assert_called_once()
         self.mock_w3_instance.eth.send_raw_transaction.assert_called_once()
-        self.mock_w3_instance.to_hex.assert_called_once()
+
+    def test_send_retry_reuses_signed_transaction(self):
+        """Test that a broadcast delivered before it timed out is resent, not signed again with a new nonce"""
+        self.mock_w3_instance.to_hex.side_effect = lambda value: f"hex:{value}"
+        self.mock_w3_instance.eth.account.sign_transaction.side_effect = lambda tx, key: MagicMock(
+            rawTransaction=f"raw:{tx['nonce']}", hash=f"hash:{tx['nonce']}"
+        )
+        # The node takes the first broadcast, but the response times out; the resend is "already known"
+        self.mock_w3_instance.eth.send_raw_transaction.side_effect = [
+            Timeout("Read timed out"),
+            ValueError({'code': -32000, 'message': 'already known'}),
+        ]
+        self.service.retry_delay = 0.01
+
+        tx_hash = self.service.send_transaction('0x742d35Cc6634C0532925a3b844Bc454e4438f44e', deadline=Deadline(5.0))
+
+        self.assertEqual(tx_hash, 'hex:hash:1')
+        self.mock_w3_instance.eth.get_transaction_count.assert_called_once_with(self.service.from_address, 'pending')
+        self.mock_w3_instance.eth.account.sign_transaction.assert_called_once()
+        sent = [call[0][0] for call in self.mock_w3_instance.eth.send_raw_transaction.call_args_list]
+        self.assertEqual(sent, ['hex:raw:1', 'hex:raw:1'])
+
+    def test_send_payout_writes_ahead(self):
+        """Test that the signed transaction is handed to write_ahead before broadcast"""
+        calls = []
+        self.mock_w3_instance.eth.send_raw_transaction.side_effect = lambda raw: calls.append('broadcast')
+        self.mock_w3_instance.to_hex.side_effect = lambda value: f"hex:{value}"
+
+        tx_hash = self.service.send_payout(
+            '0x742d35Cc6634C0532925a3b844Bc454e4438f44e',
+            write_ahead=lambda payout: calls.append(payout)
+        )
+
+        payout = calls[0]
+        self.assertEqual(calls[1], 'broadcast')
+        self.assertEqual(payout.nonce, 1)
+        self.assertEqual(payout.gas_price, 20000000000)
+        self.assertEqual(tx_hash, payout.transaction_hash)
+        self.mock_w3_instance.eth.send_raw_transaction.assert_called_once_with(payout.raw_transaction)
+
+    def test_send_payouts_batch(self):
+        """Test that a batch gets consecutive nonces and is recorded before broadcast"""
+        self.mock_w3_instance.to_hex.side_effect = Web3.to_hex
+        self.mock_w3_instance.keccak.side_effect = Web3.keccak
+        self.mock_w3_instance.eth.send_raw_transaction.side_effect = [b'', ConnectionError("Connection refused")]
+        recorded = []
+
+        results = self.service.send_payouts(
+            ['0x742d35Cc6634C0532925a3b844Bc454e4438f44e', '0x742d35Cc6634C0532925a3b844Bc454e4438f44e'],
+            write_ahead=recorded.extend
+        )
+
+        self.assertEqual([payout.nonce for payout in recorded], [1, 2])
+        self.assertEqual(results[0], recorded[0].transaction_hash)
+        self.assertIsInstance(results[1], ConnectionError)
+
+    def test_rebroadcast_already_known(self):
+        """Test that rebroadcasting a transaction the node already has succeeds"""
+        self.mock_w3_instance.eth.send_raw_transaction.side_effect = ValueError({'code': -32000, 'message': 'already known'})
+
+        self.assertEqual(self.service.rebroadcast('0xf86c01', '0xabcd'), '0xabcd')
+
+    def test_rebroadcast_nonce_taken(self):
+        """Test that rebroadcast reports a nonce used by a different transaction"""
+        self.mock_w3_instance.eth.send_raw_transaction.side_effect = ValueError({'code': -32000, 'message': 'nonce too low'})
+        self.mock_w3_instance.eth.get_transaction_receipt.side_effect = TransactionNotFound("not found")
+        self.mock_w3_instance.eth.get_transaction.side_effect = TransactionNotFound("not found")
+        self.mock_w3_instance.eth.get_transaction_count.return_value = 8
+
+        with self.assertRaises(TransactionReplacedError):
+            self.service.rebroadcast('0xf86c01', '0xabcd', nonce=7)
+
+        # Not proven replaced while the mined nonce count hasn't passed it, or the node knows the transaction
+        self.mock_w3_instance.eth.get_transaction_count.return_value = 7
+        with self.assertRaises(NonceError) as raised:
+            self.service.rebroadcast('0xf86c01', '0xabcd', nonce=7)
+        self.assertNotIsInstance(raised.exception, TransactionReplacedError)
+
+        self.mock_w3_instance.eth.get_transaction_count.return_value = 8
+        self.mock_w3_instance.eth.get_transaction.side_effect = None
+        with self.assertRaises(NonceError) as raised:
+            self.service.rebroadcast('0xf86c01', '0xabcd', nonce=7)
+        self.assertNotIsInstance(raised.exception, TransactionReplacedError)
+
+        # ...but a mined transaction is a success
+        self.mock_w3_instance.eth.get_transaction_receipt.side_effect = None
+        self.assertEqual(self.service.rebroadcast('0xf86c01', '0xabcd'), '0xabcd')
 
     def test_send_transaction_invalid_address(self):
         """Test sending to an invalid address"""
@@ -134,6 +250,235 @@ class EthereumServiceTests(TestCase):
         # Verify multiple calls
         self.assertEqual(self.mock_w3_instance.eth.send_raw_transaction.call_count, 2)
 
+    def test_retry_stops_at_deadline(self):
+        """Test that retries are cancelled once the deadline leaves no time for another call"""
+        self.mock_w3_instance.eth.send_raw_transaction.side_effect = Web3Exception("RPC Error")
+
+        started = time.monotonic()
+        with self.assertRaises(DeadlineExceeded):
+            self.service.send_transaction(
+                '0x742d35Cc6634C0532925a3b844Bc454e4438f44e',
+                deadline=Deadline(0.2)
+            )
+
+        # Backoff (1s, then 2s) was cut short by the 0.2s budget
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertEqual(self.mock_w3_instance.eth.send_raw_transaction.call_count, 1)
+
+    def test_retries_bounded_by_deadline_not_count(self):
+        """Test that with a deadline, attempts continue past ETHEREUM_MAX_RETRIES while time is left"""
+        self.service.retry_delay = 0.01
+        self.service.min_rpc_timeout = 0.01
+        self.mock_w3_instance.eth.send_raw_transaction.side_effect = [Web3Exception("RPC Error")] * 4 + [b'0x5678']
+
+        tx_hash = self.service.send_transaction('0x742d35Cc6634C0532925a3b844Bc454e4438f44e', deadline=Deadline(5.0))
+
+        self.assertEqual(tx_hash, '0x5678')
+        self.assertEqual(self.mock_w3_instance.eth.send_raw_transaction.call_count, 5)
+
+
+class TransactionSignerTests(TestCase):
+    """Test cases for the batch signing stage"""
+
+    def setUp(self):
+        self.private_key = '0x0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef'
+        self.transactions = [
+            {'nonce': nonce, 'to': '0x742d35Cc6634C0532925a3b844Bc454e4438f44e', 'value': 1,
+             'gas': 21000, 'gasPrice': 20000000000, 'chainId': 11155111}
+            for nonce in range(4)
+        ]
+
+    def test_sign_batch_inline(self):
+        """Test that small batches are signed in-process, in order"""
+        signer = TransactionSigner(self.private_key)
+        signed = signer.sign_batch(self.transactions)
+
+        expected = [bytes(Account.sign_transaction(tx, self.private_key).rawTransaction) for tx in self.transactions]
+        self.assertEqual(signed, expected)
+        self.assertIsNone(signer.executor)
+
+    def test_sign_batch_process_pool(self):
+        """Test that pooled signing returns the same bytes in the same order"""
+        signer = TransactionSigner(self.private_key, processes=2, min_batch=1)
+        try:
+            signed = signer.sign_batch(self.transactions)
+        finally:
+            signer.shutdown()
+
+        self.assertEqual(signed, TransactionSigner(self.private_key).sign_batch(self.transactions))
+
+
+class DeadlineTests(TestCase):
+    """Test cases for Deadline and the deadline-aware HTTP provider"""
+
+    def test_timeout_capped_by_remaining(self):
+        """Test that call timeouts never exceed the time remaining"""
+        deadline = Deadline(2.0)
+        self.assertLessEqual(deadline.timeout(10.0), 2.0)
+        self.assertEqual(Deadline(60.0).timeout(10.0), 10.0)
+
+    def test_expired_deadline(self):
+        """Test that an expired deadline raises on use"""
+        deadline = Deadline(0)
+        self.assertTrue(deadline.expired)
+        with self.assertRaises(DeadlineExceeded):
+            deadline.timeout(10.0)
+        with self.assertRaises(DeadlineExceeded):
+            deadline.sleep(1.0)
+
+    def test_provider_uses_active_deadline(self):
+        """Test that the provider derives its request timeout from the active deadline"""
+        provider = DeadlineHTTPProvider('https://test-rpc-url.com', timeout=10.0)
+        self.assertEqual(provider.get_request_kwargs()['timeout'], 10.0)
+
+        with deadline_scope(Deadline(1.0)):
+            self.assertLessEqual(provider.get_request_kwargs()['timeout'], 1.0)
+
+        with deadline_scope(Deadline(0)):
+            with self.assertRaises(DeadlineExceeded):
+                provider.get_request_kwargs()
+
+
+class JSONRPCClientTests(TestCase):
+    """Test cases for the lean JSON-RPC client"""
+
+    def setUp(self):
+        self.client = JSONRPCClient('https://test-rpc-url.com', timeout=5.0)
+        self.client.session = MagicMock()
+
+    def respond(self, payload):
+        response = MagicMock()
+        response.content = json.dumps(payload).encode()
+        self.client.session.post.return_value = response
+
+    def test_request_body_and_result(self):
+        """Test that requests are valid JSON-RPC and quantities are decoded like web3"""
+        self.respond({'jsonrpc': '2.0', 'id': 1, 'result': '0x1b'})
+
+        nonce = self.client.get_transaction_count('0x742d35Cc6634C0532925a3b844Bc454e4438f44e', 'pending')
+
+        self.assertEqual(nonce, 27)
+        body = json.loads(self.client.session.post.call_args.kwargs['data'])
+        self.assertEqual(body['method'], 'eth_getTransactionCount')
+        self.assertEqual(body['params'], ['0x742d35Cc6634C0532925a3b844Bc454e4438f44e', 'pending'])
+        self.assertEqual(self.client.session.post.call_args.kwargs['timeout'], 5.0)
+
+    def test_rpc_error_raised_like_web3(self):
+        """Test that node errors are raised as ValueError carrying the error object"""
+        self.respond({'jsonrpc': '2.0', 'id': 1, 'error': {'code': -32000, 'message': 'nonce too low'}})
+
+        with self.assertRaises(ValueError) as context:
+            self.client.send_raw_transaction('0xf86c01')
+        self.assertEqual(classify_error(context.exception), 'nonce')
+
+    def test_missing_receipt(self):
+        """Test that an unknown transaction raises TransactionNotFound"""
+        self.respond({'jsonrpc': '2.0', 'id': 1, 'result': None})
+
+        with self.assertRaises(TransactionNotFound):
+            self.client.get_transaction_receipt('0xabcd')
+
+    def test_timeout_capped_by_deadline(self):
+        """Test that the per-call timeout is shortened by the active deadline"""
+        self.respond({'jsonrpc': '2.0', 'id': 1, 'result': '0x0'})
+
+        with deadline_scope(Deadline(1.0)):
+            self.client.get_balance('0x742d35Cc6634C0532925a3b844Bc454e4438f44e')
+        self.assertLessEqual(self.client.session.post.call_args.kwargs['timeout'], 1.0)
+
+    @patch('faucet.services.ethereum.Web3')
+    def test_service_uses_fast_client(self, mock_web3):
+        """Test that EthereumService routes hot-path calls through the client when enabled"""
+        mock_web3.return_value.is_connected.return_value = True
+        with self.settings(ETHEREUM_FAST_RPC=True):
+            service = EthereumService()
+
+        self.assertIsInstance(service.eth, JSONRPCClient)
+        service.rpc.session = self.client.session
+        self.respond({'jsonrpc': '2.0', 'id': 1, 'result': '0xde0b6b3a7640000'})
+        service.get_balance()
+        mock_web3.return_value.eth.get_balance.assert_not_called()
+
+    @patch('faucet.services.ethereum.Web3')
+    def test_fast_client_rebroadcast_nonce_rejection(self, mock_web3):
+        """Test that a nonce rejection on the fast path is told apart from a replacement through the client"""
+        mock_web3.return_value.is_connected.return_value = True
+        with self.settings(ETHEREUM_FAST_RPC=True):
+            service = EthereumService()
+        service.rpc.session = self.client.session
+
+        def respond_in_turn(*results):
+            responses = []
+            for result in results:
+                response = MagicMock()
+                response.content = json.dumps({'jsonrpc': '2.0', 'id': 1, **result}).encode()
+                responses.append(response)
+            self.client.session.post.side_effect = responses
+
+        rejected = {'error': {'code': -32000, 'message': 'nonce too low'}}
+        # Still known to the node: the bytes are kept
+        respond_in_turn(rejected, {'result': None}, {'result': {'hash': '0xabcd', 'nonce': '0x7', 'blockNumber': None}})
+        with self.assertRaises(NonceError) as context:
+            service.rebroadcast('0xf86c01', '0xabcd', nonce=7)
+        self.assertNotIsInstance(context.exception, TransactionReplacedError)
+
+        # Unknown, and the mined nonce count has moved past it: replaced
+        respond_in_turn(rejected, {'result': None}, {'result': None}, {'result': '0x8'})
+        with self.assertRaises(TransactionReplacedError):
+            service.rebroadcast('0xf86c01', '0xabcd', nonce=7)
+        body = json.loads(self.client.session.post.call_args_list[-2].kwargs['data'])
+        self.assertEqual(body['method'], 'eth_getTransactionByHash')
+
+
+class AddressTests(TestCase):
+    """Test cases for address validation and normalization"""
+
+    def test_normalize_address(self):
+        """Test that valid addresses in any accepted case normalize to lowercase"""
+        checksummed = '0x742d35Cc6634C0532925a3b844Bc454e4438f44e'
+        for address in (checksummed, checksummed.lower(), '0x' + checksummed[2:].upper()):
+            self.assertEqual(normalize_address(address), checksummed.lower())
+
+    def test_checksum_verified(self):
+        """Test that a mixed-case address must carry a valid EIP-55 checksum"""
+        self.assertTrue(is_valid_address(Web3.to_checksum_address('0x52908400098527886e0f7030069857d2e4169ee7')))
+        self.assertFalse(is_valid_address('0x742D35Cc6634C0532925a3b844Bc454e4438f44e'))
+
+    def test_malformed_addresses(self):
+        """Test that malformed input is rejected"""
+        for address in ('invalid-address', '0x123', '742d35Cc6634C0532925a3b844Bc454e4438f44e00',
+                        '0x742d35Cc6634C0532925a3b844Bc454e4438f44g', '0x742d35cc6634c0532925a3b844bc454e4438f44e\n', None):
+            with self.assertRaises(InvalidAddressError):
+                normalize_address(address)
+
+    def test_address_bytes(self):
+        """Test the 20-byte form used for transaction recipients"""
+        self.assertEqual(address_bytes('0x742d35Cc6634C0532925a3b844Bc454e4438f44e'), bytes.fromhex('742d35cc6634c0532925a3b844bc454e4438f44e'))
+
+
+class PartitionTests(TestCase):
+    """Test cases for the partition period helpers"""
+
+    def test_week_periods(self):
+        """Test that weekly partitions start on Monday at midnight UTC"""
+        start = period_start(datetime(2024, 3, 7, 15, 30, tzinfo=dt_timezone.utc), 'week')
+        self.assertEqual(start, datetime(2024, 3, 4, tzinfo=dt_timezone.utc))
+        self.assertEqual(next_period(start, 'week'), datetime(2024, 3, 11, tzinfo=dt_timezone.utc))
+        self.assertEqual(partition_name(start), 'faucet_transaction_p20240304')
+
+    def test_day_periods(self):
+        """Test that daily partitions follow UTC days whatever the input timezone"""
+        moment = datetime(2024, 3, 7, 1, 0, tzinfo=dt_timezone(timedelta(hours=3)))
+        start = period_start(moment, 'day')
+        self.assertEqual(start, datetime(2024, 3, 6, tzinfo=dt_timezone.utc))
+        self.assertEqual(next_period(start, 'day'), datetime(2024, 3, 7, tzinfo=dt_timezone.utc))
+
+    def test_parse_bound(self):
+        """Test parsing of range and default partition bounds"""
+        bounds = parse_bound("FOR VALUES FROM ('2024-03-04 00:00:00+00') TO ('2024-03-11 00:00:00+00')")
+        self.assertEqual(bounds, (datetime(2024, 3, 4, tzinfo=dt_timezone.utc), datetime(2024, 3, 11, tzinfo=dt_timezone.utc)))
+        self.assertIsNone(parse_bound('DEFAULT'))
+
 
 class RateLimiterTests(TestCase):
     """Test cases for the RateLimiter"""
@@ -180,6 +525,13 @@ class RateLimiterTests(TestCase):
         is_limited, _ = self.limiter.is_rate_limited('127.0.0.1', '0x123456789abcdef0123456789abcdef01234567')
         self.assertTrue(is_limited)  # Still limited because same IP
 
+    def test_wallet_case_variants_share_limit(self):
+        """Test that a mixed-case variant of a limited wallet is also limited"""
+        self.limiter.record_request('127.0.0.1', '0x742d35Cc6634C0532925a3b844Bc454e4438f44e')
+
+        is_limited, _ = self.limiter.is_rate_limited('10.0.0.1', '0x742d35cc6634c0532925a3b844bc454e4438f44e')
+        self.assertTrue(is_limited)
+
     @override_settings(RATE_LIMIT_TIMEOUT=2)
     def test_rate_limit_expiration(self):
         """Test that rate limiting expires after timeout"""
@@ -216,7 +568,7 @@ class TransactionQueueTests(TestCase):
 
         # Configure EthereumService mock
         self.mock_eth_instance = MagicMock()
-        self.mock_eth_instance.send_transaction.return_value = '0x1234'
+        self.mock_eth_instance.send_payout.return_value = '0x1234'
         mock_eth_service.return_value = self.mock_eth_instance
 
         # Create queue instance
@@ -266,6 +618,279 @@ class TransactionQueueTests(TestCase):
         self.assertEqual(priority, 0)
         self.assertEqual(data['id'], 2)
 
+    @patch.object(TransactionQueue, 'start_worker')
+    def test_admission_check_within_slo(self, mock_start_worker):
+        """Test that requests are admitted while the estimated wait is within the SLO"""
+        self.queue.service_time = 1.0
+        self.queue.wait_slo = 10
+        for i in range(5):
+            self.queue.enqueue_transaction(i, '0x742d35Cc6634C0532925a3b844Bc454e4438f44e', '127.0.0.1', priority=i)
+
+        self.assertEqual(self.queue.admission_check(), (True, 0))
+        self.assertAlmostEqual(self.queue.estimated_wait(), 6.0)
+
+    @patch.object(TransactionQueue, 'start_worker')
+    def test_admission_check_exceeds_slo(self, mock_start_worker):
+        """Test that requests are rejected with an accurate retry time when the backlog is too slow"""
+        self.queue.service_time = 2.0
+        self.queue.wait_slo = 10
+        for i in range(9):
+            self.queue.enqueue_transaction(i, '0x742d35Cc6634C0532925a3b844Bc454e4438f44e', '127.0.0.1', priority=i)
+
+        # 10 items at 2s each = 20s wait, 10s over the SLO
+        self.assertEqual(self.queue.admission_check(), (False, 10))
+
+    @patch.object(TransactionQueue, 'start_worker')
+    def test_enqueue_when_full(self, mock_start_worker):
+        """Test that the queue capacity is bounded"""
+        self.queue.queue.maxsize = 1
+        self.queue.enqueue_transaction(1, '0x742d35Cc6634C0532925a3b844Bc454e4438f44e', '127.0.0.1')
+
+        with self.assertRaises(TransactionQueueFull):
+            self.queue.enqueue_transaction(2, '0x742d35Cc6634C0532925a3b844Bc454e4438f44e', '127.0.0.1', priority=1)
+
+    def test_service_time_tracking(self):
+        """Test that the drain rate follows measured service times"""
+        self.queue.service_time = 1.0
+        for _ in range(50):
+            self.queue._record_service_time(4.0)
+
+        self.assertAlmostEqual(self.queue.drain_rate(), 0.25, places=2)
+
+    def test_enqueue_external_hands_off(self):
+        """Test that web processes in external mode push to the backend instead of the local queue"""
+        self.queue.external = True
+        self.queue.backend = MagicMock()
+
+        with patch.object(self.queue, 'start_worker') as mock_start_worker:
+            self.queue.enqueue_transaction(1, '0x742d35Cc6634C0532925a3b844Bc454e4438f44e', '127.0.0.1')
+
+        self.assertEqual(self.queue.queue.qsize(), 0)
+        self.queue.backend.push.assert_called_once()
+        priority, data = self.queue.backend.push.call_args[0]
+        self.assertEqual(data['id'], 1)
+        mock_start_worker.assert_not_called()
+
+    def test_external_admission_without_workers(self):
+        """Test that web processes reject work when no external worker is reporting health"""
+        self.queue.external = True
+        self.queue.backend = MagicMock()
+        self.queue.backend.size.return_value = 0
+        self.queue.backend.worker_health.return_value = []
+
+        accepted, retry_after = self.queue.admission_check()
+        self.assertFalse(accepted)
+        self.assertGreater(retry_after, 0)
+
+    @patch.object(TransactionQueue, 'start_worker')
+    def test_return_local_items(self, mock_start_worker):
+        """Test that a draining worker hands unstarted items back in queue order"""
+        self.queue.backend = MagicMock()
+        self.queue.enqueue_transaction(1, '0x742d35Cc6634C0532925a3b844Bc454e4438f44e', '127.0.0.1', priority=-1)
+        self.queue.enqueue_transaction(2, '0x742d35Cc6634C0532925a3b844Bc454e4438f44e', '127.0.0.1')
+
+        self.assertEqual(self.queue.return_local_items(), 2)
+        self.assertEqual(self.queue.queue.qsize(), 0)
+
+        # Pushed to the head of the backend list in reverse, so item 1 is popped first
+        items = self.queue.backend.push_front.call_args[0][0]
+        self.assertEqual([data['id'] for _, data in items], [2, 1])
+
+    def test_recover_pending(self):
+        """Test that pending transactions are re-enqueued on worker startup"""
+        Transaction.objects.create(wallet_address='0x742d35Cc6634C0532925a3b844Bc454e4438f44e', status='pending', ip_address='127.0.0.1')
+        Transaction.objects.create(wallet_address='0x742d35Cc6634C0532925a3b844Bc454e4438f44e', status='success', ip_address='127.0.0.1')
+
+        self.assertEqual(self.queue.recover_pending(), 1)
+        self.assertEqual(self.queue.queue.qsize(), 1)
+
+    def test_recover_pending_signed_first(self):
+        """Test that already-signed transactions are recovered ahead of new ones, in nonce order"""
+        unsigned = Transaction.objects.create(wallet_address='0x742d35Cc6634C0532925a3b844Bc454e4438f44e', status='pending', ip_address='127.0.0.1')
+        second = Transaction.objects.create(wallet_address='0x742d35Cc6634C0532925a3b844Bc454e4438f44e', status='pending', ip_address='127.0.0.1', raw_transaction='0x02', nonce=8)
+        first = Transaction.objects.create(wallet_address='0x742d35Cc6634C0532925a3b844Bc454e4438f44e', status='pending', ip_address='127.0.0.1', raw_transaction='0x01', nonce=7)
+
+        self.assertEqual(self.queue.recover_pending(), 3)
+        order = [self.queue.queue.get_nowait()[1]['id'] for _ in range(3)]
+        self.assertEqual(order, [first.id, second.id, unsigned.id])
+
+    def test_process_item_skips_claimed(self):
+        """Test that a transaction claimed by another worker is not sent twice"""
+        cache.add("faucet_tx_claim_1", "other-worker", 60)
+        mock_eth_service = MagicMock()
+
+        self.queue._process_item(mock_eth_service, {'id': 1, 'wallet_address': '0x742d35Cc6634C0532925a3b844Bc454e4438f44e'})
+
+        mock_eth_service.send_payout.assert_not_called()
+        cache.delete("faucet_tx_claim_1")
+
+    def test_retryable_failure_scheduled(self):
+        """Test that a connection error schedules a delayed retry and keeps the row pending"""
+        transaction = Transaction.objects.create(
+            wallet_address='0x742d35Cc6634C0532925a3b844Bc454e4438f44e', status='pending', ip_address='127.0.0.1'
+        )
+        self.queue.retry_scheduler = MagicMock()
+        mock_eth_service = MagicMock()
+        mock_eth_service.send_payout.side_effect = ConnectionError("Connection refused")
+
+        self.queue._process_item(mock_eth_service, {'id': transaction.id, 'wallet_address': transaction.wallet_address})
+
+        transaction.refresh_from_db()
+        self.assertEqual(transaction.status, 'pending')
+        self.assertEqual(transaction.retry_count, 1)
+        self.queue.retry_scheduler.schedule.assert_called_once()
+        mock_eth_service.reconnect.assert_called_once()
+
+    def test_process_item_writes_ahead(self):
+        """Test that the signed transaction is saved before it is broadcast"""
+        transaction = Transaction.objects.create(
+            wallet_address='0x742d35Cc6634C0532925a3b844Bc454e4438f44e', status='pending', ip_address='127.0.0.1'
+        )
+        payout = SignedPayout('0xf86c01', '0xabcd', 7, 20000000000)
+        saved_before_broadcast = []
+
+        def send_payout(to_address, write_ahead, deadline=None):
+            write_ahead(payout)
+            saved_before_broadcast.append(Transaction.objects.get(id=transaction.id).raw_transaction)
+            return payout.transaction_hash
+
+        mock_eth_service = MagicMock()
+        mock_eth_service.send_payout.side_effect = send_payout
+
+        self.queue._process_item(mock_eth_service, {'id': transaction.id, 'wallet_address': transaction.wallet_address})
+
+        self.assertEqual(saved_before_broadcast, ['0xf86c01'])
+        transaction.refresh_from_db()
+        self.assertEqual(transaction.status, 'success')
+        self.assertEqual(transaction.transaction_hash, '0xabcd')
+        self.assertEqual(transaction.nonce, 7)
+
+    def test_process_item_rebroadcasts_saved_transaction(self):
+        """Test that a transaction signed before a crash is rebroadcast, not signed again"""
+        transaction = Transaction.objects.create(
+            wallet_address='0x742d35Cc6634C0532925a3b844Bc454e4438f44e', status='pending', ip_address='127.0.0.1',
+            raw_transaction='0xf86c01', transaction_hash='0xabcd', nonce=7, gas_price=20000000000
+        )
+        mock_eth_service = MagicMock()
+        mock_eth_service.rebroadcast.return_value = '0xabcd'
+
+        self.queue._process_item(mock_eth_service, {'id': transaction.id, 'wallet_address': transaction.wallet_address})
+
+        mock_eth_service.send_payout.assert_not_called()
+        self.assertEqual(mock_eth_service.rebroadcast.call_args[0][:2], ('0xf86c01', '0xabcd'))
+        transaction.refresh_from_db()
+        self.assertEqual(transaction.status, 'success')
+
+    def test_nonce_failure_clears_write_ahead(self):
+        """Test that a transaction whose nonce was taken is signed afresh on retry"""
+        transaction = Transaction.objects.create(
+            wallet_address='0x742d35Cc6634C0532925a3b844Bc454e4438f44e', status='pending', ip_address='127.0.0.1',
+            raw_transaction='0xf86c01', transaction_hash='0xabcd', nonce=7, gas_price=20000000000
+        )
+        self.queue.retry_scheduler = MagicMock()
+        mock_eth_service = MagicMock()
+        mock_eth_service.rebroadcast.side_effect = TransactionReplacedError("Nonce 7 of transaction 0xabcd was used by another transaction")
+
+        self.queue._process_item(mock_eth_service, {'id': transaction.id, 'wallet_address': transaction.wallet_address})
+
+        transaction.refresh_from_db()
+        self.assertEqual(transaction.status, 'pending')
+        self.assertIsNone(transaction.raw_transaction)
+        self.assertIsNone(transaction.nonce)
+        self.queue.retry_scheduler.schedule.assert_called_once()
+        self.assertEqual(mock_eth_service.rebroadcast.call_args[1]['nonce'], 7)
+
+    def test_unconfirmed_nonce_failure_keeps_write_ahead(self):
+        """Test that a nonce rejection not proven to be a replacement keeps the signed bytes for the retry"""
+        transaction = Transaction.objects.create(
+            wallet_address='0x742d35Cc6634C0532925a3b844Bc454e4438f44e', status='pending', ip_address='127.0.0.1',
+            raw_transaction='0xf86c01', transaction_hash='0xabcd', nonce=7, gas_price=20000000000
+        )
+        self.queue.retry_scheduler = MagicMock()
+        mock_eth_service = MagicMock()
+        mock_eth_service.rebroadcast.side_effect = NonceError("Nonce of transaction 0xabcd rejected: nonce too low")
+
+        self.queue._process_item(mock_eth_service, {'id': transaction.id, 'wallet_address': transaction.wallet_address})
+
+        transaction.refresh_from_db()
+        self.assertEqual(transaction.status, 'pending')
+        self.assertEqual(transaction.raw_transaction, '0xf86c01')
+        self.assertEqual(transaction.nonce, 7)
+        self.queue.retry_scheduler.schedule.assert_called_once()
+
+    def test_fatal_failure_not_retried(self):
+        """Test that a non-retryable error marks the transaction failed"""
+        transaction = Transaction.objects.create(
+            wallet_address='0x742d35Cc6634C0532925a3b844Bc454e4438f44e', status='pending', ip_address='127.0.0.1'
+        )
+        self.queue.retry_scheduler = MagicMock()
+        mock_eth_service = MagicMock()
+        mock_eth_service.send_payout.side_effect = InsufficientFundsError("Insufficient funds")
+
+        self.queue._process_item(mock_eth_service, {'id': transaction.id, 'wallet_address': transaction.wallet_address})
+
+        transaction.refresh_from_db()
+        self.assertEqual(transaction.status, 'failed')
+        self.queue.retry_scheduler.schedule.assert_not_called()
+
+    @patch('faucet.services.transaction_queue.wallet_caps')
+    @patch('faucet.services.transaction_queue.spend_budget')
+    def test_unsigned_failure_returns_reservations(self, mock_spend_budget, mock_wallet_caps):
+        """Test that a payout failed before signing is refunded to the budget and released from the wallet caps"""
+        transaction = Transaction.objects.create(
+            wallet_address='0x742d35cc6634c0532925a3b844bc454e4438f44e', status='pending', ip_address='127.0.0.1'
+        )
+        self.queue.retry_scheduler = MagicMock()
+        mock_eth_service = MagicMock()
+        mock_eth_service.send_payout.side_effect = InsufficientFundsError("Insufficient funds")
+
+        self.queue._process_item(mock_eth_service, {'id': transaction.id, 'wallet_address': transaction.wallet_address})
+
+        transaction.refresh_from_db()
+        mock_spend_budget.refund.assert_called_once_with(transaction.amount)
+        mock_wallet_caps.release.assert_called_once_with(transaction.wallet_address, transaction.created_at)
+
+    @patch('faucet.services.transaction_queue.TransactionQueue.start_worker')
+    def test_enqueue_batch(self, mock_start_worker):
+        """Test that a batch is split into items of at most batch_size transactions"""
+        self.queue.batch_size = 2
+        self.queue.enqueue_batch('batch-1', [(1, '0xa'), (2, '0xb'), (3, '0xc')], '127.0.0.1', client_key='partner:1')
+
+        self.assertEqual(self.queue.queue.qsize(), 2)
+        _, first = self.queue.queue.get_nowait()
+        self.assertEqual(first['transactions'], [[1, '0xa'], [2, '0xb']])
+        self.assertEqual(first['client_key'], 'partner:1')
+
+    def test_process_batch(self):
+        """Test that a batch item is sent with one send_payouts call and failures retry individually"""
+        transactions = [
+            Transaction.objects.create(wallet_address=f'0x{index:040x}', status='pending', ip_address='127.0.0.1')
+            for index in range(1, 3)
+        ]
+        self.queue.retry_scheduler = MagicMock()
+        mock_eth_service = MagicMock()
+
+        def send_payouts(to_addresses, write_ahead, deadline=None):
+            write_ahead([SignedPayout(f'0xraw{nonce}', f'0xhash{nonce}', nonce, 1) for nonce in range(len(to_addresses))])
+            return ['0xhash0', ConnectionError("Connection refused")]
+        mock_eth_service.send_payouts.side_effect = send_payouts
+
+        self.queue._process_item(mock_eth_service, {
+            'batch_id': 'batch-1',
+            'transactions': [[transaction.id, transaction.wallet_address] for transaction in transactions],
+            'ip_address': '127.0.0.1',
+            'client_key': 'partner:1',
+            'enqueued_at': None,
+        })
+
+        sent, failed = [Transaction.objects.get(id=transaction.id) for transaction in transactions]
+        self.assertEqual(sent.status, 'success')
+        self.assertEqual(sent.transaction_hash, '0xhash0')
+        # Signed and recorded, so its retry will rebroadcast the saved bytes
+        self.assertEqual(failed.status, 'pending')
+        self.assertEqual(failed.raw_transaction, '0xraw1')
+        self.assertEqual(self.queue.retry_scheduler.schedule.call_args[0][1]['id'], failed.id)
+
     @patch('threading.Thread')
     def test_start_worker(self, mock_thread):
         """Test starting worker thread"""
@@ -287,4 +912,652 @@ class TransactionQueueTests(TestCase):
 
         # Thread should be joined
         self.queue.worker_thread.join.assert_called_once()
-        self.assertFalse(self.queue.is_running)
\ No newline at end of file
+        self.assertFalse(self.queue.is_running)
+
+class FairQueueTests(TestCase):
+    """Test cases for the weighted fair queue"""
+
+    def put(self, fair_queue, tx_id, key, priority=0):
+        fair_queue.put_nowait((priority, {'id': tx_id, 'client_key': key}))
+
+    def drain(self, fair_queue):
+        return [fair_queue.get_nowait()[1]['id'] for _ in range(fair_queue.qsize())]
+
+    def test_client_key_groups_subnets(self):
+        """Test that clients are grouped by IPv4 /24 and IPv6 /48"""
+        self.assertEqual(client_key('192.168.1.10'), client_key('192.168.1.200'))
+        self.assertNotEqual(client_key('192.168.1.10'), client_key('192.168.2.10'))
+        self.assertEqual(client_key('2001:db8:1:2::1'), client_key('2001:db8:1:ffff::1'))
+        self.assertEqual(client_key('192.168.1.10'), 'net:192.168.1.0/24')
+
+    def test_round_robin_across_clients(self):
+        """Test that a noisy client's backlog doesn't delay a newcomer"""
+        fair_queue = FairQueue()
+        for i in range(5):
+            self.put(fair_queue, f'noisy-{i}', 'net:10.0.0.0/24')
+        self.put(fair_queue, 'quiet', 'net:10.0.1.0/24')
+
+        order = self.drain(fair_queue)
+        self.assertLessEqual(order.index('quiet'), 1)
+
+    def test_weights(self):
+        """Test that weighted clients receive proportionally more service"""
+        fair_queue = FairQueue(weights={'partner': 2})
+        for i in range(6):
+            self.put(fair_queue, f'p{i}', 'partner')
+            self.put(fair_queue, f'n{i}', 'normal')
+
+        first_six = self.drain(fair_queue)[:6]
+        self.assertEqual(sum(1 for tx_id in first_six if tx_id.startswith('p')), 4)
+
+    def test_priority_dominates(self):
+        """Test that lower priority values are still served first"""
+        fair_queue = FairQueue()
+        self.put(fair_queue, 'normal', 'a', priority=0)
+        self.put(fair_queue, 'retry', 'a', priority=-1)
+
+        self.assertEqual(self.drain(fair_queue), ['retry', 'normal'])
+
+    def test_idle_flows_released(self):
+        """Test that per-client state is dropped once a client has nothing queued"""
+        fair_queue = FairQueue()
+        self.put(fair_queue, 1, 'a')
+        self.put(fair_queue, 2, 'b')
+        self.drain(fair_queue)
+
+        self.assertEqual(fair_queue.flows, {})
+
+    def test_tracks_queued_bytes(self):
+        """Test that the queue's byte gauge follows items in and out"""
+        fair_queue = FairQueue()
+        self.put(fair_queue, 1, 'a')
+        self.assertEqual(fair_queue.bytes, approximate_size({'id': 1, 'client_key': 'a'}))
+
+        self.put(fair_queue, 2, 'b')
+        self.drain(fair_queue)
+        self.assertEqual(fair_queue.bytes, 0)
+
+
+class RetrySchedulingTests(TestCase):
+    """Test cases for error classification and the delayed-retry scheduler"""
+
+    def test_classify_error(self):
+        """Test that errors are classified by type, not message text"""
+        from requests.exceptions import ReadTimeout
+        self.assertEqual(classify_error(ConnectionError("refused")), 'connection')
+        self.assertEqual(classify_error(ReadTimeout("Read timed out")), 'timeout')
+        self.assertEqual(classify_error(DeadlineExceeded("out of time")), 'timeout')
+        self.assertEqual(classify_error(NonceError("nonce too low")), 'nonce')
+        self.assertEqual(classify_error(ValueError({'code': -32000, 'message': 'nonce too low'})), 'nonce')
+        self.assertEqual(classify_error(InsufficientFundsError("empty")), 'insufficient_funds')
+        self.assertEqual(classify_error(ValueError("a connection timeout is mentioned here")), 'fatal')
+
+    def test_retry_delay_jitter(self):
+        """Test that backoff grows exponentially, is capped and jittered"""
+        policy = {'max_retries': 5, 'base_delay': 2.0, 'max_delay': 10.0}
+        for retry_count, expected in ((0, 2.0), (1, 4.0), (5, 10.0)):
+            delay = retry_delay(policy, retry_count)
+            self.assertGreaterEqual(delay, expected / 2)
+            self.assertLessEqual(delay, expected)
+
+    def test_scheduler_releases_due_items(self):
+        """Test that scheduled items are only released once due"""
+        released = []
+        scheduler = RetryScheduler(lambda priority, tx_data: released.append(tx_data['id']))
+        with patch.object(scheduler, 'start'):
+            scheduler.schedule(-1, {'id': 1}, delay=0)
+            scheduler.schedule(-1, {'id': 2}, delay=60)
+
+        self.assertEqual(scheduler.pop_due(), [(-1, {'id': 1})])
+        self.assertEqual(len(scheduler), 1)
+
+    def test_scheduler_thread(self):
+        """Test that the scheduler thread hands due items to the queue off the caller's thread"""
+        released = threading.Event()
+        scheduler = RetryScheduler(lambda priority, tx_data: released.set())
+        scheduler.schedule(-1, {'id': 1}, delay=0.05)
+
+        self.assertTrue(released.wait(2))
+        scheduler.stop()
+
+
+class TransactionEventBusTests(TestCase):
+    """Test cases for the TransactionEventBus"""
+
+    def setUp(self):
+        cache.clear()
+        self.bus = TransactionEventBus()
+        self.transaction = Transaction.objects.create(
+            wallet_address='0x742d35Cc6634C0532925a3b844Bc454e4438f44e',
+            status='pending',
+            ip_address='127.0.0.1',
+            amount=0.0001
+        )
+
+    def test_get_snapshot_cached(self):
+        """Test that snapshots are cached after the first read"""
+        snapshot = self.bus.get_snapshot(self.transaction.id)
+        self.assertEqual(snapshot['status'], 'pending')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.bus.get_snapshot(self.transaction.id), snapshot)
+
+    def test_wait_for_change_returns_immediately_on_stale_etag(self):
+        """Test that waiting with an outdated ETag returns the current snapshot"""
+        snapshot = self.bus.wait_for_change(self.transaction.id, '"stale"', timeout=5)
+        self.assertEqual(snapshot['status'], 'pending')
+
+    def test_wait_for_change_wakes_on_publish(self):
+        """Test that a waiter is woken when the transaction is published"""
+        etag = self.bus.get_snapshot(self.transaction.id)['etag']
+
+        def complete():
+            time.sleep(0.1)
+            self.transaction.status = 'success'
+            self.bus.publish(self.transaction)
+
+        threading.Thread(target=complete).start()
+        started = time.monotonic()
+        snapshot = self.bus.wait_for_change(self.transaction.id, etag, timeout=5)
+
+        self.assertEqual(snapshot['status'], 'success')
+        self.assertLess(time.monotonic() - started, 5)
+
+    def test_wait_for_change_timeout(self):
+        """Test that waiting returns the unchanged snapshot on timeout"""
+        etag = self.bus.get_snapshot(self.transaction.id)['etag']
+        snapshot = self.bus.wait_for_change(self.transaction.id, etag, timeout=0.1)
+        self.assertEqual(snapshot['etag'], etag)
+
+
+class ReplicaRouterTests(TestCase):
+    """Test cases for routing reads to the read replica"""
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_reads_stay_on_primary_by_default(self):
+        """Test that reads outside reads_from_replica() are not routed to the replica"""
+        with patch.object(replica_monitor, 'configured', return_value=True), \
+                patch.object(replica_monitor, 'is_healthy', return_value=True):
+            self.assertIsNone(self.router.db_for_read(Transaction))
+        self.assertEqual(self.router.db_for_write(Transaction), 'default')
+
+    @patch('faucet.services.replica.connections')
+    def test_opted_in_reads_use_healthy_replica(self, mock_connections):
+        """Test that opted-in reads use the replica only while it is healthy"""
+        mock_connections.__getitem__.return_value.in_atomic_block = False
+        with patch.object(replica_monitor, 'configured', return_value=True), reads_from_replica():
+            with patch.object(replica_monitor, 'is_healthy', return_value=True):
+                self.assertEqual(self.router.db_for_read(Transaction), 'replica')
+            with patch.object(replica_monitor, 'is_healthy', return_value=False):
+                self.assertIsNone(self.router.db_for_read(Transaction))
+
+            # Inside a transaction on the primary, reads stay there to see its writes
+            mock_connections.__getitem__.return_value.in_atomic_block = True
+            with patch.object(replica_monitor, 'is_healthy', return_value=True):
+                self.assertIsNone(self.router.db_for_read(Transaction))
+
+    def test_lag_monitor(self):
+        """Test that a lagging or unreachable replica is reported unhealthy"""
+        monitor = ReplicaLagMonitor()
+        monitor.max_lag = 5.0
+        with patch.object(monitor, 'measure', return_value=1.5):
+            self.assertTrue(monitor.is_healthy())
+
+        monitor.checked_at = 0.0
+        with patch.object(monitor, 'measure', return_value=30.0):
+            self.assertFalse(monitor.is_healthy())
+
+        monitor.checked_at = 0.0
+        with patch.object(monitor, 'measure', side_effect=Exception("connection refused")):
+            self.assertFalse(monitor.is_healthy())
+
+        monitor.checked_at = 0.0
+        with patch.object(monitor, 'measure', return_value=None):
+            self.assertFalse(monitor.is_healthy())
+
+    @patch('faucet.services.replica.connections')
+    def test_lag_measured_against_primary(self, mock_connections):
+        """Test that the replica's replay position is compared with the primary's, not with what it received"""
+        cursor = mock_connections.__getitem__.return_value.cursor.return_value.__enter__.return_value
+        cursor.fetchone.side_effect = [('0/3000060',), (None,)]
+
+        self.assertIsNone(ReplicaLagMonitor().measure())
+        self.assertEqual(cursor.execute.call_args[0][1], ['0/3000060'])
+
+
+class PrefixRateLimitTests(TestCase):
+    """Test cases for prefix-aware IP limits and the allow/deny prefix table"""
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(RATE_LIMIT_IPV4_PREFIXES={32: 1, 24: 2}, RATE_LIMIT_IPV6_PREFIXES={64: 1, 48: 2})
+    def test_network_budgets(self):
+        """Test that neighbours share their network's budget, with a separate one per prefix length"""
+        limiter = RateLimiter()
+        limiter.record_request('203.0.113.1', '0x0000000000000000000000000000000000000001')
+        self.assertTrue(limiter.is_rate_limited('203.0.113.1', '0x0000000000000000000000000000000000000002')[0])
+        self.assertFalse(limiter.is_rate_limited('203.0.113.2', '0x0000000000000000000000000000000000000002')[0])
+
+        limiter.record_request('203.0.113.2', '0x0000000000000000000000000000000000000002')
+        self.assertTrue(limiter.is_rate_limited('203.0.113.3', '0x0000000000000000000000000000000000000003')[0])
+        self.assertFalse(limiter.is_rate_limited('198.51.100.1', '0x0000000000000000000000000000000000000003')[0])
+
+        # Any address in the same /64 is the same client
+        limiter.record_request('2001:db8:0:1::1', '0x0000000000000000000000000000000000000004')
+        self.assertTrue(limiter.is_rate_limited('2001:db8:0:1:ffff::9', '0x0000000000000000000000000000000000000005')[0])
+        self.assertFalse(limiter.is_rate_limited('2001:db8:0:2::1', '0x0000000000000000000000000000000000000005')[0])
+
+    def test_prefix_table_longest_match(self):
+        """Test that the most specific network wins"""
+        table = PrefixTable()
+        table.add('10.0.0.0/8', 'deny')
+        table.add('10.1.2.0/24', 'allow')
+        table.add('2001:db8::/32', 'deny')
+
+        self.assertEqual(table.lookup('10.9.9.9'), 'deny')
+        self.assertEqual(table.lookup('10.1.2.3'), 'allow')
+        self.assertEqual(table.lookup('::ffff:10.9.9.9'), 'deny')
+        self.assertEqual(table.lookup('2001:db8:1::1'), 'deny')
+        self.assertIsNone(table.lookup('192.0.2.1'))
+        self.assertIsNone(table.lookup('not-an-ip'))
+
+    def test_allowlisted_network_skips_ip_limits(self):
+        """Test that allowlisted networks have no IP limit, only the wallet limit"""
+        limiter = RateLimiter()
+        with patch('faucet.services.rate_limiter.ip_access_list', IPAccessList(allow=['192.0.2.0/24'], deny=[])):
+            limiter.record_request('192.0.2.10', '0x0000000000000000000000000000000000000001')
+            self.assertFalse(limiter.is_rate_limited('192.0.2.10', '0x0000000000000000000000000000000000000002')[0])
+            self.assertTrue(limiter.is_rate_limited('192.0.2.10', '0x0000000000000000000000000000000000000001')[0])
+
+
+class WalletCapTests(TestCase):
+    """Test cases for long-horizon per-wallet caps"""
+
+    wallet = '0x742d35cc6634c0532925a3b844bc454e4438f44e'
+
+    def test_filter_sizing(self):
+        """Test Bloom filter sizing for the configured false-positive rate"""
+        counters, hashes = filter_size(100000, 0.001)
+        self.assertEqual(hashes, 10)
+        self.assertAlmostEqual(counters / 100000, 14.38, places=1)
+
+        bloom = CountingBloomFilter('key', counters, hashes)
+        positions = bloom.positions(self.wallet)
+        self.assertEqual(positions, bloom.positions(self.wallet))
+        self.assertEqual(len(set(positions)), hashes)
+        self.assertTrue(all(0 <= position < counters for position in positions))
+
+    @override_settings(WALLET_CAP_PER_WINDOW=1, WALLET_CAP_WINDOW_DAYS=7, WALLET_CAP_LIFETIME=2)
+    def test_database_check_without_redis(self):
+        """Test that without Redis the caps are checked exactly against the table"""
+        caps = WalletCaps()
+        self.assertEqual(caps.check(self.wallet), (True, None))
+
+        # Failed requests and partner bulk payouts don't count
+        Transaction.objects.create(wallet_address=self.wallet, ip_address='127.0.0.1', status='failed')
+        Transaction.objects.create(
+            wallet_address=self.wallet, ip_address='127.0.0.1', status='success', batch_id=uuid.uuid4()
+        )
+        self.assertEqual(caps.check(self.wallet), (True, None))
+
+        old = Transaction.objects.create(wallet_address=self.wallet, ip_address='127.0.0.1', status='success')
+        Transaction.objects.filter(id=old.id).update(created_at=old.created_at - timedelta(days=30))
+        self.assertEqual(caps.check(self.wallet), (True, None))
+
+        Transaction.objects.create(wallet_address=self.wallet, ip_address='127.0.0.1', status='pending')
+        self.assertEqual(caps.check(self.wallet), (False, 'window'))
+
+        Transaction.objects.filter(status='pending').update(created_at=old.created_at - timedelta(days=30))
+        self.assertEqual(caps.check(self.wallet), (True, None))
+
+    @override_settings(WALLET_CAP_LIFETIME=2)
+    def test_lifetime_count_outlives_table(self):
+        """Test that the lifetime cap is counted apart from the transaction table, and released payouts don't count"""
+        caps = WalletCaps()
+        caps.record(self.wallet)
+        caps.record(self.wallet)
+        self.assertEqual(caps.check(self.wallet), (False, 'lifetime'))
+
+        # Archived partitions take the rows, not the count
+        Transaction.objects.all().delete()
+        self.assertEqual(caps.check(self.wallet), (False, 'lifetime'))
+
+        caps.release(self.wallet, datetime.now(dt_timezone.utc))
+        self.assertEqual(caps.lifetime_count(self.wallet), 1)
+        self.assertEqual(caps.check(self.wallet), (True, None))
+
+    @override_settings(WALLET_CAP_PER_WINDOW=1, WALLET_CAP_WINDOW_DAYS=7, WALLET_CAP_LIFETIME=5)
+    def test_filters_skip_database_below_cap(self):
+        """Test that the database is only queried when the filters say the wallet may be at its cap"""
+        caps = WalletCaps()
+        _, hashes = caps.day_size
+        _, lifetime_hashes = caps.lifetime_size
+        redis = MagicMock()
+
+        # Filters say: never funded
+        redis.pipeline.return_value.execute.return_value = [[0] * hashes] * 8 + [[0] * lifetime_hashes]
+        with patch('faucet.services.wallet_caps.get_redis_connection', return_value=redis), \
+                patch.object(caps, 'database_count') as database_count:
+            self.assertEqual(caps.check(self.wallet), (True, None))
+            database_count.assert_not_called()
+
+        # Filters say: maybe funded this week; the database disagrees (a false positive)
+        redis.pipeline.return_value.execute.return_value = [[1] * hashes] + [[0] * hashes] * 7 + [[1] * lifetime_hashes]
+        with patch('faucet.services.wallet_caps.get_redis_connection', return_value=redis), \
+                patch.object(caps, 'database_count', return_value=0) as database_count:
+            self.assertEqual(caps.check(self.wallet), (True, None))
+            database_count.assert_called_once()
+
+
+class SpendBudgetTests(TestCase):
+    """Test cases for the shared spend budget"""
+
+    @override_settings(FAUCET_SPEND_BUDGET_ETH=0.0003, FAUCET_SPEND_BUDGET_PERIOD=3600)
+    def test_reserve_and_refund(self):
+        """Test that reservations drain the budget, refunds restore it and refill is continuous"""
+        budget = SpendBudget()
+        self.assertEqual(budget.reserve('0.0001'), (True, 0))
+        self.assertEqual(budget.reserve('0.0002'), (True, 0))
+
+        reserved, retry_after = budget.reserve('0.0001')
+        self.assertFalse(reserved)
+        # 0.0003 ETH per hour refills 0.0001 ETH in about 20 minutes
+        self.assertTrue(1100 <= retry_after <= 1200)
+
+        budget.refund('0.0001')
+        self.assertEqual(budget.reserve('0.0001'), (True, 0))
+
+    @override_settings(FAUCET_SPEND_BUDGET_ETH=0)
+    def test_disabled(self):
+        """Test that no budget means every reservation succeeds"""
+        self.assertEqual(SpendBudget().reserve('100'), (True, 0))
+
+    @override_settings(FAUCET_SPEND_BUDGET_ETH=1, FAUCET_SPEND_BUDGET_PERIOD=3600)
+    def test_redis_reservation(self):
+        """Test that with Redis the reservation is one script call with the amount in gwei"""
+        budget = SpendBudget()
+        redis = MagicMock()
+        redis.register_script.return_value.return_value = [0, '50000', '180.2']
+
+        with patch('faucet.services.spend_budget.get_redis_connection', return_value=redis):
+            self.assertEqual(budget.reserve('0.0001'), (False, 181))
+
+        redis.register_script.return_value.assert_called_once_with(
+            keys=[SpendBudget.KEY], args=[10 ** 9, 10 ** 9 / 3600, 100000]
+        )
+
+
+def head_message(subscription, number, block_hash):
+    """newHeads notification as sent by the node"""
+    return json.dumps({
+        'jsonrpc': '2.0',
+        'method': 'eth_subscription',
+        'params': {
+            'subscription': subscription,
+            'result': {'number': hex(number), 'hash': block_hash, 'timestamp': '0x64', 'baseFeePerGas': '0x7'},
+        },
+    })
+
+
+class ChainHeadTests(TestCase):
+    """Test cases for the newHeads subscription and the per-block cache"""
+
+    def test_subscribe_and_listen(self):
+        """Test that heads of our subscription are published and a silent connection ends the listen"""
+        subscriber = ChainHeadSubscriber(url='ws://node')
+        heads = []
+        subscriber.subscribe(heads.append)
+
+        connection = MagicMock()
+        connection.recv.side_effect = [
+            json.dumps({'jsonrpc': '2.0', 'id': 1, 'result': '0xabc'}),
+            head_message('0xabc', 10, '0x01'),
+            head_message('0xother', 11, '0x02'),
+            head_message('0xabc', 10, '0x01'),
+            head_message('0xabc', 11, '0x03'),
+            TimeoutError(),
+        ]
+
+        subscription = subscriber._subscribe(connection)
+        self.assertEqual(json.loads(connection.send.call_args[0][0])['params'], ['newHeads'])
+        with self.assertRaises(TimeoutError):
+            subscriber._listen(connection, subscription)
+
+        # The other subscription and the repeated block are skipped
+        self.assertEqual([head['number'] for head in heads], [10, 11])
+        self.assertEqual(heads[0], parse_head({'number': '0xa', 'hash': '0x01', 'timestamp': '0x64', 'baseFeePerGas': '0x7'}))
+        self.assertTrue(subscriber.is_live())
+
+    def test_block_cache(self):
+        """Test that values are read once per block, and on every use while the subscription isn't live"""
+        subscriber = ChainHeadSubscriber(url='ws://node')
+        block_cache = BlockCache(subscriber)
+        fetch = MagicMock(side_effect=[1, 2, 3, 4])
+
+        self.assertEqual(block_cache.get('balance', fetch), 1)
+        self.assertEqual(block_cache.get('balance', fetch), 2)
+
+        subscriber.publish({'number': 10, 'hash': '0x01', 'timestamp': 100, 'base_fee': 7})
+        self.assertEqual(block_cache.get('balance', fetch), 3)
+        self.assertEqual(block_cache.get('balance', fetch), 3)
+
+        subscriber.publish({'number': 11, 'hash': '0x02', 'timestamp': 112, 'base_fee': 7})
+        self.assertEqual(block_cache.get('balance', fetch), 4)
+
+        # Heads stopped arriving
+        subscriber.received_at -= subscriber.max_head_age + 1
+        fetch.side_effect = [5]
+        self.assertEqual(block_cache.get('balance', fetch), 5)
+
+    def test_start_without_url(self):
+        """Test that nothing is started when no WebSocket provider is configured"""
+        self.assertFalse(ChainHeadSubscriber(url='').start())
+
+
+class MemoryExporter:
+    """Keeps exported spans for inspection"""
+
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+
+class TracingTests(TestCase):
+    """Test cases for tracing and trace context propagation"""
+
+    def test_traceparent(self):
+        """Test that traceparent values round-trip and invalid ones are ignored"""
+        value = '00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01'
+        context = parse_traceparent(value)
+        self.assertEqual(context.trace_id, '4bf92f3577b34da6a3ce929d0e0e4736')
+        self.assertTrue(context.sampled)
+        self.assertEqual(format_traceparent(context), value)
+
+        self.assertIsNone(parse_traceparent('00-' + '0' * 32 + '-00f067aa0ba902b7-01'))
+        self.assertIsNone(parse_traceparent('garbage'))
+        self.assertIsNone(parse_traceparent(None))
+
+    def test_spans_and_sampling(self):
+        """Test that spans nest, new traces are sampled by rate and remote decisions are kept"""
+        exporter = MemoryExporter()
+        tracer = Tracer(exporter=exporter, sample_rate=1.0)
+
+        with tracer.span('parent') as parent:
+            with span_attributes({'faucet.attempt': 2}):
+                with tracer.span('child') as child:
+                    pass
+        self.assertEqual([span.name for span in exporter.spans], ['child', 'parent'])
+        self.assertEqual(child.context.trace_id, parent.context.trace_id)
+        self.assertEqual(child.parent_id, parent.context.span_id)
+        self.assertEqual(child.attributes['faucet.attempt'], 2)
+
+        with self.assertRaises(ValueError):
+            with tracer.span('failing'):
+                raise ValueError("boom")
+        self.assertEqual(exporter.spans[-1].to_otlp()['status']['code'], 2)
+
+        exporter.spans.clear()
+        tracer.sample_rate = 0.0
+        with tracer.span('unsampled'):
+            self.assertIsNotNone(tracer.traceparent())
+        with tracer.span('continued', parent='00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01') as span:
+            pass
+        self.assertEqual([span.name for span in exporter.spans], ['continued'])
+        self.assertEqual(span.parent_id, '00f067aa0ba902b7')
+
+    def test_disabled(self):
+        """Test that without an exporter spans are no-ops and nothing is propagated"""
+        tracer = Tracer()
+        with tracer.span('noop') as span:
+            span.set_attribute('key', 'value')
+            self.assertIsNone(tracer.traceparent())
+
+    @patch('faucet.services.transaction_queue.EthereumService')
+    def test_queue_carries_trace_context(self, mock_eth_service):
+        """Test that queued items carry the enqueuing span's context"""
+        tracer = Tracer(exporter=MemoryExporter(), sample_rate=1.0)
+        transaction_queue = TransactionQueue()
+        with patch('faucet.services.transaction_queue.tracer', tracer):
+            with tracer.span('request') as request_span:
+                transaction_queue._put_local(1, '0x742d35cc6634c0532925a3b844bc454e4438f44e', '127.0.0.1', 0, None)
+
+        _, tx_data = transaction_queue.queue.get()
+        context = parse_traceparent(tx_data['traceparent'])
+        self.assertEqual(context.trace_id, request_span.context.trace_id)
+        self.assertEqual(context.span_id, request_span.context.span_id)
+
+    def test_file_exporter(self):
+        """Test that the file exporter writes OTLP/JSON requests, one per line"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'traces.jsonl')
+            exporter = FileExporter(path, service_name='eth-faucet')
+            tracer = Tracer(exporter=exporter, sample_rate=1.0)
+            with tracer.span('rpc eth_getBalance', {'rpc.method': 'eth_getBalance'}):
+                pass
+            exporter.flush()
+
+            with open(path) as f:
+                payload = json.loads(f.readline())
+        span = payload['resourceSpans'][0]['scopeSpans'][0]['spans'][0]
+        self.assertEqual(span['name'], 'rpc eth_getBalance')
+        self.assertEqual(span['attributes'], [{'key': 'rpc.method', 'value': {'stringValue': 'eth_getBalance'}}])
+
+
+class LoggingTests(TestCase):
+    """Test cases for the background, sampled logging pipeline"""
+
+    def make_record(self, msg, *args, level=logging.INFO, **extra):
+        record = logging.LogRecord('faucet.test', level, __file__, 1, msg, args, None)
+        record.__dict__.update(extra)
+        return record
+
+    def test_sampling(self):
+        """Test that repeated messages are sampled per template and errors always pass"""
+        sampling = SamplingFilter(rate=0.001, burst=2)
+        passed = [sampling.filter(self.make_record("Transaction %s enqueued", n)) for n in range(5)]
+        self.assertEqual(passed, [True, True, False, False, False])
+
+        # Other templates and errors have their own allowance
+        self.assertTrue(sampling.filter(self.make_record("Transaction %s completed", 1)))
+        self.assertTrue(sampling.filter(self.make_record("Transaction %s enqueued", 6, level=logging.ERROR)))
+
+        # The next record let through reports how many were dropped
+        sampling.buckets[('faucet.test', "Transaction %s enqueued")][0] = 1
+        record = self.make_record("Transaction %s enqueued", 7)
+        self.assertTrue(sampling.filter(record))
+        self.assertEqual(record.suppressed, 3)
+
+    def test_json_format(self):
+        """Test that JSON lines carry the formatted message and context fields"""
+        record = self.make_record("Transaction %s enqueued with priority %s", 5, 0, transaction_id=5)
+        TraceContextFilter().filter(record)
+        entry = json.loads(JSONFormatter().format(record))
+        self.assertEqual(entry['message'], "Transaction 5 enqueued with priority 0")
+        self.assertEqual(entry['transaction_id'], 5)
+        self.assertEqual(entry['level'], 'INFO')
+        self.assertNotIn('trace_id', entry)
+
+    def test_background_handler(self):
+        """Test that records are written by the listener thread, with the message formatted there"""
+        stream = StringIO()
+        handler = BackgroundStreamHandler(stream)
+        handler.setFormatter(logging.Formatter('{levelname} {message}', style='{'))
+
+        record = self.make_record("Transaction %s completed", 9)
+        handler.handle(record)
+        # Still unformatted on the logging side
+        self.assertEqual(record.args, (9,))
+        handler.flush_and_stop()
+        self.assertEqual(stream.getvalue(), "INFO Transaction 9 completed\n")
+
+
+class StackSamplerTests(TestCase):
+    """Test cases for the stack sampling profiler"""
+
+    def test_sample_folded_stacks(self):
+        """Test that matching threads are sampled into folded stacks rooted at the thread name"""
+        stop = threading.Event()
+
+        def wait_for_stop():
+            stop.wait()
+
+        thread = threading.Thread(target=wait_for_stop, name='faucet-worker-test')
+        thread.start()
+        try:
+            sampler = StackSampler()
+            sampler.interval = 0.005
+            stacks = sampler.sample(0.05, thread_prefix='faucet-worker')
+        finally:
+            stop.set()
+            thread.join()
+
+        self.assertTrue(stacks)
+        for stack in stacks:
+            frames = stack.split(';')
+            self.assertEqual(frames[0], 'faucet-worker-test')
+            self.assertTrue(any(frame.startswith('wait_for_stop ') for frame in frames))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'stacks.folded')
+            sampler.write(stacks, path)
+            with open(path) as f:
+                stack, count = f.readline().rsplit(' ', 1)
+        self.assertEqual(int(count), stacks[stack])
+
+
+class MemoryTrackerTests(TestCase):
+    """Test cases for tracemalloc snapshots and diffs"""
+
+    def setUp(self):
+        self.tracker = MemoryTracker()
+
+    def tearDown(self):
+        self.tracker.stop()
+
+    def test_diff_shows_growth(self):
+        """Test that allocations made after the baseline show up in the diff at their line"""
+        self.assertIsNone(self.tracker.diff())
+        self.tracker.snapshot()
+        retained = [bytes(1024) for _ in range(1000)]
+
+        sites = self.tracker.diff(limit=5)
+        self.assertIn('test_services.py', sites[0]['location'])
+        self.assertGreaterEqual(sites[0]['size_diff'], 1000 * 1024)
+        self.assertEqual(len(retained), 1000)
+
+    def test_report(self):
+        """Test that a report file is written with the process's gauges and sites"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'memory.txt')
+            self.tracker.write_report(path, 'top', limit=3)
+            with open(path) as f:
+                report = f.read()
+
+        self.assertTrue(self.tracker.tracing)
+        self.assertIn('Largest allocation sites', report)
+        self.assertIsNotNone(self.tracker.stats()['rss_bytes'])
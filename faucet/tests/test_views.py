@@ -1,12 +1,24 @@
 import json
+import tempfile
 from unittest.mock import patch, MagicMock
+from datetime import timedelta
 from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.utils import timezone
+from django.core.cache import cache
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
-from faucet.models import Transaction
+from faucet.models import Transaction, Partner
 from faucet.services.ethereum import EthereumService
 from faucet.services.rate_limiter import RateLimiter
+from faucet.services.ip_prefixes import IPAccessList
+from faucet.services.deadline import DeadlineExceeded
+from faucet.services.idempotency import idempotency_store
+from faucet.services.transaction_events import transaction_events
+from faucet.services.transaction_queue import TransactionQueueFull
+from faucet.services.tracing import Tracer
+from faucet.services.profiling import request_profiler
 
 
 class FundViewTests(TestCase):
@@ -60,13 +72,36 @@ class FundViewTests(TestCase):
         self.assertEqual(Transaction.objects.count(), 1)
         transaction = Transaction.objects.first()
         self.assertEqual(transaction.status, 'success')
-        self.assertEqual(transaction.wallet_address, self.valid_payload['wallet_address'])
+        # Stored in canonical lowercase form
+        self.assertEqual(transaction.wallet_address, self.valid_payload['wallet_address'].lower())
+
+    @override_settings(USE_TRANSACTION_QUEUE=False)
+    def test_fund_traced(self):
+        """Test that a fund request continues the caller's trace, with the limiter as a child span"""
+        exporter = MagicMock()
+        tracer = Tracer(exporter=exporter, sample_rate=0.0)
+        with patch('faucet.middleware.tracer', tracer), patch('faucet.views.tracer', tracer):
+            response = self.client.post(
+                self.url,
+                data=json.dumps(self.valid_payload),
+                content_type='application/json',
+                HTTP_TRACEPARENT='00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01'
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        spans = {call.args[0].name: call.args[0] for call in exporter.export.call_args_list}
+        server_span = spans['POST /faucet/fund/']
+        self.assertEqual(server_span.context.trace_id, '4bf92f3577b34da6a3ce929d0e0e4736')
+        self.assertEqual(server_span.parent_id, '00f067aa0ba902b7')
+        self.assertEqual(server_span.attributes['http.response.status_code'], 200)
+        self.assertEqual(spans['faucet.rate_limit'].parent_id, server_span.context.span_id)
 
     @override_settings(USE_TRANSACTION_QUEUE=True)
     def test_fund_with_queue(self):
         """Test funding with transaction queue enabled"""
         # Mock the transaction queue
         with patch('faucet.views.transaction_queue') as mock_queue:
+            mock_queue.admission_check.return_value = (True, 0)
             response = self.client.post(
                 self.url,
                 data=json.dumps(self.valid_payload),
@@ -86,6 +121,83 @@ class FundViewTests(TestCase):
             # Verify queue was called
             mock_queue.enqueue_transaction.assert_called_once()
 
+    @override_settings(USE_TRANSACTION_QUEUE=True, FUND_SYNC_DEADLINE_MS=1500)
+    def test_fund_hybrid_completes_within_deadline(self):
+        """Test hybrid mode returning the hash when the worker finishes in time"""
+        tx_hash = '0x0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef'
+
+        with patch('faucet.views.transaction_queue') as mock_queue, \
+                patch('faucet.views.transaction_events') as mock_events:
+            mock_queue.admission_check.return_value = (True, 0)
+            mock_events.wait_until_settled.return_value = {
+                'status': 'success',
+                'transaction_hash': tx_hash,
+            }
+            response = self.client.post(
+                self.url,
+                data=json.dumps(self.valid_payload),
+                content_type='application/json'
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['transaction_hash'], tx_hash)
+        self.assertEqual(response.data['status'], 'success')
+        self.assertEqual(mock_events.wait_until_settled.call_args[0][1], 1.5)
+
+    @override_settings(USE_TRANSACTION_QUEUE=True, FUND_SYNC_DEADLINE_MS=1500)
+    def test_fund_hybrid_fails_within_deadline(self):
+        """Test hybrid mode returning the worker's failure instead of a pending 202"""
+        with patch('faucet.views.transaction_queue') as mock_queue, \
+                patch('faucet.views.transaction_events') as mock_events:
+            mock_queue.admission_check.return_value = (True, 0)
+            mock_events.wait_until_settled.return_value = {
+                'status': 'failed',
+                'transaction_hash': None,
+                'error_message': 'Insufficient funds in faucet wallet: 0 ETH',
+            }
+            response = self.client.post(
+                self.url,
+                data=json.dumps(self.valid_payload),
+                content_type='application/json'
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertEqual(response.data['status'], 'failed')
+        self.assertIn('Insufficient funds', response.data['error'])
+
+    @override_settings(USE_TRANSACTION_QUEUE=True, FUND_SYNC_DEADLINE_MS=50)
+    def test_fund_hybrid_deadline_expires(self):
+        """Test hybrid mode falling back to 202 when the worker is too slow"""
+        with patch('faucet.views.transaction_queue') as mock_queue:
+            mock_queue.admission_check.return_value = (True, 0)
+            response = self.client.post(
+                self.url,
+                data=json.dumps(self.valid_payload),
+                content_type='application/json'
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], 'pending')
+        self.assertNotIn('transaction_hash', response.data)
+
+    @override_settings(USE_TRANSACTION_QUEUE=True)
+    def test_fund_queue_backpressure(self):
+        """Test that an overloaded queue rejects requests with Retry-After and no database row"""
+        with patch('faucet.views.transaction_queue') as mock_queue:
+            mock_queue.admission_check.return_value = (False, 42)
+            response = self.client.post(
+                self.url,
+                data=json.dumps(self.valid_payload),
+                content_type='application/json'
+            )
+
+            mock_queue.enqueue_transaction.assert_not_called()
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '42')
+        self.assertEqual(Transaction.objects.count(), 0)
+        self.mock_rate_limiter_instance.record_request.assert_not_called()
+
     def test_fund_invalid_address(self):
         """Test funding with an invalid Ethereum address"""
         invalid_payload = {
@@ -101,6 +213,18 @@ class FundViewTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn('error', response.data)
 
+    def test_fund_bad_checksum(self):
+        """Test that an address with a bad EIP-55 checksum is rejected before the limiter runs"""
+        response = self.client.post(
+            self.url,
+            data=json.dumps({'wallet_address': '0x742D35Cc6634C0532925a3b844Bc454e4438f44e'}),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.mock_rate_limiter_instance.is_rate_limited.assert_not_called()
+        self.assertEqual(Transaction.objects.count(), 0)
+
     def test_fund_rate_limited(self):
         """Test funding when rate limited"""
         # Configure mock to return rate limited
@@ -120,6 +244,70 @@ class FundViewTests(TestCase):
         transaction = Transaction.objects.first()
         self.assertEqual(transaction.status, 'failed')
 
+    def test_fund_denied_network(self):
+        """Test that requests from a denied network are refused without a database row or idempotency record"""
+        with patch('faucet.views.ip_access_list', IPAccessList(allow=[], deny=['127.0.0.0/8'])), \
+                patch('faucet.views.idempotency_store') as mock_idempotency_store:
+            response = self.client.post(
+                self.url,
+                data=json.dumps(self.valid_payload),
+                content_type='application/json',
+                HTTP_IDEMPOTENCY_KEY='denied-1'
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(Transaction.objects.count(), 0)
+        self.mock_rate_limiter_instance.is_rate_limited.assert_not_called()
+        mock_idempotency_store.begin.assert_not_called()
+
+    @patch('faucet.views.spend_budget')
+    def test_fund_spend_budget_exhausted(self, mock_spend_budget):
+        """Test that an exhausted spend budget is rejected early with Retry-After"""
+        mock_spend_budget.reserve.return_value = (False, 120)
+
+        response = self.client.post(
+            self.url,
+            data=json.dumps(self.valid_payload),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '120')
+        self.assertEqual(Transaction.objects.count(), 0)
+        self.mock_eth_service.assert_not_called()
+
+    @override_settings(USE_TRANSACTION_QUEUE=False)
+    @patch('faucet.views.spend_budget')
+    def test_fund_refunds_budget_on_failure(self, mock_spend_budget):
+        """Test that a payout that was never sent gives its reservation back"""
+        mock_spend_budget.reserve.return_value = (True, 0)
+        self.mock_eth_instance.send_transaction.side_effect = ValueError("Insufficient funds")
+
+        self.client.post(
+            self.url,
+            data=json.dumps(self.valid_payload),
+            content_type='application/json'
+        )
+
+        mock_spend_budget.refund.assert_called_once()
+
+    @patch('faucet.views.wallet_caps')
+    def test_fund_wallet_cap_reached(self, mock_wallet_caps):
+        """Test that a wallet past its lifetime cap is refused"""
+        mock_wallet_caps.check.return_value = (False, 'lifetime')
+        mock_wallet_caps.lifetime = 5
+
+        response = self.client.post(
+            self.url,
+            data=json.dumps(self.valid_payload),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertIn('lifetime limit of 5', response.data['error'])
+        self.assertEqual(Transaction.objects.get().status, 'failed')
+        self.mock_eth_instance.send_transaction.assert_not_called()
+
     @override_settings(USE_TRANSACTION_QUEUE=False)
     def test_fund_ethereum_error(self):
         """Test funding when Ethereum service throws an error"""
@@ -140,6 +328,189 @@ class FundViewTests(TestCase):
         transaction = Transaction.objects.first()
         self.assertEqual(transaction.status, 'failed')
 
+    @override_settings(USE_TRANSACTION_QUEUE=False)
+    def test_fund_deadline_exceeded(self):
+        """Test funding when the Ethereum network doesn't respond within the deadline"""
+        self.mock_eth_instance.send_transaction.side_effect = DeadlineExceeded("Deadline exceeded")
+
+        response = self.client.post(
+            self.url,
+            data=json.dumps(self.valid_payload),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_504_GATEWAY_TIMEOUT)
+        self.assertIn('error', response.data)
+
+        # Verify the deadline was passed to the service
+        self.assertIsNotNone(self.mock_eth_instance.send_transaction.call_args.kwargs['deadline'])
+
+        # Verify a failed transaction was recorded
+        transaction = Transaction.objects.get()
+        self.assertEqual(transaction.status, 'failed')
+
+
+    @override_settings(USE_TRANSACTION_QUEUE=False)
+    def test_fund_idempotent_retry(self):
+        """Test that a retry with the same Idempotency-Key replays the first response"""
+        cache.clear()
+        first = self.client.post(
+            self.url,
+            data=json.dumps(self.valid_payload),
+            content_type='application/json',
+            HTTP_IDEMPOTENCY_KEY='retry-key-1'
+        )
+        retry = self.client.post(
+            self.url,
+            data=json.dumps(self.valid_payload),
+            content_type='application/json',
+            HTTP_IDEMPOTENCY_KEY='retry-key-1'
+        )
+
+        self.assertEqual(retry.status_code, first.status_code)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+
+        # The retry didn't reach the limiter, the RPC or the database
+        self.mock_eth_instance.send_transaction.assert_called_once()
+        self.mock_rate_limiter_instance.is_rate_limited.assert_called_once()
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    @override_settings(USE_TRANSACTION_QUEUE=False)
+    def test_fund_idempotency_key_reused(self):
+        """Test that reusing a key for a different wallet is rejected"""
+        cache.clear()
+        self.client.post(
+            self.url,
+            data=json.dumps(self.valid_payload),
+            content_type='application/json',
+            HTTP_IDEMPOTENCY_KEY='retry-key-2'
+        )
+        response = self.client.post(
+            self.url,
+            data=json.dumps({'wallet_address': '0x0000000000000000000000000000000000000001'}),
+            content_type='application/json',
+            HTTP_IDEMPOTENCY_KEY='retry-key-2'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    @override_settings(USE_TRANSACTION_QUEUE=False)
+    def test_fund_idempotency_in_progress(self):
+        """Test that a duplicate of a request still in flight gets 409 once its wait runs out"""
+        cache.clear()
+        fingerprint = idempotency_store.fingerprint(self.valid_payload['wallet_address'].lower())
+        self.assertEqual(idempotency_store.begin('retry-key-3', fingerprint)[0], idempotency_store.NEW)
+
+        with patch.object(idempotency_store, 'wait_timeout', 0.1):
+            response = self.client.post(
+                self.url,
+                data=json.dumps(self.valid_payload),
+                content_type='application/json',
+                HTTP_IDEMPOTENCY_KEY='retry-key-3'
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.mock_eth_instance.send_transaction.assert_not_called()
+
+    @override_settings(USE_TRANSACTION_QUEUE=False)
+    def test_fund_idempotency_server_error_not_stored(self):
+        """Test that a 5xx response from before anything was signed is not replayed, so the retry is processed again"""
+        cache.clear()
+        self.mock_eth_instance.send_transaction.side_effect = [Exception("Node error"), '0xabc']
+
+        for expected in (status.HTTP_500_INTERNAL_SERVER_ERROR, status.HTTP_200_OK):
+            response = self.client.post(
+                self.url,
+                data=json.dumps(self.valid_payload),
+                content_type='application/json',
+                HTTP_IDEMPOTENCY_KEY='retry-key-4'
+            )
+            self.assertEqual(response.status_code, expected)
+
+    @override_settings(USE_TRANSACTION_QUEUE=False)
+    def test_fund_idempotency_error_after_signing_stored(self):
+        """Test that a timeout after the transfer was signed is replayed, never funded a second time"""
+        cache.clear()
+
+        def signed_then_timed_out(wallet_address, deadline=None, write_ahead=None):
+            write_ahead(MagicMock())
+            raise DeadlineExceeded("Deadline exceeded")
+        self.mock_eth_instance.send_transaction.side_effect = signed_then_timed_out
+
+        for replayed in (None, 'true'):
+            response = self.client.post(
+                self.url,
+                data=json.dumps(self.valid_payload),
+                content_type='application/json',
+                HTTP_IDEMPOTENCY_KEY='retry-key-5'
+            )
+            self.assertEqual(response.status_code, status.HTTP_504_GATEWAY_TIMEOUT)
+            self.assertEqual(response.headers.get('Idempotent-Replayed'), replayed)
+        self.mock_eth_instance.send_transaction.assert_called_once()
+
+
+class BulkFundViewTests(TestCase):
+    """Test cases for the BulkFundView API endpoint"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse('fund-bulk')
+        self.partner, api_key = Partner.create_with_key('Test Hackathon', daily_quota=3)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Api-Key {api_key}')
+
+        self.queue_patcher = patch('faucet.views.transaction_queue')
+        self.mock_queue = self.queue_patcher.start()
+        self.mock_queue.admission_check.return_value = (True, 0)
+
+    def tearDown(self):
+        self.queue_patcher.stop()
+
+    def test_bulk_requires_api_key(self):
+        """Test that requests without a valid partner key are rejected"""
+        self.client.credentials(HTTP_AUTHORIZATION='Api-Key wrong-key')
+        response = self.client.post(self.url, {'wallet_addresses': ['0x742d35Cc6634C0532925a3b844Bc454e4438f44e']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.credentials()
+        response = self.client.post(self.url, {'wallet_addresses': ['0x742d35Cc6634C0532925a3b844Bc454e4438f44e']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_bulk_fund(self):
+        """Test that valid addresses are recorded under one batch and enqueued together"""
+        response = self.client.post(self.url, {'wallet_addresses': [
+            '0x742d35Cc6634C0532925a3b844Bc454e4438f44e',
+            '0x0000000000000000000000000000000000000001',
+            '0x742d35cc6634c0532925a3b844bc454e4438f44e',
+            '0x742D35Cc6634C0532925a3b844Bc454e4438f44e',
+            'not-an-address',
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            ['pending', 'pending', 'duplicate', 'invalid', 'invalid']
+        )
+        self.assertEqual(response.data['accepted'], 2)
+        self.assertEqual(response.data['quota_remaining'], 1)
+
+        transactions = Transaction.objects.filter(batch_id=response.data['batch_id'])
+        self.assertEqual(transactions.count(), 2)
+        self.mock_queue.enqueue_batch.assert_called_once()
+        self.assertEqual(len(self.mock_queue.enqueue_batch.call_args[0][1]), 2)
+
+    def test_bulk_quota_exceeded(self):
+        """Test that a batch larger than the remaining quota is rejected as a whole"""
+        response = self.client.post(self.url, {'wallet_addresses': [
+            f'0x{index:040x}' for index in range(1, 5)
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response.data['quota_remaining'], 3)
+        self.assertEqual(Transaction.objects.count(), 0)
+        self.mock_queue.enqueue_batch.assert_not_called()
+
 
 class StatsViewTests(TestCase):
     """Test cases for the StatsView API endpoint"""
@@ -175,7 +546,8 @@ class StatsViewTests(TestCase):
         # Mock the transaction queue
         self.queue_patcher = patch('faucet.views.transaction_queue')
         self.mock_queue = self.queue_patcher.start()
-        self.mock_queue.queue.qsize.return_value = 1
+        self.mock_queue.queue_depth.return_value = 1
+        self.mock_queue.estimated_wait.return_value = 2.0
 
     def tearDown(self):
         self.queue_patcher.stop()
@@ -207,4 +579,369 @@ class StatsViewTests(TestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('faucet_balance', response.data)
-        self.assertEqual(response.data['faucet_balance'], 0.5)
\ No newline at end of file
+        self.assertEqual(response.data['faucet_balance'], 0.5)
+
+class TransactionStatusViewTests(TestCase):
+    """Test cases for the TransactionStatusView API endpoint"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.transaction = Transaction.objects.create(
+            wallet_address='0x742d35Cc6634C0532925a3b844Bc454e4438f44e',
+            status='pending',
+            ip_address='127.0.0.1',
+            amount=0.0001
+        )
+        self.url = reverse('transaction-status', args=[self.transaction.id])
+
+    def test_get_status(self):
+        """Test getting the status of a transaction"""
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['transaction_id'], self.transaction.id)
+        self.assertEqual(response.data['status'], 'pending')
+        self.assertIn('ETag', response)
+
+    def test_get_status_not_found(self):
+        """Test getting the status of an unknown transaction"""
+        response = self.client.get(reverse('transaction-status', args=[999999]))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_get_status_not_modified(self):
+        """Test that a matching If-None-Match returns 304 without touching the database"""
+        etag = self.client.get(self.url)['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_get_status_changed(self):
+        """Test that a status change invalidates the ETag"""
+        etag = self.client.get(self.url)['ETag']
+
+        self.transaction.status = 'success'
+        self.transaction.transaction_hash = '0x' + 'ab' * 32
+        self.transaction.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'success')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_event_stream_terminal_status(self):
+        """Test that the event stream closes once the transaction has settled"""
+        self.transaction.status = 'failed'
+        self.transaction.save()
+
+        response = self.client.get(f"{self.url}?stream=true")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn('event: status', body)
+        self.assertIn('"status": "failed"', body)
+        # Closing the response gives its waiter slot back
+        response.close()
+        self.assertEqual(transaction_events._waiters, 0)
+
+    @patch.object(transaction_events, 'max_waiters', 0)
+    def test_waiters_over_limit_rejected(self):
+        """Test that long-polls and streams over the waiter limit get 503 instead of a thread"""
+        for query in ('wait=10', 'stream=true'):
+            response = self.client.get(f"{self.url}?{query}")
+
+            self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+            self.assertIn('Retry-After', response)
+
+        # Requests that don't wait are still served
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class TransactionHistoryViewTests(TestCase):
+    """Test cases for the staff transaction history and histogram endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('transaction-history')
+        self.staff = User.objects.create_user('operator', password='secret', is_staff=True)
+        self.client.force_authenticate(self.staff)
+
+        now = timezone.now()
+        self.transactions = []
+        for i in range(5):
+            tx = Transaction.objects.create(
+                wallet_address=f'0x{i:040x}',
+                ip_address='127.0.0.1' if i % 2 else '10.0.0.1',
+                status='success' if i % 2 else 'failed'
+            )
+            self.transactions.append(tx)
+        # Two rows share a timestamp so paging must break ties on id
+        for i, tx in enumerate(self.transactions):
+            created_at = now - timedelta(hours=min(i, 3))
+            Transaction.objects.filter(id=tx.id).update(created_at=created_at)
+
+    def test_requires_staff(self):
+        """Test that non-staff users are refused"""
+        self.client.force_authenticate(User.objects.create_user('visitor'))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_keyset_pagination(self):
+        """Test that following cursors returns every row once, newest first"""
+        seen = []
+        cursor = None
+        while True:
+            params = {'limit': 2}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(row['id'] for row in response.data['results'])
+            cursor = response.data['next_cursor']
+            if cursor is None:
+                break
+
+        expected = Transaction.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        self.assertEqual(seen, list(expected))
+
+    def test_filters(self):
+        """Test filtering by status, IP and wallet"""
+        response = self.client.get(self.url, {'status': 'success', 'ip': '127.0.0.1'})
+        self.assertEqual({row['id'] for row in response.data['results']},
+                         {self.transactions[1].id, self.transactions[3].id})
+
+        response = self.client.get(self.url, {'wallet': '0x' + '0' * 39 + '2'})
+        self.assertEqual([row['id'] for row in response.data['results']], [self.transactions[2].id])
+
+    def test_invalid_cursor(self):
+        """Test that a malformed cursor is rejected"""
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_csv_export(self):
+        """Test that the CSV export streams a header and every matching row"""
+        response = self.client.get(self.url, {'format': 'csv'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertTrue(lines[0].startswith('id,wallet_address'))
+        self.assertEqual(len(lines), 6)
+
+    def test_ndjson_export(self):
+        """Test that the NDJSON export streams one JSON object per row, oldest first"""
+        response = self.client.get(self.url, {'format': 'ndjson', 'status': 'failed'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['id'] for row in rows], [self.transactions[4].id, self.transactions[2].id, self.transactions[0].id])
+
+    def test_histogram(self):
+        """Test hourly counts by status"""
+        response = self.client.get(reverse('transaction-histogram'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sum(bucket['total'] for bucket in response.data['buckets']), 5)
+        self.assertEqual(sum(bucket['failed'] for bucket in response.data['buckets']), 3)
+
+    def test_histogram_range_capped(self):
+        """Test that overly long histogram ranges are rejected"""
+        response = self.client.get(reverse('transaction-histogram'), {'since': '2020-01-01T00:00:00Z'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TransactionAdminTests(TestCase):
+    """Test cases for the Transaction changelist and its bulk actions"""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        self.client.force_login(self.user)
+        self.url = reverse('admin:faucet_transaction_changelist')
+        self.failed = Transaction.objects.create(
+            wallet_address='0x742d35cc6634c0532925a3b844bc454e4438f44e',
+            ip_address='127.0.0.1',
+            status='failed',
+            error_message='Insufficient funds',
+            retry_count=3
+        )
+        self.pending = Transaction.objects.create(
+            wallet_address='0x52908400098527886e0f7030069857d2e4169ee7',
+            transaction_hash='0xabcdef0123456789abcdef0123456789abcdef0123456789abcdef0123456789',
+            ip_address='10.0.0.1',
+            status='pending'
+        )
+
+    def test_changelist_with_date_hierarchy(self):
+        """Test that the changelist and each date hierarchy level render"""
+        now = timezone.now()
+        for params in ({}, {'created_at__year': now.year}, {'created_at__year': now.year, 'created_at__month': now.month}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.context['cl'].result_count, 2)
+
+    def test_search(self):
+        """Test exact and prefix searches on indexed columns"""
+        searches = {
+            '0x742D35cc6634c0532925a3b844bc454e4438f44e': self.failed,
+            '0xabcdef01': self.pending,
+            '10.0.0.1': self.pending,
+            str(self.failed.id): self.failed,
+        }
+        for term, expected in searches.items():
+            response = self.client.get(self.url, {'q': term})
+            self.assertEqual(list(response.context['cl'].result_list), [expected], term)
+
+        response = self.client.get(self.url, {'q': 'cc6634'})
+        self.assertEqual(response.context['cl'].result_count, 0)
+
+    @patch('faucet.admin.transaction_queue')
+    def test_requeue_action(self, mock_queue):
+        """Test that failed rows are reset in bulk and enqueued"""
+        mock_queue.max_size = 100
+        self.client.post(self.url, {
+            'action': 'requeue_transactions',
+            '_selected_action': [self.failed.id, self.pending.id],
+        })
+
+        self.failed.refresh_from_db()
+        self.assertEqual(self.failed.status, 'pending')
+        self.assertEqual(self.failed.retry_count, 0)
+        self.assertIsNone(self.failed.error_message)
+        mock_queue.enqueue_transaction.assert_called_once_with(self.failed.id, self.failed.wallet_address, '127.0.0.1', 0)
+        # Waiters see the change, though update() sends no post_save
+        self.assertEqual(transaction_events.get_snapshot(self.failed.id)['status'], 'pending')
+
+    @patch('faucet.admin.spend_budget')
+    @patch('faucet.admin.transaction_queue')
+    def test_requeue_action_reserves_budget(self, mock_queue, mock_spend_budget):
+        """Test that requeued unsigned rows reserve the budget, and rows the full queue turns away are refunded"""
+        mock_queue.max_size = 100
+        mock_queue.enqueue_transaction.side_effect = TransactionQueueFull("full")
+        mock_spend_budget.reserve.return_value = (True, 0)
+        self.client.post(self.url, {
+            'action': 'requeue_transactions',
+            '_selected_action': [self.failed.id],
+        })
+
+        self.failed.refresh_from_db()
+        mock_spend_budget.reserve.assert_called_once_with(self.failed.amount)
+        mock_spend_budget.refund.assert_called_once_with(self.failed.amount)
+        self.assertEqual(self.failed.status, 'failed')
+
+        # Nothing is requeued when the budget can't cover it
+        mock_spend_budget.reserve.return_value = (False, 30)
+        mock_queue.enqueue_transaction.reset_mock()
+        self.client.post(self.url, {
+            'action': 'requeue_transactions',
+            '_selected_action': [self.failed.id],
+        })
+        mock_queue.enqueue_transaction.assert_not_called()
+
+    @patch('faucet.admin.spend_budget')
+    def test_fail_action_skips_signed(self, mock_spend_budget):
+        """Test that pending rows are failed in bulk, except already signed ones"""
+        signed = Transaction.objects.create(
+            wallet_address='0x52908400098527886e0f7030069857d2e4169ee7',
+            ip_address='10.0.0.1',
+            status='pending',
+            nonce=7
+        )
+        self.client.post(self.url, {
+            'action': 'fail_transactions',
+            '_selected_action': [self.pending.id, signed.id],
+        })
+
+        self.pending.refresh_from_db()
+        signed.refresh_from_db()
+        self.assertEqual(self.pending.status, 'failed')
+        self.assertEqual(signed.status, 'pending')
+        mock_spend_budget.refund.assert_called_once_with(self.pending.amount)
+        self.assertEqual(transaction_events.get_snapshot(self.pending.id)['status'], 'failed')
+
+
+class ProfilingViewTests(TestCase):
+    """Test cases for the staff profiling endpoint and profiled fund requests"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('profiling')
+        self.staff = User.objects.create_user('operator', password='secret', is_staff=True)
+        self.client.force_authenticate(self.staff)
+
+        self.profile_dir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(PROFILE_DIR=self.profile_dir.name, USE_TRANSACTION_QUEUE=False)
+        self.settings_override.enable()
+
+        self.eth_service_patcher = patch('faucet.views.EthereumService')
+        mock_eth_service = self.eth_service_patcher.start()
+        mock_eth_service.return_value.send_transaction.return_value = '0x' + 'ab' * 32
+        mock_eth_service.return_value.amount = 0.0001
+
+    def tearDown(self):
+        request_profiler.arm(0)
+        self.eth_service_patcher.stop()
+        self.settings_override.disable()
+        self.profile_dir.cleanup()
+        cache.clear()
+
+    def fund(self, client, wallet_address, **headers):
+        return client.post(
+            reverse('fund'),
+            data=json.dumps({'wallet_address': wallet_address}),
+            content_type='application/json',
+            **headers
+        )
+
+    def test_requires_staff(self):
+        """Test that non-staff users are refused"""
+        self.client.force_authenticate(User.objects.create_user('visitor'))
+        response = self.client.post(self.url, {'requests': 1}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_armed_requests_are_profiled(self):
+        """Test that arming profiles the next fund requests only, and the profile can be read back"""
+        response = self.client.post(self.url, {'requests': 1}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        # Anonymous clients are profiled, but not told where the profile went
+        anonymous = APIClient()
+        response = self.fund(anonymous, '0x742d35cc6634c0532925a3b844bc454e4438f44e')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('X-Faucet-Profile', response)
+
+        response = self.fund(anonymous, '0x' + '1' * 40)
+        self.assertNotIn('X-Faucet-Profile', response)
+
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.data['profiles']), 1)
+        self.assertEqual(response.data['armed_requests'], 0)
+        name = response.data['profiles'][0]
+
+        response = self.client.get(self.url, {'name': name})
+        self.assertIn('function calls', response.data['stats'])
+
+        response = self.client.get(self.url, {'name': '../settings.py'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_profile_header(self):
+        """Test that the profile header only works for staff"""
+        response = self.fund(APIClient(), '0x742d35cc6634c0532925a3b844bc454e4438f44e', HTTP_X_FAUCET_PROFILE='1')
+        self.assertNotIn('X-Faucet-Profile', response)
+
+        response = self.fund(self.client, '0x' + '1' * 40, HTTP_X_FAUCET_PROFILE='1')
+        self.assertTrue(response['X-Faucet-Profile'].startswith('fund-'))
+
+    def test_memory_report(self):
+        """Test that a memory diff is saved and can be read back, and tracing stopped again"""
+        try:
+            response = self.client.post(self.url, {'memory': 'diff'}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+            self.assertTrue(response.data['memory']['tracing'])
+            name = response.data['memory_report']
+
+            response = self.client.get(self.url, {'name': name})
+            self.assertIn('Changes since the baseline', response.data['report'])
+        finally:
+            response = self.client.post(self.url, {'memory': 'stop'}, format='json')
+        self.assertFalse(response.data['memory']['tracing'])
@@ -1,7 +1,20 @@
 from django.urls import path
-from .views import FundView, StatsView
+from .views import (
+    FundView,
+    BulkFundView,
+    StatsView,
+    TransactionStatusView,
+    TransactionHistoryView,
+    TransactionHistogramView,
+    ProfilingView
+)
 
 urlpatterns = [
     path('fund/', FundView.as_view(), name='fund'),
+    path('fund/bulk/', BulkFundView.as_view(), name='fund-bulk'),
     path('stats/', StatsView.as_view(), name='stats'),
+    path('transactions/', TransactionHistoryView.as_view(), name='transaction-history'),
+    path('transactions/histogram/', TransactionHistogramView.as_view(), name='transaction-histogram'),
+    path('transactions/<int:transaction_id>/', TransactionStatusView.as_view(), name='transaction-status'),
+    path('profile/', ProfilingView.as_view(), name='profiling'),
 ]
\ No newline at end of file
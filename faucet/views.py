@@ -1,45 +1,197 @@
+import os
+import csv
+import json
+import time
+import uuid
 import logging
+from decimal import Decimal
 from datetime import timedelta
+from django.db import connections
+from django.http import StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 from rest_framework import status
+from rest_framework.renderers import BaseRenderer, JSONRenderer, BrowsableAPIRenderer
 from rest_framework.views import APIView
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 from django.conf import settings
 from .models import Transaction
+from .authentication import PartnerAPIKeyAuthentication, IsPartner
 from .serializers import (
     WalletAddressSerializer,
+    BulkFundSerializer,
     TransactionResponseSerializer,
+    TransactionHistoryQuerySerializer,
+    ProfilingRequestSerializer,
     StatsResponseSerializer
 )
 from .services.ethereum import EthereumService
-from .services.rate_limiter import RateLimiter
-from .services.transaction_queue import transaction_queue
+from .services.rate_limiter import RateLimiter, PartnerQuota
+from .services.ip_prefixes import ip_access_list
+from .services.wallet_caps import wallet_caps
+from .services.spend_budget import spend_budget
+from .services.transaction_queue import transaction_queue, TransactionQueueFull
+from .services.transaction_events import transaction_events, TERMINAL_STATUSES
+from .services.deadline import Deadline, DeadlineExceeded, deadline_scope
+from .services.idempotency import idempotency_store
+from .services.addresses import normalize_address, InvalidAddressError
+from .services.replica import reads_from_replica
+from .services.tracing import tracer
+from .services.profiling import (
+    profiled,
+    request_profiler,
+    stack_sampler,
+    list_profiles,
+    profile_path,
+    summarize_profile,
+    memory_report_path
+)
+from .services.memory import memory_tracker
+from .services.history import (
+    HISTORY_FIELDS,
+    InvalidCursorError,
+    filter_transactions,
+    keyset_page,
+    iter_rows,
+    hourly_histogram
+)
 
 logger = logging.getLogger(__name__)
 
 
-class FundView(APIView):
+def release_db_connections():
+    """
+    Close this thread's database connections before a long wait, so waiting clients each
+    hold a server thread but not a connection; the next query reconnects
+    """
+    for connection in connections.all(initialized_only=True):
+        if not connection.in_atomic_block:
+            connection.close()
+
+
+class FaucetRequestMixin:
+    """Helpers shared by the funding views"""
+
+    def queue_busy_response(self, retry_after):
+        """503 response telling the client when the queue is expected to have room"""
+        retry_after = max(1, retry_after)
+        return Response(
+            {"error": f"Faucet is busy. Please try again in {retry_after} seconds."},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={'Retry-After': str(retry_after)}
+        )
+
+    def get_client_ip(self, request):
+        """Extract client IP address from request"""
+        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+        if x_forwarded_for:
+            # In case of multiple proxies, the real IP is the first one
+            ip = x_forwarded_for.split(',')[0].strip()
+        else:
+            ip = request.META.get('REMOTE_ADDR')
+        return ip
+
+
+class FundView(FaucetRequestMixin, APIView):
     """API View for sending Sepolia ETH from the faucet to a wallet"""
 
+    @profiled('fund')
     def post(self, request):
-        # Validate input data
+        # Denied networks are turned away from an in-process table, before any Redis or DB work,
+        # including the idempotency store
+        if ip_access_list.is_denied(self.get_client_ip(request)):
+            return Response(
+                {"error": "Requests from this network are not allowed"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        # Validate input data next: malformed requests never reach Redis, the DB or the RPC
         serializer = WalletAddressSerializer(data=request.data)
         if not serializer.is_valid():
             return Response(
                 {"error": serializer.errors},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        wallet_address = serializer.validated_data['wallet_address']
+
+        idempotency_key = request.headers.get('Idempotency-Key')
+        if not idempotency_key:
+            return self.fund(request, wallet_address)
+
+        if len(idempotency_key) > 255:
+            return Response(
+                {"error": "Idempotency-Key must be at most 255 characters"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Retries of a request already handled get the stored response, before any limiter, DB or RPC work
+        fingerprint = idempotency_store.fingerprint(wallet_address)
+        state, stored = idempotency_store.begin(idempotency_key, fingerprint)
+
+        if state == idempotency_store.REPLAY:
+            return Response(stored['data'], status=stored['status'], headers={'Idempotent-Replayed': 'true'})
+
+        if state == idempotency_store.MISMATCH:
+            return Response(
+                {"error": "Idempotency-Key was already used for a different request"},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+
+        if state == idempotency_store.IN_PROGRESS:
+            return Response(
+                {"error": "A request with this Idempotency-Key is still being processed"},
+                status=status.HTTP_409_CONFLICT,
+                headers={'Retry-After': '1'}
+            )
+
+        try:
+            response = self.fund(request, wallet_address)
+        except Exception:
+            if not getattr(request, 'payout_attempted', False):
+                idempotency_store.release(idempotency_key)
+                raise
+            # The payout may have gone out: retries get this answer rather than a second payout
+            logger.exception("Error after a payout was attempted for %s", wallet_address)
+            response = Response(
+                {"error": "The outcome of this request is unknown; the transfer may have been sent"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        idempotency_store.complete(
+            idempotency_key, fingerprint, response.status_code, response.data,
+            payout_attempted=getattr(request, 'payout_attempted', False)
+        )
+        return response
+
+    def fund(self, request, wallet_address):
+        """Rate limit and send (or queue) one payout to an already validated, canonical address"""
+        # Overall time budget for this request, shared by every RPC call made on its behalf
+        deadline = Deadline(getattr(settings, 'FUND_REQUEST_DEADLINE', 25.0))
 
         # Get client IP address
         ip_address = self.get_client_ip(request)
-        wallet_address = serializer.validated_data['wallet_address']
+        use_queue = getattr(settings, 'USE_TRANSACTION_QUEUE', True)
+
+        # Backpressure: reject early, without writing a row, when the queue can't keep up
+        if use_queue:
+            accepted, retry_after = transaction_queue.admission_check()
+            if not accepted:
+                return self.queue_busy_response(retry_after)
 
         # Check rate limiting
         rate_limiter = RateLimiter()
-        is_limited, remaining_time = rate_limiter.is_rate_limited(ip_address, wallet_address)
+        with tracer.span('faucet.rate_limit') as span:
+            is_limited, remaining_time = rate_limiter.is_rate_limited(ip_address, wallet_address)
+            span.set_attribute('faucet.rate_limited', is_limited)
 
         if is_limited:
             error_msg = f"Rate limit exceeded. Please try again in {remaining_time} seconds."
+            # Sampled as one stream however many clients are being turned away
+            logger.info(
+                "Rate limited request from %s for %s (%ss left)", ip_address, wallet_address, remaining_time,
+                extra={'sample_key': 'rate_limited'}
+            )
 
             # Record failed transaction in database
             Transaction.objects.create(
@@ -54,10 +206,44 @@ class FundView(APIView):
                 status=status.HTTP_429_TOO_MANY_REQUESTS
             )
 
-        # Initialize Ethereum service
+        # Long-horizon caps per wallet (payouts per window, payouts ever)
+        with tracer.span('faucet.wallet_caps') as span:
+            within_caps, cap = wallet_caps.check(wallet_address)
+            span.set_attribute('faucet.wallet_cap', cap)
+        if not within_caps:
+            if cap == 'window':
+                error_msg = f"This wallet has reached its limit of {wallet_caps.per_window} payouts per {wallet_caps.window_days} days."
+                response_status = status.HTTP_429_TOO_MANY_REQUESTS
+            else:
+                error_msg = f"This wallet has reached its lifetime limit of {wallet_caps.lifetime} payouts."
+                response_status = status.HTTP_403_FORBIDDEN
+
+            Transaction.objects.create(
+                wallet_address=wallet_address,
+                status='failed',
+                error_message=error_msg,
+                ip_address=ip_address
+            )
+
+            return Response({"error": error_msg}, status=response_status)
+
+        # Reserve the payout from the spend budget shared by every node: one Redis round trip,
+        # before any balance RPC. Paths below that end without sending give it back.
+        amount = Decimal(settings.FAUCET_AMOUNT)
+        reserved, retry_after = spend_budget.reserve(amount)
+        if not reserved:
+            return Response(
+                {"error": f"Faucet spending limit reached. Please try again in {retry_after} seconds."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': str(retry_after)}
+            )
+
+        # Initialize Ethereum service; its connection checks also count against the deadline
         try:
-            eth_service = EthereumService()
+            with deadline_scope(deadline):
+                eth_service = EthereumService()
         except ConnectionError as e:
+            spend_budget.refund(amount)
             error_msg = "Unable to connect to Ethereum network"
 
             # Record failed transaction in database
@@ -75,13 +261,7 @@ class FundView(APIView):
 
         # Process transaction (either directly or via queue)
         try:
-            # Use async queue if configured
-            use_queue = getattr(settings, 'USE_TRANSACTION_QUEUE', True)
-
             if use_queue:
-                # Record the request for rate limiting
-                rate_limiter.record_request(ip_address, wallet_address)
-
                 # Create pending transaction in database
                 transaction = Transaction.objects.create(
                     wallet_address=wallet_address,
@@ -91,11 +271,61 @@ class FundView(APIView):
                 )
 
                 # Add transaction to the processing queue
-                transaction_queue.enqueue_transaction(
-                    transaction.id,
-                    wallet_address,
-                    ip_address
-                )
+                try:
+                    transaction_queue.enqueue_transaction(
+                        transaction.id,
+                        wallet_address,
+                        ip_address
+                    )
+                    # From here on a retry with the same Idempotency-Key must not fund again
+                    request.payout_attempted = True
+                except TransactionQueueFull:
+                    # Lost the race for the last slot since the admission check
+                    spend_budget.refund(amount)
+                    transaction.status = 'failed'
+                    transaction.error_message = "Transaction queue is full"
+                    transaction.save()
+                    _, retry_after = transaction_queue.admission_check()
+                    return self.queue_busy_response(retry_after)
+
+                # Record the request for rate limiting, once it is queued; the worker
+                # releases the wallet caps again if it is never sent
+                rate_limiter.record_request(ip_address, wallet_address)
+                wallet_caps.record(wallet_address)
+
+                # Hybrid mode: give the worker a short deadline to return the hash
+                sync_deadline_ms = getattr(settings, 'FUND_SYNC_DEADLINE_MS', 0)
+                # When every waiter slot is taken, answer 202 at once instead of waiting
+                if sync_deadline_ms > 0 and transaction_events.reserve_waiter():
+                    release_db_connections()
+                    try:
+                        snapshot = transaction_events.wait_until_settled(
+                            transaction.id,
+                            sync_deadline_ms / 1000.0
+                        )
+                    finally:
+                        transaction_events.release_waiter()
+                    if snapshot is not None and snapshot['status'] == 'success':
+                        response_data = {
+                            "transaction_hash": snapshot['transaction_hash'],
+                            "transaction_id": transaction.id,
+                            "wallet_address": wallet_address,
+                            "amount": eth_service.amount,
+                            "status": "success"
+                        }
+
+                        return Response(response_data, status=status.HTTP_200_OK)
+                    if snapshot is not None and snapshot['status'] == 'failed':
+                        # Failed for good within the deadline: same answer as the synchronous mode
+                        return Response(
+                            {
+                                "error": f"Transaction failed: {snapshot['error_message']}",
+                                "transaction_id": transaction.id,
+                                "wallet_address": wallet_address,
+                                "status": "failed"
+                            },
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                        )
 
                 # Return accepted response
                 response_data = {
@@ -109,11 +339,17 @@ class FundView(APIView):
                 return Response(response_data, status=status.HTTP_202_ACCEPTED)
 
             else:
-                # Process immediately (synchronous mode)
-                tx_hash = eth_service.send_transaction(wallet_address)
+                # Process immediately (synchronous mode). Once the transfer is signed, a retry
+                # with the same Idempotency-Key must not fund again, whatever happens next
+                tx_hash = eth_service.send_transaction(
+                    wallet_address,
+                    deadline=deadline,
+                    write_ahead=lambda payout: setattr(request, 'payout_attempted', True)
+                )
 
                 # Record the request for rate limiting
                 rate_limiter.record_request(ip_address, wallet_address)
+                wallet_caps.record(wallet_address)
 
                 # Record successful transaction in database
                 transaction = Transaction.objects.create(
@@ -136,7 +372,9 @@ class FundView(APIView):
                 return Response(response_data, status=status.HTTP_200_OK)
 
         except ValueError as e:
-            # Handle validation errors
+            # Handle validation errors; nothing was sent. After a deadline or an unexpected
+            # error the transfer may have gone out, so the reservation is kept
+            spend_budget.refund(amount)
             error_msg = str(e)
 
             # Record failed transaction in database
@@ -152,10 +390,28 @@ class FundView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        except DeadlineExceeded as e:
+            # Handle running out of time before the transaction could be sent
+            error_msg = "Ethereum network did not respond in time"
+            logger.error("Deadline exceeded processing transaction: %s", e)
+
+            # Record failed transaction in database
+            Transaction.objects.create(
+                wallet_address=wallet_address,
+                status='failed',
+                error_message=error_msg,
+                ip_address=ip_address
+            )
+
+            return Response(
+                {"error": error_msg},
+                status=status.HTTP_504_GATEWAY_TIMEOUT
+            )
+
         except Exception as e:
             # Handle other errors
             error_msg = f"Transaction failed: {str(e)}"
-            logger.error(f"Error processing transaction: {str(e)}")
+            logger.error("Error processing transaction: %s", e)
 
             # Record failed transaction in database
             Transaction.objects.create(
@@ -170,20 +426,131 @@ class FundView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-    def get_client_ip(self, request):
-        """Extract client IP address from request"""
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            # In case of multiple proxies, the real IP is the first one
-            ip = x_forwarded_for.split(',')[0].strip()
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
+
+class BulkFundView(FaucetRequestMixin, APIView):
+    """API View for partners to fund many wallets with one request"""
+    authentication_classes = [PartnerAPIKeyAuthentication]
+    permission_classes = [IsPartner]
+
+    def post(self, request):
+        # Validate input data
+        serializer = BulkFundSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {"error": serializer.errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        partner = request.user
+        results = self.check_addresses(serializer.validated_data['wallet_addresses'])
+        accepted = [result for result in results if result['status'] == 'pending']
+        if not accepted:
+            return Response(
+                {"error": "No valid wallet addresses", "results": results},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Backpressure: reject before reserving quota or writing rows
+        admitted, retry_after = transaction_queue.admission_check()
+        if not admitted:
+            return self.queue_busy_response(retry_after)
+
+        quota = PartnerQuota()
+        allowed, quota_remaining = quota.reserve(partner, len(accepted))
+        if not allowed:
+            return Response(
+                {
+                    "error": f"Daily quota exceeded: {quota_remaining} addresses left today",
+                    "quota_remaining": quota_remaining
+                },
+                status=status.HTTP_429_TOO_MANY_REQUESTS
+            )
+
+        amount = Decimal(settings.FAUCET_AMOUNT)
+        reserved, retry_after = spend_budget.reserve(amount * len(accepted))
+        if not reserved:
+            quota.refund(partner, len(accepted))
+            return Response(
+                {"error": f"Faucet spending limit reached. Please try again in {retry_after} seconds."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': str(retry_after)}
+            )
+
+        # One INSERT for the whole batch
+        batch_id = uuid.uuid4()
+        ip_address = self.get_client_ip(request)
+        transactions = Transaction.objects.bulk_create([
+            Transaction(
+                wallet_address=normalize_address(result['wallet_address']),
+                status='pending',
+                ip_address=ip_address,
+                amount=amount,
+                batch_id=batch_id
+            )
+            for result in accepted
+        ])
+
+        try:
+            transaction_queue.enqueue_batch(
+                batch_id,
+                [(transaction.id, transaction.wallet_address) for transaction in transactions],
+                ip_address,
+                client_key=f"partner:{partner.id}"
+            )
+        except TransactionQueueFull:
+            Transaction.objects.filter(batch_id=batch_id).update(
+                status='failed',
+                error_message="Transaction queue is full"
+            )
+            quota.refund(partner, len(transactions))
+            spend_budget.refund(amount * len(transactions))
+            _, retry_after = transaction_queue.admission_check()
+            return self.queue_busy_response(retry_after)
+
+        for result, transaction in zip(accepted, transactions):
+            result['transaction_id'] = transaction.id
+
+        logger.info(
+            "Partner %s submitted batch %s with %s transactions", partner.id, batch_id, len(transactions),
+            extra={'batch_id': str(batch_id)}
+        )
+
+        response_data = {
+            "batch_id": str(batch_id),
+            "accepted": len(transactions),
+            "rejected": len(results) - len(transactions),
+            "amount": amount,
+            "quota_remaining": quota_remaining,
+            "results": results
+        }
+
+        return Response(response_data, status=status.HTTP_202_ACCEPTED)
+
+    def check_addresses(self, addresses):
+        """Per-address status: 'pending' if it will be funded, else 'invalid' or 'duplicate'"""
+        results = []
+        seen = set()
+        for address in addresses:
+            try:
+                canonical = normalize_address(address)
+            except InvalidAddressError:
+                canonical = None
+
+            if canonical is None:
+                address_status = 'invalid'
+            elif canonical in seen:
+                address_status = 'duplicate'
+            else:
+                address_status = 'pending'
+                seen.add(canonical)
+            results.append({"wallet_address": address, "status": address_status})
+        return results
 
 
 class StatsView(APIView):
     """API View for returning faucet statistics"""
 
+    @reads_from_replica()
     def get(self, request):
         # Calculate the time 24 hours ago
         time_threshold = timezone.now() - timedelta(hours=24)
@@ -204,8 +571,9 @@ class StatsView(APIView):
             status='pending'
         ).count()
 
-        # Get queue size
-        current_queue_size = transaction_queue.queue.qsize()
+        # Get queue size and expected wait for a new request
+        current_queue_size = transaction_queue.queue_depth()
+        estimated_wait = transaction_queue.estimated_wait()
 
         # Prepare response data
         response_data = {
@@ -213,6 +581,7 @@ class StatsView(APIView):
             "failed_transactions": failed_count,
             "pending_transactions": pending_count,
             "queue_size": current_queue_size,
+            "estimated_wait_seconds": round(estimated_wait, 1),
             "time_period": "24 hours"
         }
 
@@ -225,4 +594,333 @@ class StatsView(APIView):
             except Exception as e:
                 logger.error(f"Error getting faucet balance: {str(e)}")
 
-        return Response(response_data, status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response(response_data, status=status.HTTP_200_OK)
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Renderer for Server-Sent Events; plain responses are sent as a single event"""
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        event = 'error' if 'error' in (data or {}) else 'status'
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+class WaiterSlotStream:
+    """
+    Streaming content that holds a waiter slot. Django closes it with the response, so the
+    slot is released even if the stream was never read
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def __iter__(self):
+        return iter(self.stream)
+
+    def close(self):
+        self.stream.close()
+        transaction_events.release_waiter()
+
+
+class TransactionStatusView(APIView):
+    """API View for checking the status of a transaction, with long-poll and SSE modes"""
+    renderer_classes = [JSONRenderer, BrowsableAPIRenderer, EventStreamRenderer]
+    # Seconds a client turned away for lack of waiter slots is asked to wait
+    waiters_retry_after = 5
+
+    def get(self, request, transaction_id):
+        # Snapshots are served from the cache; only a cache miss reads the database
+        snapshot = transaction_events.get_snapshot(transaction_id)
+        if snapshot is None:
+            return Response(
+                {"error": "Transaction not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        if self.wants_event_stream(request):
+            if not transaction_events.reserve_waiter():
+                return self.waiters_busy_response()
+            return self.stream_events(transaction_id, snapshot)
+
+        if_none_match = request.headers.get('If-None-Match')
+        wait = self.get_wait_seconds(request)
+
+        # Long-poll: hold the request until the client's version changes or the wait expires
+        if wait > 0 and snapshot['status'] not in TERMINAL_STATUSES:
+            if not transaction_events.reserve_waiter():
+                return self.waiters_busy_response()
+            release_db_connections()
+            try:
+                snapshot = transaction_events.wait_for_change(
+                    transaction_id,
+                    if_none_match or snapshot['etag'],
+                    wait
+                ) or snapshot
+            finally:
+                transaction_events.release_waiter()
+
+        headers = {'ETag': snapshot['etag'], 'Cache-Control': 'no-cache'}
+        if if_none_match == snapshot['etag']:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        return Response(self.public_data(snapshot), status=status.HTTP_200_OK, headers=headers)
+
+    def waiters_busy_response(self):
+        """503 response for a waiting request over TRANSACTION_STATUS_MAX_WAITERS"""
+        return Response(
+            {"error": f"Too many clients are waiting for status changes. Please try again in {self.waiters_retry_after} seconds, or poll without waiting."},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={'Retry-After': str(self.waiters_retry_after)}
+        )
+
+    def get_wait_seconds(self, request):
+        """Parse the requested long-poll duration, capped by settings"""
+        max_wait = getattr(settings, 'TRANSACTION_STATUS_MAX_WAIT', 30)
+        try:
+            wait = float(request.query_params.get('wait', 0))
+        except ValueError:
+            return 0
+        return max(0, min(wait, max_wait))
+
+    def wants_event_stream(self, request):
+        """Check whether the client asked for a Server-Sent Events stream"""
+        return (
+            request.query_params.get('stream', '').lower() == 'true'
+            or 'text/event-stream' in request.headers.get('Accept', '')
+        )
+
+    def public_data(self, snapshot):
+        """Strip internal fields from a snapshot"""
+        return {key: value for key, value in snapshot.items() if key != 'etag'}
+
+    def stream_events(self, transaction_id, snapshot):
+        """
+        Stream status changes until the transaction settles or the stream times out.
+        The caller has reserved a waiter slot, which the stream releases when it is closed
+        """
+        stream_timeout = getattr(settings, 'TRANSACTION_STATUS_STREAM_TIMEOUT', 300)
+        keepalive = getattr(settings, 'TRANSACTION_STATUS_KEEPALIVE', 15)
+
+        def format_event(current):
+            return f"id: {current['etag']}\nevent: status\ndata: {json.dumps(self.public_data(current))}\n\n"
+
+        def event_stream():
+            current = snapshot
+            yield format_event(current)
+            # The response stays open for the whole stream; don't keep a connection for it
+            release_db_connections()
+
+            stop_at = time.monotonic() + stream_timeout
+            while current['status'] not in TERMINAL_STATUSES:
+                remaining = stop_at - time.monotonic()
+                if remaining <= 0:
+                    break
+                latest = transaction_events.wait_for_change(
+                    transaction_id,
+                    current['etag'],
+                    min(keepalive, remaining)
+                )
+                if latest is not None and latest['etag'] != current['etag']:
+                    current = latest
+                    yield format_event(current)
+                else:
+                    yield ": keepalive\n\n"
+
+        response = StreamingHttpResponse(WaiterSlotStream(event_stream()), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class CSVRenderer(BaseRenderer):
+    """Renderer for CSV exports; the rows themselves are streamed, so this only renders errors"""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode()
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Renderer for newline-delimited JSON exports; as with CSV, rows are streamed by the view"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return f"{json.dumps(data)}\n".encode()
+
+
+class EchoBuffer:
+    """File-like object whose write() hands back the line, so csv.writer output can be streamed"""
+
+    def write(self, value):
+        return value
+
+
+class TransactionHistoryView(APIView):
+    """
+    API View for staff to search transaction history. JSON responses are pages of 100
+    (up to TRANSACTION_HISTORY_MAX_PAGE_SIZE) rows, newest first, with a cursor for the
+    next page; `format=csv` or `format=ndjson` streams every matching row instead.
+    """
+    permission_classes = [IsAdminUser]
+    renderer_classes = [JSONRenderer, BrowsableAPIRenderer, CSVRenderer, NDJSONRenderer]
+
+    @reads_from_replica()
+    def get(self, request):
+        query = TransactionHistoryQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(
+                {"error": query.errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        filters = query.validated_data
+        queryset = filter_transactions(
+            wallet=filters.get('wallet'),
+            ip=filters.get('ip'),
+            status=filters.get('status'),
+            since=filters.get('since'),
+            until=filters.get('until')
+        )
+
+        if request.accepted_renderer.format in ('csv', 'ndjson'):
+            return self.export(queryset, request.accepted_renderer)
+
+        try:
+            rows, next_cursor = keyset_page(queryset, filters.get('cursor'), filters['limit'])
+        except InvalidCursorError as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response({"results": rows, "next_cursor": next_cursor}, status=status.HTTP_200_OK)
+
+    def export(self, queryset, renderer):
+        """Stream all matching rows, oldest first, without building the file in memory"""
+        if renderer.format == 'csv':
+            writer = csv.writer(EchoBuffer())
+            header = (writer.writerow(HISTORY_FIELDS),)
+            lines = (writer.writerow([row[field] for field in HISTORY_FIELDS]) for row in iter_rows(queryset))
+        else:
+            header = ()
+            lines = (json.dumps(row, cls=DjangoJSONEncoder) + '\n' for row in iter_rows(queryset))
+
+        def content():
+            # Runs after get() has returned, so it opts in to the replica itself
+            with reads_from_replica():
+                yield from header
+                yield from lines
+
+        response = StreamingHttpResponse(content(), content_type=f"{renderer.media_type}; charset=utf-8")
+        response['Content-Disposition'] = f'attachment; filename="transactions.{renderer.format}"'
+        return response
+
+
+class TransactionHistogramView(APIView):
+    """API View for staff returning transaction counts per hour, by status"""
+    permission_classes = [IsAdminUser]
+
+    @reads_from_replica()
+    def get(self, request):
+        query = TransactionHistoryQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(
+                {"error": query.errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        filters = query.validated_data
+
+        # Defaults to the last 24 hours; the range is capped so one request can't scan the whole table
+        until = filters.get('until') or timezone.now()
+        since = filters.get('since') or until - timedelta(hours=24)
+        max_days = getattr(settings, 'TRANSACTION_HISTOGRAM_MAX_DAYS', 31)
+        if until - since > timedelta(days=max_days):
+            return Response(
+                {"error": f"Histogram range must be at most {max_days} days"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        queryset = filter_transactions(
+            wallet=filters.get('wallet'),
+            ip=filters.get('ip'),
+            status=filters.get('status'),
+            since=since,
+            until=until
+        )
+        return Response({
+            "since": since,
+            "until": until,
+            "buckets": hourly_histogram(queryset)
+        }, status=status.HTTP_200_OK)
+
+
+class ProfilingView(APIView):
+    """
+    API View for staff to profile the process serving the request: arm cProfile for its
+    next fund requests, sample its threads' stacks, trace its memory allocations, and read
+    back saved profiles and reports
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        name = request.query_params.get('name')
+        if not name:
+            return Response({
+                "pid": os.getpid(),
+                "armed_requests": request_profiler.remaining,
+                "sampling_stacks": stack_sampler.running,
+                "memory": memory_tracker.stats(),
+                "profiles": list_profiles()
+            }, status=status.HTTP_200_OK)
+
+        path = profile_path(name)
+        if path is None:
+            return Response(
+                {"error": "Profile not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if name.endswith('.folded'):
+            with open(path) as f:
+                return Response({"name": name, "stacks": f.read()}, status=status.HTTP_200_OK)
+        if name.endswith('.txt'):
+            with open(path) as f:
+                return Response({"name": name, "report": f.read()}, status=status.HTTP_200_OK)
+        return Response({"name": name, "stats": summarize_profile(path)}, status=status.HTTP_200_OK)
+
+    def post(self, request):
+        serializer = ProfilingRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {"error": serializer.errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        options = serializer.validated_data
+
+        response_data = {"pid": os.getpid()}
+        if 'requests' in options:
+            request_profiler.arm(options['requests'])
+            response_data["armed_requests"] = options['requests']
+        if 'stack_seconds' in options:
+            path = stack_sampler.start(options['stack_seconds'], thread_prefix=options['threads'])
+            if path is None:
+                return Response(
+                    {"error": "Stacks are already being sampled in this process"},
+                    status=status.HTTP_409_CONFLICT
+                )
+            response_data["stacks_file"] = os.path.basename(path)
+        if 'memory' in options:
+            if options['memory'] == 'stop':
+                memory_tracker.stop()
+            else:
+                path = memory_report_path()
+                memory_tracker.write_report(path, options['memory'])
+                response_data["memory_report"] = os.path.basename(path)
+            response_data["memory"] = memory_tracker.stats()
+
+        return Response(response_data, status=status.HTTP_202_ACCEPTED)
@@ -0,0 +1,11 @@
+import os
+
+# Long-polls, Server-Sent Events streams and the hybrid fund wait each hold a thread
+# while they wait, so workers are threaded: one process serves many waiting clients.
+# At most TRANSACTION_STATUS_MAX_WAITERS (default 40) of each process's threads wait at once;
+# the rest stay free for fund requests, and waiting requests over the limit get 503
+worker_class = 'gthread'
+workers = int(os.environ.get('GUNICORN_WORKERS', '2'))
+threads = int(os.environ.get('GUNICORN_THREADS', '50'))
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '60'))